@@ -1,14 +1,21 @@
 from fastapi import Header, HTTPException
 
+from app.core.metrics import stage
 from app.core.security import authenticate_api_key
+from app.db.admission import current_org
 
 
 # API Key
-def get_principal(x_api_key: str | None = Header(default=None)):
+async def get_principal(x_api_key: str | None = Header(default=None)):
     """
     Minimal principal extraction.
     Replace this with real API-key validation later.
+    Async (no I/O) so FastAPI doesn't spend a threadpool slot on it.
     """
     if not x_api_key:
         raise HTTPException(status_code=401, detail="Missing X-API-Key")
-    return authenticate_api_key(x_api_key)
+    with stage("auth"):
+        principal = authenticate_api_key(x_api_key)
+    # DB admission control shares the pool fairly between tenants
+    current_org.set(principal.org_id)
+    return principal
@@ -1,36 +1,76 @@
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+
 from fastapi import Depends, HTTPException, Response
 
 from app.api.deps import get_principal
-from app.core.rate_limit import TokenBucketLimiter
+from app.core.config import settings
+from app.core.metrics import stage
+from app.core.rate_limit import SharedMemoryLimiter, TokenBucketLimiter
 from app.core.security import Principal
+from app.db.deps import measure_db_time
+
+
+def _build_limiter() -> TokenBucketLimiter | SharedMemoryLimiter:
+    if settings.rate_limit_backend == "shared":
+        # One budget across all worker processes of this host
+        return SharedMemoryLimiter(
+            rate_per_sec=settings.rate_limit_per_sec,
+            capacity=settings.rate_limit_burst,
+            path=settings.rate_limit_shm_path,
+            slots=settings.rate_limit_shm_slots,
+        )
+    return TokenBucketLimiter(
+        rate_per_sec=settings.rate_limit_per_sec,
+        capacity=settings.rate_limit_burst,
+        ttl_seconds=15 * 60,  # forget unused keys after 15 minutes
+    )
+
 
-limiter = TokenBucketLimiter(
-    rate_per_sec=5,
-    capacity=10,
-    ttl_seconds=15 * 60,  # forget unused keys after 15 minutes
-    sweep_interval_seconds=60,  # cleanup once per minute
-)
+limiter = _build_limiter()
 
 # Module-level singleton to satisfy linter
 _principal_dependency = Depends(get_principal)
 
 
-def rate_limit_dep(
-    response: Response,
-    principal: Principal = _principal_dependency,
-) -> None:
+def _key(principal: Principal) -> str:
     # safest key: per API key + org
-    key = f"org:{principal.org_id}:key:{principal.caller_id}"
+    return f"org:{principal.org_id}:key:{principal.caller_id}"
+
 
+def _set_headers(response: Response, remaining_tokens: float, cost: float) -> None:
+    # Rate limit headers for clients/debugging
+    response.headers["X-RateLimit-Limit"] = str(int(limiter.capacity))
+    response.headers["X-RateLimit-Remaining"] = str(max(0, int(remaining_tokens)))
+    response.headers["X-RateLimit-Cost"] = f"{cost:.2f}"
+
+
+def request_cost(shape_cost: float) -> float:
+    """
+    Admission cost of a request under RATE_LIMIT_COST_MODE: the route's shape
+    estimate in `shape` mode, otherwise 1 token (`db_time` charges the rest
+    once the queries have run, see `charge_db_time`).
+    """
+    return shape_cost if settings.rate_limit_cost_mode == "shape" else 1.0
+
+
+def charge_rate_limit(
+    response: Response, principal: Principal, cost: float = 1.0
+) -> None:
+    """
+    Take `cost` tokens from the caller's bucket (429 when short). Routes whose
+    cost depends on the request (shape, batch size) call this directly.
+    """
     try:
-        allowed, retry_after, remaining_tokens = limiter.allow(key)
+        with stage("rate_limit"):
+            allowed, retry_after, remaining_tokens = limiter.allow(
+                _key(principal), cost
+            )
     except Exception:
         # Fail-open: do NOT block users if limiter is broken
         return
 
-    # Rate limit headers for clients/debugging
-    response.headers["X-RateLimit-Limit"] = str(int(limiter.capacity))
-    response.headers["X-RateLimit-Remaining"] = str(max(0, int(remaining_tokens)))
+    _set_headers(response, remaining_tokens, cost)
 
     if not allowed:
         raise HTTPException(
@@ -38,3 +78,75 @@ def rate_limit_dep(
             detail="Too Many Requests",
             headers={"Retry-After": str(retry_after)},
         )
+
+
+def streamed_charge(
+    principal: Principal,
+    row_cost: float,
+    *,
+    prepaid_rows: int,
+    response: Response | None = None,
+) -> Callable[[int], None]:
+    """
+    Per-row debits for a streaming response (export): call the result with
+    each batch's row count. Rows past `prepaid_rows`, which the admission
+    charge covered, cost `row_cost` each. Nothing can be rejected mid-stream,
+    so the bucket may go into debt and later requests wait for the refill.
+    `flat` mode keeps 1 token per request. With `response` (headers not sent
+    yet), the rate limit headers report the debits too.
+    """
+    unpaid = -prepaid_rows
+
+    def charge(rows: int) -> None:
+        nonlocal unpaid
+        unpaid += rows
+        if unpaid <= 0 or not row_cost or settings.rate_limit_cost_mode == "flat":
+            return
+        cost, unpaid = unpaid * row_cost, 0
+        try:
+            remaining_tokens = limiter.charge(_key(principal), cost)
+        except Exception:
+            return  # Fail-open, as in charge_rate_limit
+        if response is not None:
+            total = float(response.headers.get("X-RateLimit-Cost", 0)) + cost
+            _set_headers(response, remaining_tokens, total)
+
+    return charge
+
+
+def _debit_db_time(response: Response, principal: Principal, seconds: float) -> None:
+    cost = seconds * settings.rate_limit_tokens_per_db_second
+    try:
+        remaining_tokens = limiter.charge(_key(principal), cost)
+    except Exception:
+        return  # Fail-open, as in charge_rate_limit
+    total = float(response.headers.get("X-RateLimit-Cost", 0)) + cost
+    _set_headers(response, remaining_tokens, total)
+
+
+@contextmanager
+def charge_db_time(
+    response: Response, principal: Principal
+) -> Generator[None, None, None]:
+    """
+    Feedback mode (`db_time`): debit the DB time used inside the block once it
+    finishes, so callers are throttled by the load they actually cause. The
+    bucket may go into debt; the next request then waits for the refill.
+    """
+    if settings.rate_limit_cost_mode != "db_time":
+        yield
+        return
+    with measure_db_time() as timer:
+        try:
+            yield
+        finally:
+            _debit_db_time(response, principal, timer.seconds)
+
+
+async def rate_limit_dep(
+    response: Response,
+    principal: Principal = _principal_dependency,
+) -> None:
+    # Async to keep it off the threadpool: no I/O, and the shared backend's lock
+    # waits are bounded (lock_timeout, then fail-open)
+    charge_rate_limit(response, principal)
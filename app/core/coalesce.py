@@ -0,0 +1,156 @@
+# app/core/coalesce.py
+"""
+Request coalescing for hot, repetitive reads (typeahead):
+
+  SingleFlight / AsyncSingleFlight: concurrent calls with the same key share
+      one execution; followers get the leader's result (or exception). The
+      result object is shared, so callers must not mutate it.
+  Supersession: "latest request wins" per client key (caller + input box).
+      A newer request marks older in-flight ones stale; on the asyncio path
+      their pending work is cancelled, which makes psycopg cancel the running
+      query on the server.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class Superseded(Exception):
+    """A newer request under the same supersession key replaced this one."""
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as err:
+            call.set_exception(err)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """
+    Same as SingleFlight on the event loop. The shared call is cancelled once
+    every caller waiting for it has gone (e.g. superseded or disconnected).
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()  # nobody wants the result any more
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class Supersession:
+    """
+    Tracks the latest request per key. Only keys with a request in flight are
+    kept, so memory follows concurrency, not the number of clients.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._latest: dict[Hashable, int] = {}
+        self._tasks: dict[Hashable, asyncio.Future] = {}
+        self.superseded = 0
+
+    def begin(self, key: Hashable) -> int:
+        with self._lock:
+            token = self._latest[key] = next(self._seq)
+        return token
+
+    def is_current(self, key: Hashable, token: int) -> bool:
+        return self._latest.get(key) == token
+
+    def check(self, key: Hashable, token: int) -> None:
+        if not self.is_current(key, token):
+            with self._lock:
+                self.superseded += 1
+            raise Superseded()
+
+    def end(self, key: Hashable, token: int) -> None:
+        with self._lock:
+            if self._latest.get(key) == token:
+                del self._latest[key]
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await `fn()` as the latest request under `key`, cancelling the work of
+        the previous one; raises Superseded if a newer request cancels ours.
+        """
+        token = self.begin(key)
+        previous = self._tasks.get(key)
+        if previous is not None:
+            previous.cancel()
+        task = self._tasks[key] = asyncio.ensure_future(fn())
+        try:
+            return await task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if task.cancelled() and not (current and current.cancelling()):
+                with self._lock:
+                    self.superseded += 1
+                raise Superseded() from None
+            raise  # this request itself was cancelled
+        finally:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+            self.end(key, token)
@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -33,15 +34,107 @@ class Settings(BaseSettings):
     db_pool_min_size: int = 1
     db_pool_max_size: int = 10
     db_pool_timeout: int = 2
+    # Server-side prepared statements: executions before a statement is prepared
+    # on a connection (0 = first use; None = never, e.g. behind pgbouncer in
+    # transaction mode)
+    db_prepare_threshold: int | None = 0
+    db_prepared_max: int = 256  # prepared statements kept per connection
+    db_statement_cache_size: int = 1024  # distinct query shapes kept in the registry
+    db_warm_statements: int = 32  # hottest shapes prepared on each new connection
+    # Admission control in front of pool checkout (app/db/admission.py): adaptive
+    # global in-flight limit + per-org fair share, shedding with 503 instead of
+    # waiting db_pool_timeout
+    admission_enabled: bool = True
+    admission_min_limit: int = 2
+    admission_org_share: float = 0.5  # max share of the limit one org may hold
+    admission_org_min: int = 1
+    admission_target_wait_ms: float = 50  # pool checkout wait seen as congestion
+    admission_target_query_ms: float = 1000  # query time seen as congestion
+    admission_retry_after_seconds: int = 1
+    # Dedicated LISTEN connection delivering cache invalidations (NOTIFY)
+    db_listen: bool = True
+    # Serve search on the asyncio pool (async end to end) instead of the sync
+    # pool + threadpool. Kept as a switch so both paths can be A/B tested.
+    db_async: bool = False
+    # Read replicas for search and facet queries, as a JSON object of name ->
+    # conninfo (DB_REPLICAS={"r1": "postgresql://..."}); empty = primary only.
+    # Each replica gets pools sized like the primary's
+    db_replicas: dict[str, str] = {}
+    db_replica_max_lag_seconds: float = 5  # lagging further: reads go elsewhere
+    db_replica_check_seconds: float = 1  # replay position probe interval
+
+    # Search + facets execution:
+    #   sequential: search, then facets (two checkouts, latencies add up)
+    #   concurrent: both at once on separate connections, then merged
+    #   pipeline:   both on one connection in a single round trip
+    search_facets_mode: Literal["sequential", "concurrent", "pipeline"] = "concurrent"
+    # Overall latency budget (seconds) for a search + facets request
+    search_timeout_seconds: float = 5.0
+    # Default search strategy (single | two_phase), overridable per request
+    search_strategy: Literal["single", "two_phase"] = "single"
+    # Search response cache (app/modules/employee/result_cache.py): entries
+    # (0 = off) and their lifetime; without NOTIFY, an org's data version is
+    # re-read at most this often
+    search_cache_max_entries: int = 2000
+    search_cache_ttl_seconds: float = 30
+    search_cache_revalidate_seconds: float = 1
+    # Search responses carry ETags (If-None-Match -> 304) and may be served by
+    # shared caches (CDN) for this many seconds without revalidating; 0 = every
+    # use revalidates
+    search_http_s_maxage: int = 0
+    # Typeahead (/employees/suggest): the full-text tier (word prefixes of the
+    # search document) only runs for prefixes this long
+    suggest_fts_min_chars: int = 3
+    # Opt-in in-process search index (app/modules/employee/memindex.py) for
+    # hot orgs, as a JSON list (MEMINDEX_ORGS=[1001]). Rebuilt when the org's
+    # versions move (NOTIFY, or checked every refresh), and every reload
+    memindex_orgs: list[int] = []
+    memindex_refresh_seconds: float = 5
+    memindex_reload_seconds: float = 600
+    # Rows per server-side cursor fetch when streaming an export
+    export_batch_size: int = 5000
+    # search_tsv reindex (app/modules/employee/reindex.py): rows per UPDATE
+    # transaction, and how long a batch may wait for row locks before retrying
+    reindex_batch_size: int = 1000
+    reindex_lock_timeout_ms: int = 2000
+    # Signs pagination cursors; must be the same on every instance
+    cursor_secret: str = "dev-cursor-secret"
+
+    # Org reference-data cache (descriptors resolved in-process, not via joins)
+    refdata_cache_max_orgs: int = 1000  # LRU bound
+    refdata_revalidate_seconds: float = 30  # version re-check when no NOTIFY
 
     # Rate limiting
     rate_limit_rpm: int = 120
+    # Token bucket per API key: refill rate and burst size (tokens)
+    rate_limit_per_sec: float = 5
+    rate_limit_burst: int = 10
+    # memory: per-process buckets; shared: one table in shared memory for all
+    # workers on the host (multi-worker uvicorn/gunicorn)
+    rate_limit_backend: Literal["memory", "shared"] = "memory"
+    rate_limit_shm_path: str | None = None  # default /dev/shm/hrms-ratelimit
+    rate_limit_shm_slots: int = 65536  # fixed table size (buckets)
+    # Request cost:
+    #   flat:    every request costs 1 token
+    #   shape:   estimated from the request (FTS, facets, page size, filters)
+    #   db_time: 1 token up front, then the measured DB time once it has run
+    rate_limit_cost_mode: Literal["flat", "shape", "db_time"] = "shape"
+    rate_limit_tokens_per_db_second: float = 10.0  # db_time: 100 ms = 1 token
 
     # Logging
     log_level: str = "INFO"
 
+    # Metrics: /metrics (Prometheus text) + Server-Timing response header
+    metrics_enabled: bool = True
+    # Bearer token scrapers send to /metrics (unset: /metrics is not served)
+    metrics_token: str | None = None
+    # Series kept per histogram; new label sets past it are counted as "other"
+    metrics_max_series: int = 1000
+
     # Auth
     api_key: str = ""
+    # Optional JSON file of extra API keys (see app/core/security.py)
+    api_keys_file: str | None = None
 
     model_config = SettingsConfigDict(
         env_file=os.path.join(
@@ -0,0 +1,243 @@
+# app/core/metrics.py
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.config import settings
+
+# Seconds; fine-grained at the low end, where hot-path stages live
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: Iterable[Any]) -> str:
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Histogram:
+    """
+    Labelled histogram family. `observe` is a bisect + two adds under a lock;
+    cumulative buckets are only computed when rendered. At most `max_series`
+    label sets get their own series: later ones all go to an "other" series,
+    so shapes churning through the statement registry cannot grow it forever.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        max_series: int | None = None,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.max_series = (
+            settings.metrics_max_series if max_series is None else max_series
+        )
+        self._overflow = ("other",) * len(labelnames)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket (+Inf last)..., sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        i = bisect_left(self.buckets, value)  # first bound >= value ("le")
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    labels = self._overflow
+                    series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = [(k, list(v)) for k, v in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = (*self.labelnames, "le")
+        for labels, series in sorted(snapshot):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), series[:-1], strict=True):
+                cumulative += n
+                le = bound if isinstance(bound, str) else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_labels(names, (*labels, le))} {cumulative}"
+                )
+            plain = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {series[-1]}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+@dataclass
+class Sample:
+    # One gauge/counter value produced by a collector at scrape time
+    name: str
+    help: str
+    value: float
+    labels: dict[str, str] = field(default_factory=dict)
+    type: str = "gauge"
+
+
+request_seconds = Histogram(
+    "hrms_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "endpoint", "status"),
+)
+stage_seconds = Histogram(
+    "hrms_request_stage_seconds",
+    "Time per request stage (auth, rate_limit, pool_wait, sql, decode, ...)",
+    ("endpoint", "stage"),
+)
+statement_seconds = Histogram(
+    "hrms_db_statement_seconds",
+    "Execute + fetch time per statement shape (see app/db/statements.py)",
+    ("shape",),
+)
+_histograms = (request_seconds, stage_seconds, statement_seconds)
+_collectors: list[Callable[[], Iterable[Sample]]] = []
+
+
+def register_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+    """
+    Gauges are read at scrape time (pool size, cache stats, ...), not pushed.
+    """
+    _collectors.append(collect)
+
+
+def render() -> str:
+    lines: list[str] = []
+    for histogram in _histograms:
+        lines += histogram.render()
+    seen: set[str] = set()
+    for collect in _collectors:
+        for s in collect():
+            if s.name not in seen:
+                seen.add(s.name)
+                lines += [f"# HELP {s.name} {s.help}", f"# TYPE {s.name} {s.type}"]
+            lines.append(
+                f"{s.name}{_labels(tuple(s.labels), s.labels.values())} {s.value}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class RequestTimings:
+    # Per-request stages (Server-Timing + stage histogram): stage -> seconds,
+    # summed over repeats (e.g. two connections)
+    stages: dict[str, float] = field(default_factory=dict)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{n};dur={s * 1000:.2f}" for n, s in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+
+# Mutable holder, shared with threadpool/executor threads (copied contexts)
+_timings: ContextVar[RequestTimings | None] = ContextVar("timings", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+class stage:  # lower-case: used like a function, `with stage("sql"):`
+    """
+    Time a block as stage `name` of the current request (no-op outside one).
+    A plain class rather than @contextmanager: it runs several times per request.
+    """
+
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.timings = _timings.get()
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no extra task per request): sets up the request's
+    stage timings, adds `Server-Timing` to the response and feeds the request
+    and stage histograms. Stage times are as of the response start; the
+    request histogram covers the full body (streams included).
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.server_timing(time.perf_counter() - started)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            elapsed = time.perf_counter() - started
+            # Route template, not the raw path: bounded label cardinality
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            request_seconds.observe((scope["method"], endpoint, str(status)), elapsed)
+            for name, seconds in timings.stages.items():
+                stage_seconds.observe((endpoint, name), seconds)
@@ -1,15 +1,43 @@
 from __future__ import annotations
 
+import errno
+import fcntl
+import hashlib
 import math
+import mmap
+import os
+import struct
+import tempfile
 import threading
 import time
-from dataclasses import dataclass
+from array import array
+from collections import OrderedDict
+from collections.abc import Generator
+from contextlib import contextmanager
 
 
-@dataclass
-class Bucket:
-    tokens: float
-    last: float  # monotonic timestamp (also works as "last_seen")
+def _retry_after(missing: float, rate: float) -> int:
+    # HTTP Retry-After is integer seconds; never advertise 0 for a rejection
+    if rate <= 0:
+        return 60  # no refill possible: effectively "blocked", a safe default
+    return max(1, math.ceil(missing / rate))
+
+
+class _Stripe:
+    """
+    One lock's worth of buckets. State lives in flat arrays indexed by slot, so
+    a key costs a dict entry and two doubles (no per-key object).
+    """
+
+    __slots__ = ("lock", "slots", "tokens", "last", "free")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # key -> slot, least recently seen first (ordered expiry)
+        self.slots: OrderedDict[str, int] = OrderedDict()
+        self.tokens = array("d")
+        self.last = array("d")  # monotonic timestamp (also works as "last_seen")
+        self.free: list[int] = []  # reusable slots of evicted keys
 
 
 class TokenBucketLimiter:
@@ -18,7 +46,10 @@ class TokenBucketLimiter:
       - Allows bursts up to `capacity`
       - Sustains `rate_per_sec` over time
       - In-memory (per process)
-      - TTL cleanup to prevent unbounded memory growth
+      - Lock striping: keys hash onto `stripes` independent locks
+      - Incremental TTL eviction: keys are kept in last-seen order per stripe,
+        and each call expires at most `evict_batch` of the oldest, so there is
+        never a full O(n) sweep under a lock
       - Accurate Retry-After calculation
     """
 
@@ -28,26 +59,27 @@ class TokenBucketLimiter:
         rate_per_sec: float,
         capacity: int,
         ttl_seconds: float = 15 * 60,  # evict buckets idle for 15 minutes
-        sweep_interval_seconds: float = 60,  # run cleanup at most once per minute
+        stripes: int = 64,
+        evict_batch: int = 4,  # expired keys dropped per call (>1 keeps up with churn)
     ) -> None:
         self.rate = float(rate_per_sec)
         self.capacity = float(capacity)
         self.ttl_seconds = float(ttl_seconds)
-        self.sweep_interval_seconds = float(sweep_interval_seconds)
-        self._lock = threading.Lock()
-        self._buckets: dict[str, Bucket] = {}
-        self._last_sweep = time.monotonic()
-
-    def _sweep_if_needed(self, now: float) -> None:
-        # Run cleanup occasionally (avoids a background thread)
-        if (now - self._last_sweep) < self.sweep_interval_seconds:
-            return
+        self.evict_batch = evict_batch
+        self._stripes = tuple(_Stripe() for _ in range(stripes))
+
+    def _evict_expired(self, stripe: _Stripe, now: float) -> None:
         cutoff = now - self.ttl_seconds
-        # Delete keys that haven't been seen recently
-        to_delete = [k for k, b in self._buckets.items() if b.last < cutoff]
-        for k in to_delete:
-            del self._buckets[k]
-        self._last_sweep = now
+        slots = stripe.slots
+        for _ in range(self.evict_batch):
+            if not slots:
+                return
+            key = next(iter(slots))
+            slot = slots[key]
+            if stripe.last[slot] >= cutoff:
+                return  # oldest key is still live, so all of them are
+            del slots[key]
+            stripe.free.append(slot)
 
     def allow(self, key: str, cost: float = 1.0) -> tuple[bool, int, float]:
         """
@@ -58,43 +90,206 @@ class TokenBucketLimiter:
         remaining_tokens:
           - number of tokens remaining in the bucket after this request
         """
-        now = time.monotonic()
+        allowed, tokens = self._take(key, cost, force=False)
+        if allowed:
+            return True, 0, tokens
+        # Not enough tokens: compute accurate retry-after
+        return False, _retry_after(cost - tokens, self.rate), tokens
 
-        with self._lock:
-            # TTL cleanup
-            self._sweep_if_needed(now)
+    def charge(self, key: str, cost: float) -> float:
+        """
+        Debit `cost` after the fact (e.g. measured DB time) without rejecting.
+        The bucket may go into debt, down to -capacity. Returns remaining tokens.
+        """
+        return self._take(key, cost, force=True)[1]
 
-            b = self._buckets.get(key)
-            if b is None:
-                # Start full so the user can burst immediately
-                b = Bucket(tokens=self.capacity, last=now)
-                self._buckets[key] = b
+    def _take(self, key: str, cost: float, *, force: bool) -> tuple[bool, float]:
+        stripe = self._stripes[hash(key) % len(self._stripes)]
+
+        with stripe.lock:
+            # Read the clock under the lock: last-seen order stays monotonic
+            now = time.monotonic()
+            self._evict_expired(stripe, now)
 
-            # Refill based on elapsed time
-            elapsed = now - b.last
-            if elapsed > 0:
-                b.tokens = min(self.capacity, b.tokens + elapsed * self.rate)
+            slot = stripe.slots.get(key)
+            if slot is None:
+                # Start full so the user can burst immediately
+                tokens = self.capacity
+                if stripe.free:
+                    slot = stripe.free.pop()
+                else:
+                    slot = len(stripe.tokens)
+                    stripe.tokens.append(0.0)
+                    stripe.last.append(0.0)
+                stripe.slots[key] = slot
+            else:
+                stripe.slots.move_to_end(key)
+                # Refill based on elapsed time
+                elapsed = now - stripe.last[slot]
+                tokens = min(self.capacity, stripe.tokens[slot] + elapsed * self.rate)
 
             # Always refresh last_seen for TTL accuracy
-            b.last = now  # also updates "last_seen"
+            stripe.last[slot] = now
 
             # Allow if enough tokens
-            if b.tokens >= cost:
-                b.tokens -= cost
-                return True, 0, b.tokens
-
-            # Not enough tokens: compute accurate retry-after
-            if self.rate <= 0:
-                # No refill possible: effectively "blocked"
-                return (
-                    False,
-                    60,
-                    b.tokens,
-                )  # a safe default; could also be a large number
-
-            missing = cost - b.tokens  # how many tokens are needed
-            retry_after = math.ceil(missing / self.rate)
-
-            # If due to floating precision it's already basically available, return 1 as a safe value
-            # (HTTP Retry-After is integer seconds)
-            return False, max(1, int(retry_after)), b.tokens
+            allowed = force or tokens >= cost
+            if allowed:
+                tokens = max(-self.capacity, tokens - cost)
+            stripe.tokens[slot] = tokens
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        # Buckets currently tracked (expired ones linger until evicted)
+        return sum(len(s.slots) for s in self._stripes)
+
+
+class SharedMemoryLimiter:
+    """
+    Token bucket shared by every worker process on the host (uvicorn/gunicorn
+    workers), so N workers enforce one limit instead of N:
+      - Fixed-size, set-associative table in a memory-mapped file (/dev/shm by
+        default); a key hashes (blake2b) to one set of `ways` slots
+      - Atomic updates: per-set fcntl byte-range lock across processes, plus a
+        striped thread lock (fcntl locks don't exclude threads of one process).
+        Both are taken without blocking, retried for at most `lock_timeout`
+        seconds, then TimeoutError: callers on the event loop never stall
+        behind a stuck worker
+      - Never grows: a new key takes an empty slot, else the least recently
+        seen bucket of its set that has refilled to capacity (evicting it
+        loses nothing). When every bucket of the set is still draining, the
+        new key is rejected until one refills: failing closed, so a flood of
+        fresh keys cannot reset other callers' budgets
+      - Same `allow()` contract and Retry-After as TokenBucketLimiter
+    """
+
+    # key digest, tokens, last seen (time.monotonic is host-wide on Linux)
+    _SLOT = struct.Struct("=16sdd")
+    _EMPTY = bytes(16)
+
+    def __init__(
+        self,
+        *,
+        rate_per_sec: float,
+        capacity: int,
+        path: str | None = None,
+        slots: int = 65536,
+        ways: int = 8,
+        lock_timeout: float = 0.005,
+    ) -> None:
+        self.rate = float(rate_per_sec)
+        self.capacity = float(capacity)
+        self.ways = ways
+        self.lock_timeout = lock_timeout
+        self.sets = max(1, slots // ways)
+        self._set_size = ways * self._SLOT.size
+        size = self.sets * self._set_size
+
+        # The layout is part of the name: workers configured differently never
+        # map the same file with different geometry
+        base = path or os.path.join(_shm_dir(), "hrms-ratelimit")
+        self.path = f"{base}-{self.sets}x{ways}"
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)  # zero-filled == all slots empty
+        self._mm = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+
+    def _refilled(self, tokens: float, last: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - last) * self.rate)
+
+    def _find_slot(
+        self, digest: bytes, start: int, now: float
+    ) -> tuple[int | None, float]:
+        # (offset, refilled tokens) of the key's slot. A new key claims a free
+        # or the least recently seen full slot of its set and starts full; with
+        # none, (None, tokens missing from the bucket closest to full)
+        victim, victim_last, deficit = None, math.inf, math.inf
+        for offset in range(start, start + self._set_size, self._SLOT.size):
+            h, tokens, last = self._SLOT.unpack_from(self._mm, offset)
+            if h == digest:
+                return offset, self._refilled(tokens, last, now)
+            if h == self._EMPTY:
+                last = -math.inf
+            else:
+                missing = self.capacity - self._refilled(tokens, last, now)
+                if missing > 0:
+                    deficit = min(deficit, missing)
+                    continue  # still draining: evicting it would refill it
+            if last < victim_last:
+                victim, victim_last = offset, last
+        if victim is None:
+            return None, deficit
+        return victim, self.capacity
+
+    def allow(self, key: str, cost: float = 1.0) -> tuple[bool, int, float]:
+        """
+        Returns (allowed, retry_after_seconds, remaining_tokens), as
+        TokenBucketLimiter.allow.
+        """
+        allowed, tokens, missing = self._take(key, cost, force=False)
+        if allowed:
+            return True, 0, tokens
+        return False, _retry_after(missing, self.rate), tokens
+
+    def charge(self, key: str, cost: float) -> float:
+        """
+        As TokenBucketLimiter.charge: debit without rejecting (debt floor
+        -capacity). Returns remaining tokens. A key that lost its slot and
+        finds its set full of draining buckets is not charged.
+        """
+        return self._take(key, cost, force=True)[1]
+
+    def _take(self, key: str, cost: float, *, force: bool) -> tuple[bool, float, float]:
+        # (allowed, remaining tokens, tokens missing for `cost`)
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        index = int.from_bytes(digest[:8], "little") % self.sets
+        start = index * self._set_size
+
+        with self._locked(index, start):
+            now = time.monotonic()
+            offset, tokens = self._find_slot(digest, start, now)
+            if offset is None:
+                # No slot to spare: reject until the closest bucket refills
+                return False, 0.0, tokens
+            allowed = force or tokens >= cost
+            if allowed:
+                tokens = max(-self.capacity, tokens - cost)
+            self._SLOT.pack_into(self._mm, offset, digest, tokens, now)
+        return allowed, tokens, cost - tokens
+
+    @contextmanager
+    def _locked(self, index: int, start: int) -> Generator[None, None, None]:
+        # Non-blocking attempts until `lock_timeout`: holders keep the set for
+        # microseconds, so running out means a worker is stuck holding it
+        deadline = time.monotonic() + self.lock_timeout
+        thread_lock = self._thread_locks[index % len(self._thread_locks)]
+        if not thread_lock.acquire(timeout=self.lock_timeout):
+            raise TimeoutError("rate limit set is locked")
+        try:
+            while True:
+                try:
+                    fcntl.lockf(
+                        self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, self._set_size, start
+                    )
+                    break
+                except OSError as err:
+                    if err.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError("rate limit set is locked") from err
+                    time.sleep(0.0001)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, self._set_size, start)
+        finally:
+            thread_lock.release()
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+def _shm_dir() -> str:
+    # tmpfs where available (Linux); the page cache keeps it hot elsewhere
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
@@ -1,7 +1,10 @@
+import json
 from dataclasses import dataclass
 
 from fastapi import HTTPException, status
 
+from app.core.config import settings
+
 
 @dataclass(frozen=True)
 class Principal:
@@ -19,6 +22,21 @@ API_KEY_TO_PRINCIPAL = {
 }
 
 
+def _load_api_keys_file(path: str) -> dict[str, tuple[int, tuple, tuple]]:
+    # {"api_key": {"org_id": 1001, "roles": [...], "scopes": [...]}, ...}
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        key: (int(cfg["org_id"]), tuple(cfg["roles"]), tuple(cfg["scopes"]))
+        for key, cfg in raw.items()
+    }
+
+
+# Extra keys, e.g. one per synthetic org written by benchmarks/datagen.py
+if settings.api_keys_file:
+    API_KEY_TO_PRINCIPAL.update(_load_api_keys_file(settings.api_keys_file))
+
+
 def authenticate_api_key(api_key: str) -> Principal:
     cfg = API_KEY_TO_PRINCIPAL.get(api_key)
     if cfg is None:
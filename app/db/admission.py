@@ -0,0 +1,177 @@
+# app/db/admission.py
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+
+# Tenant of the current request (set once the principal is known); pooled
+# connections taken while it is set count against that org's share
+current_org: ContextVar[int | None] = ContextVar("current_org", default=None)
+
+
+class AdmissionController:
+    """
+    Gate in front of pool checkout, so overload is shed early instead of
+    queueing for `db_pool_timeout` and failing:
+      - In-flight limit of one pool, adapted AIMD style: +1/limit per uncongested
+        release, x`backoff` (at most once per `cooldown_seconds`) when checkout
+        waited longer than `target_wait_seconds`, the query ran longer than
+        `target_query_seconds`, or the pool timed out
+      - Per-org fair share: one org may hold at most `org_share` of the current
+        limit (never less than `org_min`), so a bulk job can't starve the others
+      - Non-blocking: a request over either limit is rejected immediately (503)
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        org_share: float,
+        org_min: int,
+        target_wait_seconds: float,
+        target_query_seconds: float,
+        backoff: float = 0.9,
+        cooldown_seconds: float = 0.1,
+        enabled: bool = True,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.org_share = org_share
+        self.org_min = org_min
+        self.target_wait_seconds = target_wait_seconds
+        self.target_query_seconds = target_query_seconds
+        self.backoff = backoff
+        self.cooldown_seconds = cooldown_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self._per_org: dict[int, int] = {}
+        self._last_decrease = -math.inf
+        self.shed = 0
+
+    def org_limit(self) -> int:
+        return max(self.org_min, math.ceil(self.limit * self.org_share))
+
+    def try_acquire(self, org_id: int | None) -> bool:
+        if not self.enabled:
+            return True
+        with self._lock:
+            over_org = (
+                org_id is not None and self._per_org.get(org_id, 0) >= self.org_limit()
+            )
+            if over_org or self.in_flight >= int(self.limit):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            if org_id is not None:
+                self._per_org[org_id] = self._per_org.get(org_id, 0) + 1
+            return True
+
+    def release(
+        self,
+        org_id: int | None,
+        *,
+        wait: float,
+        query: float,
+        congested: bool = False,
+        feedback: bool = True,
+    ) -> None:
+        """
+        Return an admitted slot. `feedback=False` (long-lived streams) frees the
+        slot without letting its duration move the limit.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight -= 1
+            if org_id is not None:
+                n = self._per_org.get(org_id, 0) - 1
+                if n > 0:
+                    self._per_org[org_id] = n
+                else:
+                    self._per_org.pop(org_id, None)
+            if not feedback:
+                return
+            if (
+                congested
+                or wait > self.target_wait_seconds
+                or query > self.target_query_seconds
+            ):
+                # One decrease per congestion episode, not one per late request
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "orgs": len(self._per_org),
+                "shed": self.shed,
+            }
+
+
+class PoolAdmission:
+    """
+    One AdmissionController per pool (the primary, each replica), created on
+    first use: every replica adds its own in-flight capacity, and replica reads
+    never take the primary's slots.
+    """
+
+    def __init__(self, factory: Callable[[], AdmissionController]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._controllers: dict[str, AdmissionController] = {}
+
+    def get(self, pool: str) -> AdmissionController:
+        controller = self._controllers.get(pool)
+        if controller is None:
+            with self._lock:
+                controller = self._controllers.get(pool)
+                if controller is None:
+                    controller = self._controllers[pool] = self._factory()
+        return controller
+
+    def stats(self) -> list[Sample]:
+        with self._lock:
+            controllers = list(self._controllers.items())
+        return [
+            Sample(
+                f"hrms_admission_{k}", f"DB admission controller {k}", v, {"db": name}
+            )
+            for name, controller in controllers
+            for k, v in controller.stats().items()
+        ]
+
+
+def _pool_controller() -> AdmissionController:
+    return AdmissionController(
+        initial_limit=settings.db_pool_max_size,
+        min_limit=settings.admission_min_limit,
+        # Above the pool size requests queue inside the pool: the wait signal
+        # then pulls the limit back down
+        max_limit=settings.db_pool_max_size * 2,
+        org_share=settings.admission_org_share,
+        org_min=settings.admission_org_min,
+        target_wait_seconds=settings.admission_target_wait_ms / 1000,
+        target_query_seconds=settings.admission_target_query_ms / 1000,
+        enabled=settings.admission_enabled,
+    )
+
+
+admission = PoolAdmission(_pool_controller)
+
+register_collector(admission.stats)
@@ -1,21 +1,264 @@
 # app/db/deps.py
-from collections.abc import Generator
-from contextlib import contextmanager
+import threading
+import time
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 
 from fastapi import HTTPException
-from psycopg import Connection
+from psycopg import AsyncConnection, Connection
 from psycopg_pool import PoolTimeout
 
-from app.db.pool import get_pool
+from app.core.config import settings
+from app.core.metrics import record_stage
+from app.db.admission import AdmissionController, admission, current_org
+from app.db.pool import PRIMARY, get_async_pool, get_pool
+from app.db.replicas import replicas
+
+
+@dataclass
+class DbTimer:
+    seconds: float = 0.0  # time pooled connections were held (checkout wait excluded)
+
+
+# Mutable holder: threadpool/executor threads run in a copy of the request's
+# context, so they must add to the same object rather than re-set the var
+_db_timer: ContextVar[DbTimer | None] = ContextVar("db_timer", default=None)
+
+
+@contextmanager
+def measure_db_time() -> Generator[DbTimer, None, None]:
+    """
+    Accumulate the DB time of every connection used inside the block, on any
+    thread or task that inherits the current context.
+    """
+    timer = DbTimer()
+    token = _db_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _db_timer.reset(token)
+
+
+def _add_db_time(started: float) -> None:
+    timer = _db_timer.get()
+    if timer is not None:
+        timer.seconds += time.perf_counter() - started
+
+
+@dataclass
+class Deadline:
+    at: float  # time.monotonic()
+    _conns: set[Connection] = field(default_factory=set)  # sync checkouts in use
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def cancel(self) -> None:
+        """Stop whatever the block's sync connections are running, server-side."""
+        with self._lock:
+            conns = list(self._conns)
+        for conn in conns:
+            conn.cancel_safe(timeout=1.0)
+
+
+# Shared holder like DbTimer: helper threads must see the same connections
+_deadline: ContextVar[Deadline | None] = ContextVar("db_deadline", default=None)
+
+
+@contextmanager
+def db_deadline(seconds: float) -> Generator[Deadline, None, None]:
+    """
+    Bound every query of the block, on any thread or task that inherits the
+    current context: app.db.utils sets each one's statement_timeout to the
+    time left. `Deadline.cancel()` stops queries still running.
+    """
+    deadline = Deadline(time.monotonic() + seconds)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def time_left(statement_timeout: float | None) -> float | None:
+    # The statement_timeout a query gets: its own, capped by the block's deadline
+    deadline = _deadline.get()
+    if deadline is None:
+        return statement_timeout
+    if statement_timeout is None:
+        return deadline.remaining()
+    return min(statement_timeout, deadline.remaining())
 
 
 @contextmanager
-def get_db_conn() -> Generator[Connection, None, None]:
-    pool = get_pool()
+def _tracked(conn: Connection) -> Generator[None, None, None]:
+    deadline = _deadline.get()
+    if deadline is None:
+        yield
+        return
+    with deadline._lock:
+        deadline._conns.add(conn)
     try:
-        with pool.connection() as conn:
-            yield conn
-    except PoolTimeout as err:
-        raise HTTPException(
-            status_code=503, detail="Database busy, please retry"
-        ) from err
+        yield
+    finally:
+        with deadline._lock:
+            deadline._conns.discard(conn)
+
+
+def _db_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Database busy, please retry",
+        headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+    )
+
+
+@dataclass
+class HeldSlot:
+    gate: AdmissionController | None = None  # set by the block's first checkout
+    org_id: int | None = None
+    requested: float = 0.0
+    checked_out: float | None = None
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Shared holder like DbTimer: helper threads and tasks share the request's slot
+_held_slot: ContextVar[HeldSlot | None] = ContextVar("db_held_slot", default=None)
+
+
+@contextmanager
+def admitted() -> Generator[None, None, None]:
+    """
+    Admit the block once: its first checkout takes a slot and holds it until
+    the block ends, and every other checkout of the block (concurrent facet
+    queries, on any thread or task that inherits the current context) runs
+    under that slot. A request admitted for its first query is never shed
+    halfway through.
+    """
+    held = HeldSlot()
+    token = _held_slot.set(held)
+    try:
+        yield
+    finally:
+        _held_slot.reset(token)
+        if held.gate is not None:
+            _release(held.gate, held.org_id, held.requested, held.checked_out, False)
+
+
+def _admit(pool_name: str) -> tuple[AdmissionController, int | None] | None:
+    """The slot a checkout must release, or None when its block holds one."""
+    held = _held_slot.get()
+    if held is None:
+        return _acquire(pool_name)
+    with held._lock:
+        if held.gate is None:
+            held.gate, held.org_id = _acquire(pool_name)
+            held.requested = time.perf_counter()
+    return None
+
+
+def _checked_out(at: float) -> None:
+    held = _held_slot.get()
+    if held is not None and held.checked_out is None:
+        held.checked_out = at
+
+
+def _acquire(pool_name: str) -> tuple[AdmissionController, int | None]:
+    # Shed before touching the pool: fail in microseconds, not db_pool_timeout
+    gate, org_id = admission.get(pool_name), current_org.get()
+    if not gate.try_acquire(org_id):
+        raise _db_busy()
+    return gate, org_id
+
+
+def _release(
+    gate: AdmissionController,
+    org_id: int | None,
+    requested: float,
+    checked_out: float | None,
+    streaming: bool,
+) -> None:
+    now = time.perf_counter()
+    if checked_out is None:  # PoolTimeout (or checkout failure)
+        gate.release(org_id, wait=now - requested, query=0.0, congested=True)
+        return
+    gate.release(
+        org_id,
+        wait=checked_out - requested,
+        query=now - checked_out,
+        feedback=not streaming,
+    )
+
+
+def _checkout_order(name: str) -> tuple[str, ...]:
+    # A replica that cannot hand out a connection (PoolTimeout: down or
+    # unreachable) is marked failed and the checkout retried on the primary
+    return (name,) if name == PRIMARY else (name, PRIMARY)
+
+
+@contextmanager
+def get_db_conn(*, streaming: bool = False) -> Generator[Connection, None, None]:
+    """
+    Pooled connection behind its pool's admission controller. `streaming=True` marks a
+    long-lived checkout (exports): it counts against the org's share but its
+    duration is not taken as a latency signal. Inside `replicas.reading()` the
+    connection may come from a replica's pool.
+    """
+    with replicas.route() as name:
+        try:
+            for pool_name in _checkout_order(name):
+                slot = _admit(pool_name)
+                requested, checked_out = time.perf_counter(), None
+                try:
+                    with get_pool(pool_name).connection() as conn:
+                        checked_out = time.perf_counter()
+                        _checked_out(checked_out)
+                        record_stage("pool_wait", checked_out - requested)
+                        try:
+                            with _tracked(conn):
+                                yield conn
+                        finally:
+                            _add_db_time(checked_out)
+                    break
+                except PoolTimeout:
+                    if checked_out is not None or pool_name == PRIMARY:
+                        raise
+                    replicas.failed(pool_name)
+                finally:
+                    if slot is not None:
+                        _release(*slot, requested, checked_out, streaming)
+        except PoolTimeout as err:
+            raise _db_busy() from err
+
+
+@asynccontextmanager
+async def get_async_db_conn(
+    *, streaming: bool = False
+) -> AsyncGenerator[AsyncConnection, None]:
+    with replicas.route() as name:
+        try:
+            for pool_name in _checkout_order(name):
+                slot = _admit(pool_name)
+                requested, checked_out = time.perf_counter(), None
+                try:
+                    async with get_async_pool(pool_name).connection() as conn:
+                        checked_out = time.perf_counter()
+                        _checked_out(checked_out)
+                        record_stage("pool_wait", checked_out - requested)
+                        try:
+                            yield conn
+                        finally:
+                            _add_db_time(checked_out)
+                    break
+                except PoolTimeout:
+                    if checked_out is not None or pool_name == PRIMARY:
+                        raise
+                    replicas.failed(pool_name)
+                finally:
+                    if slot is not None:
+                        _release(*slot, requested, checked_out, streaming)
+        except PoolTimeout as err:
+            raise _db_busy() from err
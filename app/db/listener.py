@@ -0,0 +1,84 @@
+# app/db/listener.py
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+
+import psycopg
+from psycopg import sql
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NotifyCallback = Callable[[str], None]  # receives the notification payload
+ResetCallback = Callable[[], None]  # (re)connected: notifications may have been lost
+
+
+class NotificationListener:
+    """
+    Postgres LISTEN/NOTIFY consumer on a dedicated (non-pooled) connection.
+      - One daemon thread, works for both the sync and async app paths
+      - Reconnects with backoff; `on_reset` callbacks fire after every (re)connect
+        because anything sent while disconnected is lost
+    """
+
+    def __init__(self, conninfo: str, *, poll_seconds: float = 1.0) -> None:
+        self.conninfo = conninfo
+        self.poll_seconds = poll_seconds
+        self._callbacks: dict[str, list[NotifyCallback]] = defaultdict(list)
+        self._reset_callbacks: list[ResetCallback] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(
+        self,
+        channel: str,
+        callback: NotifyCallback,
+        *,
+        on_reset: ResetCallback | None = None,
+    ) -> None:
+        self._callbacks[channel].append(callback)
+        if on_reset is not None:
+            self._reset_callbacks.append(on_reset)
+
+    def start(self) -> None:
+        if self._thread is not None or not self._callbacks:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pg-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds * 2)
+            self._thread = None
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.conninfo, autocommit=True) as conn:
+                    for channel in self._callbacks:
+                        conn.execute(
+                            sql.SQL("LISTEN {}").format(sql.Identifier(channel))
+                        )
+                    for cb in self._reset_callbacks:
+                        cb()
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=self.poll_seconds):
+                            for cb in self._callbacks.get(n.channel, ()):
+                                cb(n.payload)
+            except Exception:
+                logger.warning("LISTEN connection lost, retrying", exc_info=True)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+
+listener = NotificationListener(settings.database_url)
@@ -1,41 +1,129 @@
 # app/db/pool.py
 from __future__ import annotations
 
-from psycopg_pool import ConnectionPool
+from psycopg import AsyncConnection, Connection
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 
 from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.db.statements import statements
 
-_pool: ConnectionPool | None = None
+PRIMARY = "primary"
+
+# Named pools: the primary plus one per read replica (settings.db_replicas)
+_pools: dict[str, ConnectionPool] = {}
+_async_pools: dict[str, AsyncConnectionPool] = {}
+
+
+def _connection_kwargs() -> dict:
+    # Server-side prepared statements (see app/db/statements.py)
+    return {"prepare_threshold": settings.db_prepare_threshold}
+
+
+def _configure(conn: Connection) -> None:
+    # Runs once per new pooled connection, before its first checkout
+    conn.prepared_max = settings.db_prepared_max
+    statements.warm(conn)
+
+
+async def _configure_async(conn: AsyncConnection) -> None:
+    conn.prepared_max = settings.db_prepared_max
+    await statements.warm_async(conn)
+
+
+def conninfos() -> dict[str, str]:
+    if PRIMARY in settings.db_replicas:
+        raise ValueError(f"'{PRIMARY}' is reserved, rename that replica")
+    return {PRIMARY: settings.database_url, **settings.db_replicas}
 
 
 def init_pool() -> None:
-    global _pool
-    if _pool is not None:
+    if _pools:
         return
 
-    _pool = ConnectionPool(
-        conninfo=settings.database_url,
-        min_size=settings.db_pool_min_size,
-        max_size=settings.db_pool_max_size,
-        timeout=settings.db_pool_timeout,
-        # Optional: max_idle can help recycle connections
-        # max_idle=settings.db_pool_max_idle,
-        kwargs={
-            # Prefer server-side prepared statements? Usually optional.
-            # "prepare_threshold": 0,
-        },
-        open=True,  # open pool immediately on startup
-    )
+    for name, conninfo in conninfos().items():
+        _pools[name] = ConnectionPool(
+            conninfo=conninfo,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            timeout=settings.db_pool_timeout,
+            # Optional: max_idle can help recycle connections
+            # max_idle=settings.db_pool_max_idle,
+            kwargs=_connection_kwargs(),
+            configure=_configure,  # prepare hot query shapes on new connections
+            name=name,
+            open=True,  # open pool immediately on startup
+        )
 
 
 def close_pool() -> None:
-    global _pool
-    if _pool is not None:
-        _pool.close()
-        _pool = None
+    while _pools:
+        _pools.popitem()[1].close()
+
+
+def get_pool(name: str = PRIMARY) -> ConnectionPool:
+    pool = _pools.get(name)
+    if pool is None:
+        raise RuntimeError(f"DB pool '{name}' is not initialized")
+    return pool
+
+
+async def init_async_pool() -> None:
+    """
+    Open the asyncio pools used by the async search path (`settings.db_async`).
+    Must be called from the event loop that will serve requests.
+    """
+    if _async_pools:
+        return
+
+    for name, conninfo in conninfos().items():
+        pool = AsyncConnectionPool(
+            conninfo=conninfo,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            timeout=settings.db_pool_timeout,
+            kwargs=_connection_kwargs(),
+            configure=_configure_async,
+            name=name,
+            open=False,  # async pools must be opened explicitly inside the loop
+        )
+        await pool.open()
+        _async_pools[name] = pool
+
+
+async def close_async_pool() -> None:
+    while _async_pools:
+        await _async_pools.popitem()[1].close()
+
+
+def get_async_pool(name: str = PRIMARY) -> AsyncConnectionPool:
+    pool = _async_pools.get(name)
+    if pool is None:
+        raise RuntimeError(f"Async DB pool '{name}' is not initialized")
+    return pool
+
+
+# psycopg_pool stats -> gauges (read at scrape time)
+_POOL_GAUGES = {
+    "pool_size": "Open connections",
+    "pool_available": "Idle connections",
+    "requests_waiting": "Requests waiting for a connection",
+    "pool_max": "Pool max size",
+}
+
+
+def _pool_samples() -> list[Sample]:
+    samples = []
+    for kind, pools in (("sync", _pools), ("async", _async_pools)):
+        for name, pool in list(pools.items()):
+            # Replica pools are told apart by `db`; the primary keeps `pool` only
+            labels = {"pool": kind} if name == PRIMARY else {"pool": kind, "db": name}
+            stats = pool.get_stats()
+            for key, help in _POOL_GAUGES.items():
+                samples.append(
+                    Sample(f"hrms_db_{key}", help, stats.get(key, 0), labels)
+                )
+    return samples
 
 
-def get_pool() -> ConnectionPool:
-    if _pool is None:
-        raise RuntimeError("DB pool is not initialized")
-    return _pool
+register_collector(_pool_samples)
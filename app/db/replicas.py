@@ -0,0 +1,234 @@
+# app/db/replicas.py
+"""
+Read routing across the primary and its streaming replicas.
+
+Search and facet queries run inside `replicas.reading(min_lsn)`. Every checkout made
+there (get_db_conn / get_async_db_conn) goes to the least-loaded replica that
+  - passed its last probe (a standby, answering) recently enough
+  - lags the primary by at most `max_lag_seconds`
+  - has replayed `min_lsn`: the client's read-your-writes watermark, or the
+    position at which the result cache saw the org's versions, so a response is
+    never older than what its cache entry and ETag claim
+  - has a free connection (fewer checkouts in flight than its pool)
+and to the primary when none does. Everything else always uses the primary.
+A probe thread reads each replica's replay position every `check_seconds`.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.db.pool import PRIMARY, get_pool
+
+logger = logging.getLogger(__name__)
+
+_PRIMARY_SQL = "SELECT pg_current_wal_lsn()::text AS lsn"
+# Lag is 0 once everything the primary had written is replayed; otherwise the
+# age of the last replayed transaction
+_REPLICA_SQL = """
+SELECT
+  pg_is_in_recovery() AS standby,
+  pg_last_wal_replay_lsn()::text AS replayed,
+  EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8 AS behind
+"""
+
+
+def parse_lsn(text: str) -> int:
+    """'16/B374D848' -> a comparable integer; ValueError when malformed."""
+    high, sep, low = text.strip().partition("/")
+    if not sep:
+        raise ValueError(f"Invalid LSN: {text!r}")
+    return int(high, 16) << 32 | int(low, 16)
+
+
+@dataclass
+class _Replica:
+    name: str
+    healthy: bool = False  # last probe succeeded and found a standby
+    replayed: int = 0
+    lag: float = float("inf")
+    checked_at: float = float("-inf")
+
+
+# Lowest LSN the reads of the current block must see (None: any)
+_reading: ContextVar[tuple[int | None] | None] = ContextVar("reading", default=None)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        names: list[str],
+        *,
+        max_lag_seconds: float,
+        check_seconds: float,
+        max_in_flight: int,
+    ) -> None:
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.max_in_flight = max_in_flight
+        self._replicas = {name: _Replica(name) for name in names}
+        self._lock = threading.Lock()
+        self._in_flight: Counter[str] = Counter()
+        self._turn = itertools.count()  # rotates ties between idle replicas
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.reads: Counter[str] = Counter()  # routed checkouts per pool
+
+    def _eligible(self, r: _Replica, min_lsn: int | None, now: float) -> bool:
+        return (
+            r.healthy
+            # A stalled probe must not keep serving its last good answer
+            and now - r.checked_at <= 3 * self.check_seconds
+            and r.lag <= self.max_lag_seconds
+            and (min_lsn is None or r.replayed >= min_lsn)
+            and self._in_flight[r.name] < self.max_in_flight
+        )
+
+    def choose(self, min_lsn: int | None = None) -> str:
+        """Pool for a read needing `min_lsn`: a replica if one qualifies, else primary."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._replicas.values())
+            if not candidates:
+                return PRIMARY
+            turn = next(self._turn) % len(candidates)
+            best = None
+            for r in candidates[turn:] + candidates[:turn]:
+                if self._eligible(r, min_lsn, now) and (
+                    best is None or self._in_flight[r.name] < self._in_flight[best]
+                ):
+                    best = r.name
+            return best or PRIMARY
+
+    @contextmanager
+    def reading(self, min_lsn: int | None = None) -> Generator[None, None, None]:
+        """Route the checkouts of the block to a replica that has replayed `min_lsn`."""
+        outer = _reading.get()
+        if outer is not None and outer[0] is not None:
+            min_lsn = outer[0] if min_lsn is None else max(min_lsn, outer[0])
+        token = _reading.set((min_lsn,))
+        try:
+            yield
+        finally:
+            _reading.reset(token)
+
+    @contextmanager
+    def route(self) -> Generator[str, None, None]:
+        """The pool name for one checkout; counted in flight until it returns."""
+        current = _reading.get()
+        if current is None or not self._replicas:
+            yield PRIMARY  # the common case: no lock, no bookkeeping
+            return
+        name = self.choose(current[0])
+        with self._lock:
+            self._in_flight[name] += 1
+            self.reads[name] += 1
+        try:
+            yield name
+        finally:
+            with self._lock:
+                self._in_flight[name] -= 1
+
+    def failed(self, name: str) -> None:
+        # Checkout timed out or could not connect: out until a probe succeeds
+        replica = self._replicas.get(name)
+        if replica is not None:
+            with self._lock:
+                replica.healthy = False
+
+    def probe(self) -> None:
+        """One round: the primary's WAL position, then each replica's replay."""
+        timeout = max(self.check_seconds, 1.0)
+        try:
+            with get_pool(PRIMARY).connection(timeout=timeout) as conn:
+                head = parse_lsn(conn.execute(_PRIMARY_SQL).fetchone()[0])
+        except Exception:
+            logger.warning("Replica probe: primary unavailable", exc_info=True)
+            head = None
+        for replica in self._replicas.values():
+            healthy, lsn, lag = False, 0, float("inf")
+            try:
+                with get_pool(replica.name).connection(timeout=timeout) as conn:
+                    standby, replayed, behind = conn.execute(_REPLICA_SQL).fetchone()
+                if not standby:
+                    logger.warning("Replica %s is not a standby", replica.name)
+                elif replayed is not None:
+                    healthy, lsn = True, parse_lsn(replayed)
+                    if head is not None and lsn >= head:
+                        lag = 0.0
+                    elif behind is not None:
+                        lag = max(0.0, behind)
+            except Exception:
+                logger.warning("Replica %s unavailable", replica.name, exc_info=True)
+            with self._lock:
+                replica.healthy, replica.lag = healthy, lag
+                if healthy:
+                    replica.replayed = lsn
+                replica.checked_at = time.monotonic()
+
+    def start(self) -> None:
+        if self._thread is not None or not self._replicas:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="replica-probe", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_seconds * 2 + 1)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.probe()
+            self._stop.wait(self.check_seconds)
+
+    def stats(self) -> list[Sample]:
+        samples = [
+            Sample(
+                "hrms_db_reads_total",
+                "Search/facet checkouts routed to each pool",
+                count,
+                {"db": name},
+                type="counter",
+            )
+            for name, count in self.reads.items()
+        ]
+        for r in self._replicas.values():
+            samples += [
+                Sample(
+                    "hrms_db_replica_healthy",
+                    "1 when the replica's last probe found a standby",
+                    int(r.healthy),
+                    {"db": r.name},
+                ),
+                Sample(
+                    "hrms_db_replica_lag_seconds",
+                    "Replication lag at the last probe (-1: unknown)",
+                    r.lag if r.lag != float("inf") else -1,
+                    {"db": r.name},
+                ),
+            ]
+        return samples
+
+
+replicas = ReplicaRouter(
+    list(settings.db_replicas),
+    max_lag_seconds=settings.db_replica_max_lag_seconds,
+    check_seconds=settings.db_replica_check_seconds,
+    max_in_flight=settings.db_pool_max_size,
+)
+register_collector(replicas.stats)
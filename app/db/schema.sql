@@ -29,6 +29,18 @@ CREATE INDEX idx_hr_person_org_display_name
 CREATE INDEX idx_hr_person_email_trgm
   ON hr_person USING GIN (email_addr gin_trgm_ops);
 
+-- Typeahead (/employees/suggest): case-insensitive prefix ranges, read in index
+-- order and cut by LIMIT. "C" collation so that [prefix, next prefix) is a
+-- plain range in generic (prepared) plans too, unlike LIKE 'prefix%'.
+CREATE INDEX idx_hr_person_org_name_prefix
+  ON hr_person (org_id, (lower(display_name) COLLATE "C"), employee_id);
+
+CREATE INDEX idx_hr_person_org_last_name_prefix
+  ON hr_person (org_id, (lower(last_name) COLLATE "C"), employee_id);
+
+CREATE INDEX idx_hr_person_org_email_prefix
+  ON hr_person (org_id, (lower(email_addr) COLLATE "C"), employee_id);
+
 -- Company
 CREATE TABLE hr_company (
   org_id     BIGINT NOT NULL,
@@ -76,6 +88,57 @@ CREATE TABLE hr_position (
   PRIMARY KEY (org_id, position_nbr)
 );
 
+-- Reference data version per org. Bumped (and NOTIFYed) on any change to the
+-- reference tables above; the app's in-process refdata cache keys off it.
+CREATE TABLE hr_refdata_version (
+  org_id      BIGINT      PRIMARY KEY,
+  version     BIGINT      NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION hr_refdata_changed_trigger()
+RETURNS trigger AS $$
+DECLARE
+  v_org_id BIGINT;
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    v_org_id := OLD.org_id;
+  ELSE
+    v_org_id := NEW.org_id;
+  END IF;
+
+  INSERT INTO hr_refdata_version (org_id, version)
+  VALUES (v_org_id, 1)
+  ON CONFLICT (org_id) DO UPDATE
+    SET version = hr_refdata_version.version + 1,
+        updated_at = now();
+
+  -- Delivered on commit; identical payloads in one transaction are collapsed
+  PERFORM pg_notify('hr_refdata_changed', v_org_id::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_hr_company_refdata_changed
+AFTER INSERT OR UPDATE OR DELETE ON hr_company
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_department_refdata_changed
+AFTER INSERT OR UPDATE OR DELETE ON hr_department
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_location_refdata_changed
+AFTER INSERT OR UPDATE OR DELETE ON hr_location
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_jobcode_refdata_changed
+AFTER INSERT OR UPDATE OR DELETE ON hr_jobcode
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_position_refdata_changed
+AFTER INSERT OR UPDATE OR DELETE ON hr_position
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_changed_trigger();
+
 -- Employment
 CREATE TABLE hr_employment (
   org_id        BIGINT      NOT NULL,
@@ -122,6 +185,23 @@ CREATE INDEX idx_hr_emp_search_tsv
   ON hr_employment USING GIN (search_tsv);
 
 
+-- FTS document (directory entry), shared by the row trigger below and the
+-- set-based reindex (app/modules/employee/reindex.py)
+CREATE OR REPLACE FUNCTION hr_employment_search_doc(
+  p_name text, p_email text, p_phone text, p_company text, p_dept text,
+  p_loc text, p_job text, p_pos text
+)
+RETURNS tsvector AS $$
+  SELECT setweight(to_tsvector('simple', coalesce(p_name,'')), 'A')
+      || setweight(to_tsvector('simple', coalesce(p_email,'')), 'A')
+      || setweight(to_tsvector('simple', coalesce(p_phone,'')), 'B')
+      || setweight(to_tsvector('simple', coalesce(p_company,'')), 'C')
+      || setweight(to_tsvector('simple', coalesce(p_dept,'')), 'C')
+      || setweight(to_tsvector('simple', coalesce(p_loc,'')), 'C')
+      || setweight(to_tsvector('simple', coalesce(p_job,'')), 'C')
+      || setweight(to_tsvector('simple', coalesce(p_pos,'')), 'C');
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
 -- FTS trigger (directory document)
 CREATE OR REPLACE FUNCTION hr_employment_search_tsv_trigger()
 RETURNS trigger AS $$
@@ -135,6 +215,11 @@ DECLARE
   v_job text;
   v_pos text;
 BEGIN
+  -- Bulk loads (ingest, datagen) build search_tsv set-wise themselves
+  IF current_setting('hrms.skip_search_tsv_trigger', true) = 'on' THEN
+    RETURN NEW;
+  END IF;
+
   SELECT display_name, email_addr, phone
     INTO v_name, v_email, v_phone
   FROM hr_person
@@ -160,21 +245,161 @@ BEGIN
     FROM hr_position
     WHERE org_id = NEW.org_id AND position_nbr = NEW.position_nbr;
 
-  NEW.search_tsv :=
-      setweight(to_tsvector('simple', coalesce(v_name,'')), 'A')
-   || setweight(to_tsvector('simple', coalesce(v_email,'')), 'A')
-   || setweight(to_tsvector('simple', coalesce(v_phone,'')), 'B')
-   || setweight(to_tsvector('simple', coalesce(v_company,'')), 'C')
-   || setweight(to_tsvector('simple', coalesce(v_dept,'')), 'C')
-   || setweight(to_tsvector('simple', coalesce(v_loc,'')), 'C')
-   || setweight(to_tsvector('simple', coalesce(v_job,'')), 'C')
-   || setweight(to_tsvector('simple', coalesce(v_pos,'')), 'C');
+  NEW.search_tsv := hr_employment_search_doc(
+    v_name, v_email, v_phone, v_company, v_dept, v_loc, v_job, v_pos
+  );
 
   RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+-- Only when a column feeding the document changes: status/date updates and
+-- the set-based reindex (which sets search_tsv itself) skip the lookups
 CREATE OR REPLACE TRIGGER trg_hr_employment_search_tsv
-BEFORE INSERT OR UPDATE ON hr_employment
+BEFORE INSERT OR UPDATE OF
+  org_id, employee_id, company, deptid, location, jobcode, position_nbr
+ON hr_employment
 FOR EACH ROW
 EXECUTE FUNCTION hr_employment_search_tsv_trigger();
+
+-- Pending search_tsv recomputes: employees of `org_id` whose `column_name`
+-- equals `code` ('' / '' = the whole org). Filled by the reference-table
+-- triggers below and by the reindex CLI; drained in batches, resumable from
+-- `last_employee_id`. Re-enqueueing a pending key restarts it from scratch.
+CREATE TABLE hr_search_reindex_queue (
+  id               BIGSERIAL   PRIMARY KEY,
+  org_id           BIGINT      NOT NULL,
+  column_name      TEXT        NOT NULL DEFAULT '',
+  code             TEXT        NOT NULL DEFAULT '',
+  last_employee_id UUID,
+  rows_done        BIGINT      NOT NULL DEFAULT 0,
+  enqueued_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+  CONSTRAINT uq_hr_search_reindex_queue UNIQUE (org_id, column_name, code)
+);
+
+CREATE OR REPLACE FUNCTION hr_search_reindex_enqueue(
+  p_org_id bigint, p_column text, p_code text
+)
+RETURNS void AS $$
+  INSERT INTO hr_search_reindex_queue (org_id, column_name, code)
+  VALUES (p_org_id, p_column, p_code)
+  ON CONFLICT (org_id, column_name, code) DO UPDATE
+    SET last_employee_id = NULL,
+        rows_done = 0,
+        enqueued_at = now();
+$$ LANGUAGE sql;
+
+-- A descr change (or a code appearing/disappearing/renamed) changes the
+-- document of every employee referencing the code. TG_ARGV[0] is the
+-- hr_employment column, named like the reference table's key column.
+CREATE OR REPLACE FUNCTION hr_refdata_reindex_trigger()
+RETURNS trigger AS $$
+DECLARE
+  v_column text := TG_ARGV[0];
+  v_old text;
+  v_new text;
+BEGIN
+  -- A bulk load recomputes the affected documents in its own transaction
+  IF current_setting('hrms.skip_search_tsv_trigger', true) = 'on' THEN
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP <> 'INSERT' THEN
+    v_old := to_jsonb(OLD) ->> v_column;
+  END IF;
+  IF TG_OP <> 'DELETE' THEN
+    v_new := to_jsonb(NEW) ->> v_column;
+  END IF;
+
+  IF TG_OP = 'UPDATE'
+     AND OLD.org_id = NEW.org_id
+     AND v_old = v_new
+     AND OLD.descr IS NOT DISTINCT FROM NEW.descr THEN
+    RETURN NULL;  -- e.g. status only
+  END IF;
+
+  IF v_old IS NOT NULL THEN
+    PERFORM hr_search_reindex_enqueue(OLD.org_id, v_column, v_old);
+  END IF;
+  IF v_new IS NOT NULL
+     AND (TG_OP = 'INSERT' OR OLD.org_id <> NEW.org_id OR v_old <> v_new) THEN
+    PERFORM hr_search_reindex_enqueue(NEW.org_id, v_column, v_new);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_hr_company_search_reindex
+AFTER INSERT OR UPDATE OR DELETE ON hr_company
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_reindex_trigger('company');
+
+CREATE OR REPLACE TRIGGER trg_hr_department_search_reindex
+AFTER INSERT OR UPDATE OR DELETE ON hr_department
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_reindex_trigger('deptid');
+
+CREATE OR REPLACE TRIGGER trg_hr_location_search_reindex
+AFTER INSERT OR UPDATE OR DELETE ON hr_location
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_reindex_trigger('location');
+
+CREATE OR REPLACE TRIGGER trg_hr_jobcode_search_reindex
+AFTER INSERT OR UPDATE OR DELETE ON hr_jobcode
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_reindex_trigger('jobcode');
+
+CREATE OR REPLACE TRIGGER trg_hr_position_search_reindex
+AFTER INSERT OR UPDATE OR DELETE ON hr_position
+FOR EACH ROW EXECUTE FUNCTION hr_refdata_reindex_trigger('position_nbr');
+
+-- Employee data version per org. Bumped (and NOTIFYed) once per statement that
+-- writes hr_person or hr_employment rows of the org, so bulk loads and reindex
+-- batches cost one bump, not one per row. Search result caches key off it
+-- (and off hr_refdata_version for descriptors).
+CREATE TABLE hr_org_version (
+  org_id      BIGINT      PRIMARY KEY,
+  version     BIGINT      NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION hr_org_changed_trigger()
+RETURNS trigger AS $$
+DECLARE
+  v_org_id BIGINT;
+BEGIN
+  -- `changed`: the statement's rows (transition table: new rows, old for DELETE);
+  -- orgs in a fixed order so concurrent multi-org statements cannot deadlock
+  FOR v_org_id IN SELECT DISTINCT org_id FROM changed ORDER BY org_id LOOP
+    INSERT INTO hr_org_version (org_id, version)
+    VALUES (v_org_id, 1)
+    ON CONFLICT (org_id) DO UPDATE
+      SET version = hr_org_version.version + 1,
+          updated_at = now();
+
+    PERFORM pg_notify('hr_org_changed', v_org_id::text);
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A trigger with transition tables takes a single event: three per table
+CREATE OR REPLACE TRIGGER trg_hr_person_org_changed_ins
+AFTER INSERT ON hr_person REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_person_org_changed_upd
+AFTER UPDATE ON hr_person REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_person_org_changed_del
+AFTER DELETE ON hr_person REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_employment_org_changed_ins
+AFTER INSERT ON hr_employment REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_employment_org_changed_upd
+AFTER UPDATE ON hr_employment REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
+
+CREATE OR REPLACE TRIGGER trg_hr_employment_org_changed_del
+AFTER DELETE ON hr_employment REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION hr_org_changed_trigger();
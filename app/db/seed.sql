@@ -9,7 +9,9 @@ TRUNCATE TABLE
   hr_department,
   hr_location,
   hr_jobcode,
-  hr_position
+  hr_position,
+  hr_refdata_version,
+  hr_search_reindex_queue
 RESTART IDENTITY CASCADE;
 
 -- 2. REFERENCE DATA
@@ -98,4 +100,8 @@ SELECT
   now() - (p.id_num * interval '1 hour')
 FROM people_data p;
 
-COMMIT;
\ No newline at end of file
+-- Employment rows above were indexed by the row trigger; the reindex work the
+-- reference inserts enqueued is moot
+TRUNCATE TABLE hr_search_reindex_queue;
+
+COMMIT;
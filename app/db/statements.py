@@ -0,0 +1,208 @@
+# app/db/statements.py
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+import psycopg
+from psycopg import AsyncConnection, Connection
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+
+logger = logging.getLogger(__name__)
+
+# org_id used when warming: matches no tenant, so warm-up executions touch no rows
+WARM_ORG_ID = 0
+# psycopg sends the smallest integer type that fits: int2, int4, int8, numeric
+_INT_BOUNDS = (2**15, 2**31, 2**63)
+
+
+def _placeholder(value: Any) -> Any:
+    """
+    A stand-in of the same Postgres type as `value` that reveals nothing of
+    it. The prepared statement is keyed by the parameter types, so a warm-up
+    must send the types real executions send.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        magnitude = abs(value)
+        lower = 0
+        for bound in _INT_BOUNDS:
+            if magnitude < bound:
+                return lower
+            lower = bound
+        return lower
+    if isinstance(value, float):
+        return 0.0
+    if isinstance(value, Decimal):
+        return Decimal(0)
+    if isinstance(value, str):
+        return ""
+    if isinstance(value, bytes):
+        return b""
+    if isinstance(value, UUID):
+        return UUID(int=0)
+    if isinstance(value, datetime):
+        # timestamptz or timestamp, as the original
+        return datetime(2000, 1, 1, tzinfo=None if value.tzinfo is None else UTC)
+    if isinstance(value, date):
+        return date(2000, 1, 1)
+    if isinstance(value, list | tuple):
+        return type(value)(_placeholder(v) for v in value[:1])
+    raise TypeError(f"No warm-up placeholder for {type(value).__name__}")
+
+
+def _warm_params(params: dict[str, Any]) -> dict[str, Any] | None:
+    # None: a parameter of an unknown type, the shape is not warmed
+    try:
+        placeholders = {k: _placeholder(v) for k, v in params.items()}
+    except TypeError:
+        return None
+    return {**placeholders, "org_id": WARM_ORG_ID}
+
+
+@dataclass
+class Statement:
+    sql: str
+    # Placeholders typed like the first-seen params (no request values), with
+    # org_id -> WARM_ORG_ID; None when some type has no placeholder
+    warm_params: dict[str, Any] | None
+    shape: str  # stable, low-cardinality metrics label, e.g. "search-1a2b3c4d"
+    hits: int = 0
+    prepare: bool = True  # False: run unnamed, planned for each execution
+
+
+def _shape_label(key: Hashable, sql: str) -> str:
+    kind = key[0] if isinstance(key, tuple) and key else "sql"
+    return f"{kind}-{hashlib.blake2b(sql.encode(), digest_size=4).hexdigest()}"
+
+
+class StatementRegistry:
+    """
+    Canonical SQL text per query shape (e.g. columns + active filters):
+      - Each shape is built once and always yields the same text, so psycopg's
+        server-side prepared statements (prepare_threshold) get reused
+      - Bounded (LRU) so an unexpected shape explosion can't grow it forever
+      - Tracks hits/misses; the hottest shapes are prepared on every new pooled
+        connection (pool `configure` hook), so they are ready on first checkout
+    """
+
+    def __init__(self, *, max_statements: int = 1024, warm_top: int = 32) -> None:
+        self.max_statements = max_statements
+        self.warm_top = warm_top
+        self._lock = threading.Lock()
+        self._statements: OrderedDict[Hashable, Statement] = OrderedDict()
+        self._shapes: dict[str, str] = {}  # sql -> shape label
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        key: Hashable,
+        build: Callable[[], str],
+        params: dict[str, Any],
+        *,
+        prepare: bool = True,
+    ) -> str:
+        """
+        `prepare=False` is for shapes whose best plan depends on the values
+        (a generic plan would be slow for some), e.g. a selective vs a common
+        full-text term: callers then execute them with `prepare=False` and
+        they are never warmed.
+        """
+        with self._lock:
+            stmt = self._statements.get(key)
+            if stmt is not None:
+                self._statements.move_to_end(key)
+                stmt.hits += 1
+                self.hits += 1
+                return stmt.sql
+            self.misses += 1
+
+        # Build outside the lock; a racing duplicate build is harmless
+        sql = build()
+        stmt = Statement(
+            sql=sql,
+            warm_params=_warm_params(params),
+            shape=_shape_label(key, sql),
+            prepare=prepare,
+        )
+        with self._lock:
+            stmt = self._statements.setdefault(key, stmt)
+            self._shapes[stmt.sql] = stmt.shape
+            while len(self._statements) > self.max_statements:
+                _, evicted = self._statements.popitem(last=False)
+                self._shapes.pop(evicted.sql, None)
+        return stmt.sql
+
+    def shape_of(self, sql: str) -> str:
+        """
+        Metrics label of a registered statement ("other" for ad-hoc SQL).
+        """
+        return self._shapes.get(sql, "other")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "statements": len(self._statements),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _hottest(self) -> list[Statement]:
+        with self._lock:
+            stmts = [
+                s
+                for s in self._statements.values()
+                if s.prepare and s.warm_params is not None
+            ]
+        stmts.sort(key=lambda s: s.hits, reverse=True)
+        return stmts[: self.warm_top]
+
+    def warm(self, conn: Connection) -> None:
+        """
+        Pool `configure` hook: prepare the hottest shapes on a new connection.
+        """
+        if settings.db_prepare_threshold is None:
+            return
+        for stmt in self._hottest():
+            try:
+                conn.execute(stmt.sql, stmt.warm_params, prepare=True)
+            except psycopg.Error:
+                logger.warning("Statement warm-up failed", exc_info=True)
+                conn.rollback()
+        conn.commit()  # pool requires the connection back in idle state
+
+    async def warm_async(self, conn: AsyncConnection) -> None:
+        if settings.db_prepare_threshold is None:
+            return
+        for stmt in self._hottest():
+            try:
+                await conn.execute(stmt.sql, stmt.warm_params, prepare=True)
+            except psycopg.Error:
+                logger.warning("Statement warm-up failed", exc_info=True)
+                await conn.rollback()
+        await conn.commit()
+
+
+statements = StatementRegistry(
+    max_statements=settings.db_statement_cache_size,
+    warm_top=settings.db_warm_statements,
+)
+
+register_collector(
+    lambda: [
+        Sample(f"hrms_statement_registry_{k}", f"Statement registry {k}", v)
+        for k, v in statements.stats().items()
+    ]
+)
@@ -1,15 +1,165 @@
+import time
+from collections.abc import AsyncIterator, Iterator
 from typing import Any
 
-from app.db.deps import get_db_conn
+from psycopg import AsyncCursor, Cursor
 
+from app.core.metrics import record_stage, statement_seconds
+from app.db.deps import get_async_db_conn, get_db_conn, time_left
+from app.db.statements import statements
 
-def fetch_all_dicts(sql: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+Query = tuple[str, dict[str, Any]]
+
+
+def _rows_as_dicts(cur: Cursor, rows: list[tuple[Any, ...]]) -> list[dict[str, Any]]:
+    started = time.perf_counter()
+    cols = [d.name for d in cur.description]
+    out = [dict(zip(cols, row, strict=True)) for row in rows]
+    record_stage("decode", time.perf_counter() - started)
+    return out
+
+
+def _observe_sql(shape: str, started: float) -> None:
+    # Execute + fetch (Postgres time + wire + psycopg row parsing)
+    elapsed = time.perf_counter() - started
+    record_stage("sql", elapsed)
+    statement_seconds.observe((shape,), elapsed)
+
+
+def _statement_timeout_query(seconds: float) -> Query:
+    # is_local=true: only lasts for the current transaction (the pooled conn is reused)
+    return (
+        "SELECT set_config('statement_timeout', %(ms)s, true)",
+        {"ms": str(max(1, int(seconds * 1000)))},
+    )
+
+
+def fetch_all_dicts(
+    sql: str,
+    params: dict[str, Any],
+    *,
+    prepare: bool | None = None,
+    statement_timeout: float | None = None,
+) -> list[dict[str, Any]]:
     """
     Execute a query and return rows as list[dict[column, value]].
-    Intended for read-only queries.
+    Intended for read-only queries. `prepare=False` forces a custom plan.
+    `statement_timeout` (seconds) is set in the same round trip (pipeline);
+    inside `db_deadline()` it is capped by the time left.
     """
     with get_db_conn() as conn:
+        statement_timeout = time_left(statement_timeout)
         with conn.cursor() as cur:
+            started = time.perf_counter()
+            if statement_timeout is None:
+                cur.execute(sql, params, prepare=prepare)
+            else:
+                with conn.pipeline():
+                    conn.execute(*_statement_timeout_query(statement_timeout))
+                    cur.execute(sql, params, prepare=prepare)
+            rows = cur.fetchall()
+            _observe_sql(statements.shape_of(sql), started)
+            return _rows_as_dicts(cur, rows)
+
+
+async def fetch_all_dicts_async(
+    sql: str,
+    params: dict[str, Any],
+    *,
+    prepare: bool | None = None,
+    statement_timeout: float | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Async twin of `fetch_all_dicts`: waits on Postgres without holding a thread.
+    """
+    async with get_async_db_conn() as conn:
+        statement_timeout = time_left(statement_timeout)
+        async with conn.cursor() as cur:
+            started = time.perf_counter()
+            if statement_timeout is None:
+                await cur.execute(sql, params, prepare=prepare)
+            else:
+                async with conn.pipeline():
+                    await conn.execute(*_statement_timeout_query(statement_timeout))
+                    await cur.execute(sql, params, prepare=prepare)
+            rows = await cur.fetchall()
+            _observe_sql(statements.shape_of(sql), started)
+            return _rows_as_dicts(cur, rows)
+
+
+def fetch_many_dicts_pipelined(
+    queries: list[Query], *, statement_timeout: float | None = None
+) -> list[list[dict[str, Any]]]:
+    """
+    Run several read-only queries on ONE pooled connection in pipeline mode:
+    all statements are sent before the first result is awaited, so the batch
+    costs a single round trip. Returns one row list per query, in order.
+    `statement_timeout` (seconds) is enforced server-side on each statement.
+    """
+    with get_db_conn() as conn:
+        statement_timeout = time_left(statement_timeout)
+        with conn.pipeline():
+            if statement_timeout is not None:
+                conn.execute(*_statement_timeout_query(statement_timeout))
+            started = time.perf_counter()
+            cursors: list[Cursor] = []
+            for sql, params in queries:
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                cursors.append(cur)
+            results = [cur.fetchall() for cur in cursors]
+            # One round trip: the batch is timed as a whole
+            _observe_sql("pipeline", started)
+            return [_rows_as_dicts(c, r) for c, r in zip(cursors, results, strict=True)]
+
+
+async def fetch_many_dicts_pipelined_async(
+    queries: list[Query], *, statement_timeout: float | None = None
+) -> list[list[dict[str, Any]]]:
+    """
+    Async twin of `fetch_many_dicts_pipelined`.
+    """
+    async with get_async_db_conn() as conn:
+        statement_timeout = time_left(statement_timeout)
+        async with conn.pipeline():
+            if statement_timeout is not None:
+                await conn.execute(*_statement_timeout_query(statement_timeout))
+            started = time.perf_counter()
+            cursors: list[AsyncCursor] = []
+            for sql, params in queries:
+                cur = conn.cursor()
+                await cur.execute(sql, params)
+                cursors.append(cur)
+            results = [await cur.fetchall() for cur in cursors]
+            _observe_sql("pipeline", started)
+            return [_rows_as_dicts(c, r) for c, r in zip(cursors, results, strict=True)]
+
+
+def iter_dict_batches(
+    sql: str, params: dict[str, Any], *, batch_size: int
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Stream a large result through a server-side (named) cursor, `batch_size` rows
+    at a time, so memory stays constant however many rows match. The pooled
+    connection is held until the generator is exhausted or closed.
+    """
+    with get_db_conn(streaming=True) as conn:
+        with conn.cursor(name="stream") as cur:
+            cur.itersize = batch_size
             cur.execute(sql, params)
-            cols = [d.name for d in cur.description]
-            return [dict(zip(cols, row, strict=True)) for row in cur.fetchall()]
+            while rows := cur.fetchmany(batch_size):
+                yield _rows_as_dicts(cur, rows)
+
+
+async def iter_dict_batches_async(
+    sql: str, params: dict[str, Any], *, batch_size: int
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """
+    Async twin of `iter_dict_batches`.
+    """
+    async with get_async_db_conn(streaming=True) as conn:
+        async with conn.cursor(name="stream") as cur:
+            cur.itersize = batch_size
+            await cur.execute(sql, params)
+            while rows := await cur.fetchmany(batch_size):
+                yield _rows_as_dicts(cur, rows)
@@ -1,17 +1,34 @@
+import hmac
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 
 from app.api.router import api_router
-from app.db.pool import close_pool, init_pool
+from app.core import metrics
+from app.core.config import settings
+from app.db.listener import listener
+from app.db.pool import close_async_pool, close_pool, init_async_pool, init_pool
+from app.db.replicas import replicas
+from app.modules.employee.memindex import indexes as search_indexes
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_pool()
+    if settings.db_async:
+        await init_async_pool()
+    replicas.start()  # replay position probes (DB_REPLICAS)
+    if settings.db_listen:
+        listener.start()  # cache invalidations (LISTEN/NOTIFY)
+    search_indexes.start()  # builds of the opted-in orgs (MEMINDEX_ORGS)
     yield
     # Shutdown
+    search_indexes.stop()
+    listener.stop()
+    replicas.stop()
+    await close_async_pool()
     close_pool()
 
 
@@ -23,6 +40,27 @@ def create_app() -> FastAPI:
     def health():
         return {"ok": True}
 
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        def prometheus_metrics(authorization: str | None = Header(default=None)):
+            # Internals (routes, load, tenants' index sizes): scrapers only
+            if not settings.metrics_token:
+                raise HTTPException(status_code=404, detail="Not Found")
+            expected = f"Bearer {settings.metrics_token}"
+            if not authorization or not hmac.compare_digest(
+                authorization.encode(), expected.encode()
+            ):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid metrics token",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            return PlainTextResponse(
+                metrics.render(), media_type="text/plain; version=0.0.4"
+            )
+
     app.include_router(api_router)
     return app
 
@@ -0,0 +1,75 @@
+# app/modules/employee/cursor.py
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from app.api.errors import bad_request
+from app.core.config import settings
+
+# Opaque keyset cursor:
+#   version(1) | sort(1) | key(8) | employee_id(16) | hmac(12)  -> 51 chars base64url
+# key = updated_at as epoch microseconds (recent) or the float4 rank (relevance),
+# so the next page compares against exactly the value Postgres produced.
+_VERSION = 1
+_SORTS = {"recent": 0, "relevance": 1}
+_SORT_NAMES = {v: k for k, v in _SORTS.items()}
+_BODY = struct.Struct(">BBq16s")
+_RANK = struct.Struct(">f4x")  # rank packed into the 8-byte key slot
+_MAC_SIZE = 12
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+@dataclass(frozen=True)
+class Cursor:
+    sort: str
+    employee_id: uuid.UUID
+    updated_at: datetime | None = None  # sort=recent
+    rank: float | None = None  # sort=relevance
+
+
+def _mac(body: bytes, context: str) -> bytes:
+    # context binds the cursor to its org/sort/query: replaying it elsewhere fails
+    key = settings.cursor_secret.encode()
+    return hmac.new(key, body + context.encode(), hashlib.sha256).digest()[:_MAC_SIZE]
+
+
+def encode_cursor(cursor: Cursor, *, context: str) -> str:
+    if cursor.sort == "relevance":
+        key = struct.unpack(">q", _RANK.pack(cursor.rank))[0]
+    else:
+        key = (cursor.updated_at - _EPOCH) // timedelta(microseconds=1)
+    body = _BODY.pack(_VERSION, _SORTS[cursor.sort], key, cursor.employee_id.bytes)
+    return base64.urlsafe_b64encode(body + _mac(body, context)).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, *, context: str) -> Cursor:
+    """
+    Verify and unpack a cursor; any tampering or reuse across orgs, sort modes
+    or queries is rejected with 400.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError) as err:
+        raise bad_request("Invalid cursor") from err
+    body, mac = raw[: _BODY.size], raw[_BODY.size :]
+    if len(body) != _BODY.size or not hmac.compare_digest(mac, _mac(body, context)):
+        raise bad_request("Invalid cursor")
+
+    version, sort_code, key, employee_id = _BODY.unpack(body)
+    if version != _VERSION or sort_code not in _SORT_NAMES:
+        raise bad_request("Invalid cursor")
+    sort = _SORT_NAMES[sort_code]
+    if sort == "relevance":
+        rank = _RANK.unpack(struct.pack(">q", key))[0]
+        return Cursor(sort=sort, employee_id=uuid.UUID(bytes=employee_id), rank=rank)
+    updated_at = _EPOCH + timedelta(microseconds=key)
+    return Cursor(
+        sort=sort, employee_id=uuid.UUID(bytes=employee_id), updated_at=updated_at
+    )
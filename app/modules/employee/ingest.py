@@ -0,0 +1,561 @@
+# app/modules/employee/ingest.py
+"""
+Bulk ingestion of HR extracts (PeopleSoft-style CSV) for one org.
+
+Each file is streamed into a temp staging table with COPY (parsed and typed by
+Postgres, not row by row in Python), then merged into the live table with one
+set-wise upsert: reference tables first, then hr_person, then hr_employment.
+search_tsv is computed in the employment upsert, plus one UPDATE for the
+employees whose person fields or referenced descriptors changed; the per-row
+triggers are skipped (`hrms.skip_search_tsv_trigger`).
+
+  - Idempotent: rows equal to the live ones are not written (no updated_at
+    bump, no WAL, no cache invalidation), so re-running an extract is a no-op.
+    Within a file the last row of a key wins.
+  - Isolated: every statement is scoped to --org-id and the whole load is one
+    transaction under a per-org advisory lock. A failed load leaves nothing
+    behind; loads of different orgs run in parallel, loads of one org queue.
+  - Partial files: a column missing from a file keeps its live value (new rows
+    get the table default; a new person without NAME gets first + last name,
+    and so does an empty NAME, which otherwise keeps the live one). Headers are matched case-insensitively, with the
+    usual PeopleSoft names accepted (NAME, HIRE_DT, SUPERVISOR_ID, ...).
+
+Files are `<extract>.csv` or `<extract>.csv.gz`, extract being one of
+company, department, location, jobcode, position, person, employment:
+
+    python -m app.modules.employee.ingest --org-id 42 /data/extracts/42/
+    python -m app.modules.employee.ingest --org-id 42 person=p.csv.gz employment=e.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import dict_row
+
+from app.core.config import settings
+from app.modules.org.repository import REFERENCE_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Transaction advisory-lock namespace: one load per org at a time
+_LOCK_NAMESPACE = 7_318_202
+_COPY_CHUNK = 1 << 20
+
+# Staged column types other than text: COPY does the parsing and reports the
+# line of a bad value
+_TYPES = {
+    "birthdate": "date",
+    "last_update_dttm": "timestamptz",
+    "hire_date": "date",
+    "termination_date": "date",
+    "updated_at": "timestamptz",
+}
+
+
+@dataclass(frozen=True)
+class Extract:
+    name: str
+    table: str
+    key: str
+    columns: tuple[str, ...]  # staged columns, key first
+    required: tuple[str, ...]
+    aliases: dict[str, str] = field(default_factory=dict)  # header -> column
+
+    @property
+    def staging(self) -> str:
+        return f"ingest_{self.name}"
+
+
+def _refdata(name: str, table: str, key: str, *extra: str, **aliases: str):
+    return Extract(
+        name, table, key, (key, "descr", *extra, "status"), (key, "descr"), aliases
+    )
+
+
+# Load order: employment references person and the reference tables
+EXTRACTS = {
+    e.name: e
+    for e in (
+        _refdata("company", "hr_company", "company"),
+        _refdata("department", "hr_department", "deptid", "parent_deptid"),
+        _refdata("location", "hr_location", "location", "address", "city", "country"),
+        _refdata("jobcode", "hr_jobcode", "jobcode", "job_family"),
+        _refdata(
+            "position", "hr_position", "position_nbr", "reports_to_posn",
+            reports_to="reports_to_posn",
+        ),
+        Extract(
+            "person",
+            "hr_person",
+            "emplid",
+            (
+                "emplid", "first_name", "last_name", "display_name", "gender",
+                "birthdate", "address", "email_addr", "phone", "last_update_dttm",
+            ),
+            ("emplid", "first_name", "last_name", "email_addr"),
+            {
+                "name": "display_name",
+                "sex": "gender",
+                "address1": "address",
+                "lastupddttm": "last_update_dttm",
+            },
+        ),
+        Extract(
+            "employment",
+            "hr_employment",
+            "emplid",
+            (
+                "emplid", "empl_status", "hire_date", "termination_date",
+                "company", "deptid", "location", "jobcode", "position_nbr",
+                "reports_to_emplid", "updated_at",
+            ),
+            ("emplid",),
+            {
+                "hire_dt": "hire_date",
+                "termination_dt": "termination_date",
+                "supervisor_id": "reports_to_emplid",
+                "lastupddttm": "updated_at",
+            },
+        ),
+    )
+}  # fmt: skip
+
+
+@dataclass
+class TableStats:
+    extract: str
+    staged: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0  # employment rows whose emplid has no person
+    seconds: float = 0.0
+
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _staged_columns(extract: Extract, header: list[str], path: str) -> list[str]:
+    # COPY column list for the header: known columns by name or alias, anything
+    # else into a throwaway `_unused_<n>` column
+    out = []
+    for i, raw in enumerate(header):
+        name = raw.strip().lower()
+        name = extract.aliases.get(name, name)
+        out.append(name if name in extract.columns else f"_unused_{i}")
+    dupes = {c for c in out if out.count(c) > 1}
+    if dupes:
+        raise ValueError(f"{path}: duplicate column(s) {sorted(dupes)}")
+    missing = [c for c in extract.required if c not in out]
+    if missing:
+        raise ValueError(f"{path}: missing required column(s) {missing}")
+    return out
+
+
+def stage(
+    cur: psycopg.Cursor,
+    extract: Extract,
+    path: str,
+    *,
+    delimiter: str = ",",
+    encoding: str = "UTF8",
+) -> list[str]:
+    """
+    Stream one file into its temp staging table (dropped at commit). Returns
+    the extract columns present in the file.
+    """
+    with _open(path) as f:
+        header_line = f.readline().decode("utf-8-sig", errors="replace")
+        header = next(csv.reader([header_line], delimiter=delimiter), [])
+        columns = _staged_columns(extract, header, path)
+        definitions = [
+            sql.SQL("{} {}").format(sql.Identifier(c), sql.SQL(_TYPES.get(c, "text")))
+            for c in (*extract.columns, *(c for c in columns if c.startswith("_")))
+        ]
+        cur.execute(
+            sql.SQL("CREATE TEMP TABLE {} (_line bigserial, {}) ON COMMIT DROP").format(
+                sql.Identifier(extract.staging), sql.SQL(", ").join(definitions)
+            )
+        )
+        copy_sql = sql.SQL(
+            "COPY {} ({}) FROM STDIN (FORMAT csv, DELIMITER {}, ENCODING {})"
+        ).format(
+            sql.Identifier(extract.staging),
+            sql.SQL(", ").join(map(sql.Identifier, columns)),
+            sql.Literal(delimiter),
+            sql.Literal(encoding),
+        )
+        with cur.copy(copy_sql) as copy:
+            while chunk := f.read(_COPY_CHUNK):
+                copy.write(chunk)
+    return [c for c in extract.columns if c in columns]
+
+
+# `upserted` must return (xmax = 0) AS inserted
+_COUNTS = """
+SELECT count(*) FILTER (WHERE inserted) AS inserted,
+       count(*) FILTER (WHERE NOT inserted) AS updated
+FROM upserted
+"""
+
+
+def _lock_key(org_id: int) -> int:
+    # Single-bigint form: org_id is a bigint and would not fit the (int, int)
+    # one. A hash collision only makes two orgs' loads queue
+    digest = hashlib.blake2b(
+        f"{_LOCK_NAMESPACE}:{org_id}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _changed(columns: list[str]) -> str:
+    # NULL-safe row comparison: no write (and no trigger) for identical rows
+    live = ", ".join(f"t.{c}" for c in columns)
+    new = ", ".join(f"EXCLUDED.{c}" for c in columns)
+    return f"({live}) IS DISTINCT FROM ({new})"
+
+
+def _refdata_sql(extract: Extract, present: list[str]) -> str:
+    values = [c for c in present if c != extract.key]
+    sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in values)
+    return f"""
+    WITH upserted AS (
+      INSERT INTO {extract.table} AS t (org_id, {", ".join(present)})
+      SELECT DISTINCT ON ({extract.key}) %(org_id)s, {", ".join(present)}
+      FROM {extract.staging}
+      WHERE {extract.key} IS NOT NULL
+      ORDER BY {extract.key}, _line DESC
+      ON CONFLICT (org_id, {extract.key}) DO UPDATE SET {sets}
+      WHERE {_changed(values)}
+      RETURNING (t.xmax = 0) AS inserted
+    )
+    {_COUNTS}
+    """
+
+
+def _changed_codes_sql(extract: Extract) -> str:
+    # Codes whose documents change: new codes and descr changes (not status)
+    return f"""
+    INSERT INTO ingest_changed_refs (column_name, code)
+    SELECT DISTINCT '{extract.key}', s.{extract.key}
+    FROM {extract.staging} s
+    LEFT JOIN {extract.table} t
+      ON t.org_id = %(org_id)s AND t.{extract.key} = s.{extract.key}
+    WHERE s.{extract.key} IS NOT NULL AND t.descr IS DISTINCT FROM s.descr
+    """
+
+
+def _person_sql(present: list[str]) -> str:
+    exprs = {c: f"s.{c}" for c in present}
+    if "last_update_dttm" in present:
+        exprs["last_update_dttm"] = "coalesce(s.last_update_dttm, now())"
+    # display_name is NOT NULL: an empty or missing NAME keeps the live value
+    # and is only derived from the names for new people
+    given = ["s.display_name"] if "display_name" in present else []
+    exprs["display_name"] = (
+        f"coalesce({', '.join(given + ['cur.display_name'])},"
+        " s.first_name || ' ' || s.last_name)"
+    )
+    values = [c for c in exprs if c not in ("emplid", "last_update_dttm")]
+    touched = "EXCLUDED.last_update_dttm" if "last_update_dttm" in present else "now()"
+    return f"""
+    WITH upserted AS (
+      INSERT INTO hr_person AS t (org_id, {", ".join(exprs)})
+      SELECT DISTINCT ON (s.emplid) %(org_id)s, {", ".join(exprs.values())}
+      FROM ingest_person s
+      LEFT JOIN hr_person cur
+        ON cur.org_id = %(org_id)s AND cur.emplid = s.emplid
+      WHERE s.emplid IS NOT NULL
+      ORDER BY s.emplid, s._line DESC
+      ON CONFLICT (org_id, emplid) DO UPDATE
+      SET {", ".join(f"{c} = EXCLUDED.{c}" for c in values)},
+          last_update_dttm = {touched}
+      WHERE {_changed(values)}
+      RETURNING t.employee_id, (t.xmax = 0) AS inserted
+    ),
+    changed AS (
+      -- Their documents are rebuilt after the employment upsert
+      INSERT INTO ingest_changed_people (employee_id)
+      SELECT employee_id FROM upserted WHERE NOT inserted
+    )
+    {_COUNTS}
+    """
+
+
+_EMPLOYMENT_VALUES = (
+    "empl_status", "hire_date", "termination_date", "company", "deptid",
+    "location", "jobcode", "position_nbr", "reports_to_employee_id",
+)  # fmt: skip
+
+
+def _employment_sql(present: list[str]) -> str:
+    """
+    Employment upsert with search_tsv built from the row's final values: a
+    column the file does not carry comes from the live row (`cur`), so the
+    document is right for partial extracts too.
+    """
+    final = {c: (f"s.{c}" if c in present else f"cur.{c}") for c in _EMPLOYMENT_VALUES}
+    final["reports_to_employee_id"] = (
+        "m.employee_id"
+        if "reports_to_emplid" in present
+        else "cur.reports_to_employee_id"
+    )
+    final["empl_status"] = f"coalesce({final['empl_status']}, 'A')"
+    columns = [*_EMPLOYMENT_VALUES, "search_tsv"]
+    if "updated_at" in present:
+        final["updated_at"] = "coalesce(s.updated_at, now())"
+        updated_at = "EXCLUDED.updated_at"
+        compared = [*columns, "updated_at"]
+    else:
+        final["updated_at"] = "now()"
+        # Only a change to the employment record itself moves it in the
+        # (updated_at DESC) order, not a rebuilt document
+        updated_at = (
+            f"CASE WHEN {_changed(list(_EMPLOYMENT_VALUES))}"
+            " THEN now() ELSE t.updated_at END"
+        )
+        compared = columns
+    final["search_tsv"] = """hr_employment_search_doc(
+          p.display_name, p.email_addr, p.phone,
+          c.descr, d.descr, l.descr, j.descr, ps.descr
+        )"""
+    return f"""
+    WITH upserted AS (
+      INSERT INTO hr_employment AS t (org_id, employee_id, {", ".join(final)})
+      SELECT DISTINCT ON (s.emplid) %(org_id)s, p.employee_id, {", ".join(final.values())}
+      FROM ingest_employment s
+      JOIN hr_person p ON p.org_id = %(org_id)s AND p.emplid = s.emplid
+      LEFT JOIN hr_employment cur
+        ON cur.org_id = %(org_id)s AND cur.employee_id = p.employee_id
+      LEFT JOIN hr_person m
+        ON m.org_id = %(org_id)s AND m.emplid = s.reports_to_emplid
+      LEFT JOIN hr_company c
+        ON c.org_id = %(org_id)s AND c.company = {final["company"]}
+      LEFT JOIN hr_department d
+        ON d.org_id = %(org_id)s AND d.deptid = {final["deptid"]}
+      LEFT JOIN hr_location l
+        ON l.org_id = %(org_id)s AND l.location = {final["location"]}
+      LEFT JOIN hr_jobcode j
+        ON j.org_id = %(org_id)s AND j.jobcode = {final["jobcode"]}
+      LEFT JOIN hr_position ps
+        ON ps.org_id = %(org_id)s AND ps.position_nbr = {final["position_nbr"]}
+      ORDER BY s.emplid, s._line DESC
+      ON CONFLICT (org_id, employee_id) DO UPDATE
+      SET {", ".join(f"{c} = EXCLUDED.{c}" for c in columns)},
+          updated_at = {updated_at}
+      WHERE {_changed(compared)}
+      RETURNING (t.xmax = 0) AS inserted
+    )
+    {_COUNTS}
+    """
+
+
+_UNKNOWN_EMPLOYEES_SQL = """
+SELECT count(DISTINCT s.emplid) AS skipped
+FROM ingest_employment s
+WHERE NOT EXISTS (
+  SELECT 1 FROM hr_person p WHERE p.org_id = %(org_id)s AND p.emplid = s.emplid
+)
+"""
+
+# Employees whose document changed through their person row or a referenced
+# descriptor, minus the ones the employment upsert already rebuilt
+_CHANGED_REFS = "".join(
+    f"""
+      OR e.{column} IN (
+        SELECT code FROM ingest_changed_refs WHERE column_name = '{column}'
+      )"""
+    for column in REFERENCE_TABLES
+)
+
+_REFRESH_DOCS_SQL = """
+WITH docs AS MATERIALIZED (
+  SELECT
+    e.employee_id,
+    hr_employment_search_doc(
+      p.display_name, p.email_addr, p.phone,
+      c.descr, d.descr, l.descr, j.descr, ps.descr
+    ) AS doc
+  FROM hr_employment e
+  LEFT JOIN hr_person p
+    ON p.org_id = e.org_id AND p.employee_id = e.employee_id
+  LEFT JOIN hr_company c ON c.org_id = e.org_id AND c.company = e.company
+  LEFT JOIN hr_department d ON d.org_id = e.org_id AND d.deptid = e.deptid
+  LEFT JOIN hr_location l ON l.org_id = e.org_id AND l.location = e.location
+  LEFT JOIN hr_jobcode j ON j.org_id = e.org_id AND j.jobcode = e.jobcode
+  LEFT JOIN hr_position ps
+    ON ps.org_id = e.org_id AND ps.position_nbr = e.position_nbr
+  WHERE e.org_id = %(org_id)s
+    AND (
+      e.employee_id IN (SELECT employee_id FROM ingest_changed_people){changed_refs}
+    ){not_staged}
+)
+UPDATE hr_employment e
+SET search_tsv = docs.doc
+FROM docs
+WHERE e.org_id = %(org_id)s
+  AND e.employee_id = docs.employee_id
+  AND e.search_tsv IS DISTINCT FROM docs.doc
+"""
+
+_NOT_STAGED = """
+    AND NOT EXISTS (SELECT 1 FROM ingest_employment s WHERE s.emplid = p.emplid)"""
+
+
+def ingest(
+    conn: psycopg.Connection,
+    org_id: int,
+    files: dict[str, str],
+    *,
+    delimiter: str = ",",
+    encoding: str = "UTF8",
+) -> tuple[list[TableStats], int]:
+    """
+    Load `files` ({extract name: path}) into `org_id` in one transaction.
+    Returns per-extract stats and the number of documents rebuilt for
+    person / reference-data changes.
+    """
+    unknown = set(files) - set(EXTRACTS)
+    if unknown:
+        raise ValueError(f"Unknown extract(s): {sorted(unknown)}")
+    params = {"org_id": org_id}
+    stats: list[TableStats] = []
+    with conn.transaction(), conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_lock_key(org_id),))
+        cur.execute("SET LOCAL hrms.skip_search_tsv_trigger = on")
+        cur.execute(
+            "CREATE TEMP TABLE ingest_changed_refs (column_name text, code text)"
+            " ON COMMIT DROP"
+        )
+        cur.execute(
+            "CREATE TEMP TABLE ingest_changed_people (employee_id uuid) ON COMMIT DROP"
+        )
+
+        for name, extract in EXTRACTS.items():
+            if name not in files:
+                continue
+            started = time.perf_counter()
+            present = stage(
+                cur, extract, files[name], delimiter=delimiter, encoding=encoding
+            )
+            table = TableStats(name, staged=cur.rowcount)
+            # Fresh stats on the staged rows, or the merge joins plan blind
+            cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(extract.staging)))
+            if name == "person":
+                cur.execute(_person_sql(present), params)
+            elif name == "employment":
+                table.skipped = cur.execute(_UNKNOWN_EMPLOYEES_SQL, params).fetchone()[
+                    "skipped"
+                ]
+                cur.execute(_employment_sql(present), params)
+            else:
+                cur.execute(_changed_codes_sql(extract), params)
+                cur.execute(_refdata_sql(extract, present), params)
+            counts = cur.fetchone()
+            table.inserted, table.updated = counts["inserted"], counts["updated"]
+            table.seconds = time.perf_counter() - started
+            stats.append(table)
+            logger.info(
+                "ingest org=%s %s: %d rows staged, %d inserted, %d updated%s (%.1fs)",
+                org_id,
+                name,
+                table.staged,
+                table.inserted,
+                table.updated,
+                f", {table.skipped} unknown emplid(s) skipped" if table.skipped else "",
+                table.seconds,
+            )
+
+        started = time.perf_counter()
+        # A first load of an org leaves the planner estimating ~1 row per org:
+        # refresh the stats of what was written before joining on it
+        written = [EXTRACTS[t.extract].table for t in stats if t.inserted + t.updated]
+        cur.execute(
+            sql.SQL("ANALYZE {}").format(
+                sql.SQL(", ").join(
+                    map(
+                        sql.Identifier,
+                        ["ingest_changed_refs", "ingest_changed_people", *written],
+                    )
+                )
+            )
+        )
+        cur.execute(
+            _REFRESH_DOCS_SQL.format(
+                changed_refs=_CHANGED_REFS,
+                not_staged=_NOT_STAGED if "employment" in files else "",
+            ),
+            params,
+        )
+        refreshed = cur.rowcount
+        logger.info(
+            "ingest org=%s: %d search documents rebuilt (%.1fs)",
+            org_id,
+            refreshed,
+            time.perf_counter() - started,
+        )
+    return stats, refreshed
+
+
+def _find_files(paths: list[str]) -> dict[str, str]:
+    files = {}
+    for arg in paths:
+        if "=" in arg:
+            name, path = arg.split("=", 1)
+            files[name] = path
+            continue
+        if not os.path.isdir(arg):
+            raise ValueError(f"{arg}: expected a directory or <extract>=<path>")
+        for name in EXTRACTS:
+            for suffix in (".csv", ".csv.gz"):
+                path = os.path.join(arg, name + suffix)
+                if os.path.exists(path):
+                    files[name] = path
+    if not files:
+        raise ValueError(f"No extract files in {paths}")
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--org-id", type=int, required=True)
+    parser.add_argument("files", nargs="+", help="directory or <extract>=<path>")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--encoding", default="UTF8", help="Postgres encoding name")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(message)s")
+    files = _find_files(args.files)
+    started = time.perf_counter()
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        stats, _ = ingest(
+            conn, args.org_id, files, delimiter=args.delimiter, encoding=args.encoding
+        )
+        # Past the commit: searches sent with X-Read-After: <lsn> see this load
+        lsn = conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+    elapsed = time.perf_counter() - started
+    rows = sum(s.staged for s in stats)
+    logger.info(
+        "ingest org=%s: %d rows in %.1fs (%.0f rows/min), committed by LSN %s",
+        args.org_id,
+        rows,
+        elapsed,
+        rows / max(elapsed, 1e-9) * 60,
+        lsn,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,817 @@
+# app/modules/employee/memindex.py
+"""
+Opt-in in-process search index for hot orgs (`MEMINDEX_ORGS`).
+
+The repository's search_employees / facet_counts answer from here when the
+org's index is loaded and the request is one it can answer exactly; anything
+else (and every request while the first build runs) goes to Postgres, which
+stays the source of truth. Per org:
+
+  - slots: one per employment row, in (updated_at, employee_id) order, so
+    "most recent first" is a backwards walk and a keyset cursor a bisect
+  - postings: lexeme -> slots, with the positions and A/B/C/D weights that
+    hr_employment_search_doc wrote, in flat arrays
+  - filters: column -> code -> bitmap of slots (Python ints), ANDed for
+    filters and counted with int.bit_count() for facets
+
+Documents are read from search_tsv itself and ranked like Postgres' ts_rank
+(same float4 arithmetic), so pages, ranks and cursors are exactly those of
+the SQL path. Only queries websearch_to_tsquery reads as plain AND-ed words
+are answered here.
+
+Freshness: an index records the org's (hr_org_version, hr_refdata_version)
+as read before its load, and is never modified once built (searches read it
+without a lock). NOTIFY hr_org_changed / hr_refdata_changed, or the version
+check every `MEMINDEX_REFRESH_SECONDS` when no NOTIFY arrives, marks it stale:
+requests go to Postgres until a rebuild has swapped in a current one (after a
+reference-data reindex has drained). Searches made under `reading(versions)`
+(the versions the result cache and ETag stand for) are only answered by an
+index at least that new. The full build also runs every
+`MEMINDEX_RELOAD_SECONDS`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import itertools
+import logging
+import math
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.db.listener import listener
+from app.db.utils import fetch_all_dicts, iter_dict_batches
+from app.modules.employee.result_cache import ORG_CHANNEL
+from app.modules.org.service import REFDATA_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Values kept per slot: hr_person columns, then the hr_employment codes that
+# get filter bitmaps (repository.FILTER_COLUMNS)
+PERSON_COLUMNS = ("first_name", "last_name", "display_name", "email_addr", "phone")
+CODE_COLUMNS = (
+    "empl_status",
+    "company",
+    "deptid",
+    "location",
+    "jobcode",
+    "position_nbr",
+)
+_COLUMNS = (*PERSON_COLUMNS, *CODE_COLUMNS)
+
+_TERM_BITMAPS = 256  # per-index cache of word -> bitmap (facets with q)
+# Relevance over more matches goes to SQL: ts_rank in C beats this port there
+_MAX_RANKED = 5000
+
+_LOAD_SQL = f"""
+SELECT
+  e.employee_id,
+  e.updated_at,
+  {", ".join(f"p.{c}" for c in PERSON_COLUMNS)},
+  {", ".join(f"e.{c}" for c in CODE_COLUMNS)},
+  e.search_tsv::text AS doc
+FROM hr_employment e
+JOIN hr_person p
+  ON p.org_id = e.org_id AND p.employee_id = e.employee_id
+WHERE e.org_id = %(org_id)s
+ORDER BY e.updated_at, e.employee_id
+"""
+
+# The versions as org_repository reads them (a missing row is 0)
+_STATE_SQL = """
+SELECT
+  COALESCE(
+    (SELECT version FROM hr_org_version WHERE org_id = %(org_id)s), 0
+  ) AS data_version,
+  COALESCE(
+    (SELECT version FROM hr_refdata_version WHERE org_id = %(org_id)s), 0
+  ) AS refdata_version,
+  EXISTS (
+    SELECT 1 FROM hr_search_reindex_queue WHERE org_id = %(org_id)s
+  ) AS reindexing
+"""
+
+# Facet ties are ordered by code in the database collation
+_COLLATION_SQL = """
+SELECT array_agg(c ORDER BY c) AS codes FROM unnest(%(codes)s::text[]) AS c
+"""
+
+# ts_rank, ported from Postgres (tsrank.c) with its float4 rounding
+
+_FLOAT4 = struct.Struct("f")
+
+
+def _f4(x: float) -> float:
+    return _FLOAT4.unpack(_FLOAT4.pack(x))[0]
+
+
+_WEIGHTS = tuple(_f4(w) for w in (0.1, 0.2, 0.4, 1.0))  # D, C, B, A
+_WEIGHT_CODES = {"A": 3, "B": 2, "C": 1, "D": 0}
+
+
+def _word_distance(dist: int) -> float:
+    if dist > 100:
+        return _f4(1e-30)
+    return _f4(1.0 / (1.005 + 0.05 * math.exp(dist / 1.5 - 2)))
+
+
+def _rank_or(vectors: list[array]) -> float:
+    res = 0.0
+    for positions in vectors:
+        resj, wjm, jm = 0.0, -1.0, 0
+        for j, p in enumerate(positions):
+            w = _WEIGHTS[p & 3]
+            resj = _f4(resj + _f4(w / ((j + 1) * (j + 1))))
+            if w > wjm:
+                wjm, jm = w, j
+        x = _f4(_f4(wjm + resj) - _f4(wjm / ((jm + 1) * (jm + 1))))
+        res = _f4(res + x / 1.64493406685)
+    return _f4(res / len(vectors))
+
+
+def _rank_and(vectors: list[array]) -> float:
+    res = -1.0
+    for i, post in enumerate(vectors):
+        for ct in vectors[:i]:
+            for pl in post:
+                for pp in ct:
+                    dist = abs((pl >> 2) - (pp >> 2))
+                    if not dist:
+                        continue
+                    curw = _f4(
+                        math.sqrt(
+                            _f4(
+                                _f4(_WEIGHTS[pl & 3] * _WEIGHTS[pp & 3])
+                                * _word_distance(dist)
+                            )
+                        )
+                    )
+                    res = curw if res < 0 else _f4(1.0 - (1.0 - res) * (1.0 - curw))
+    return res
+
+
+def ts_rank(vectors: list[array], conjunction: bool) -> float:
+    """
+    ts_rank(search_tsv, query) with default weights and normalization.
+    `vectors`: encoded positions (pos << 2 | weight) of each distinct query
+    word in the document, in the query's item order; `conjunction`: the
+    query has more than one word (an AND at its root).
+    """
+    res = _rank_and(vectors) if conjunction and len(vectors) > 1 else _rank_or(vectors)
+    return _f4(1e-20) if res < 0 else res
+
+
+def as_real(x: float) -> float:
+    """
+    A float4 value as the SQL path receives it: parsed from the shortest text
+    that round-trips (float4out), not the exact binary value.
+    """
+    for digits in range(1, 10):
+        text = f"{x:.{digits}g}"
+        if _f4(float(text)) == x:
+            return float(text)
+    return x
+
+
+# websearch_to_tsquery('simple', q) reads these as one lexeme each; digits
+# followed by letters may be split as a number ("9e6cw" -> '9e6' <-> 'cw')
+_PLAIN_WORD = re.compile(r"[a-z][a-z0-9]*|[0-9]+")
+
+
+def query_words(q: str) -> tuple[str, ...] | None:
+    """
+    The AND-ed lexemes of `q` when websearch_to_tsquery would read it as plain
+    words, else None (quotes, OR, negation, punctuation, non-ASCII, ...).
+    """
+    if not q.isascii():
+        return None
+    words = tuple(q.lower().split())
+    if not words or (len(words) > 1 and "or" in words):
+        return None
+    if not all(len(w) < 256 and _PLAIN_WORD.fullmatch(w) for w in words):
+        return None
+    return words
+
+
+_LEXEME = re.compile(r"'((?:[^'\\]|''|\\.)*)'(?::([0-9A-D,]+))?")
+_UNESCAPE = re.compile(r"''|\\(.)")
+
+
+def _parse_tsvector(text: str) -> Iterator[tuple[str, list[int]]]:
+    # tsvector output: 'lexeme':3A,7 ... (quotes and backslashes doubled)
+    for m in _LEXEME.finditer(text):
+        lexeme = _UNESCAPE.sub(lambda u: u.group(1) or "'", m.group(1))
+        encoded = []
+        for p in (m.group(2) or "").split(","):
+            if not p:
+                continue
+            if p[-1] in _WEIGHT_CODES:
+                encoded.append(int(p[:-1]) << 2 | _WEIGHT_CODES[p[-1]])
+            else:
+                encoded.append(int(p) << 2)
+        yield lexeme, encoded
+
+
+def _bitmap(slots: Iterable[int], size: int) -> int:
+    buf = bytearray((size + 7) // 8)
+    for s in slots:
+        buf[s >> 3] |= 1 << (s & 7)
+    return int.from_bytes(buf, "little")
+
+
+class _Postings:
+    """Slots of one lexeme (ascending) and each one's encoded positions."""
+
+    __slots__ = ("slots", "starts", "positions")
+
+    def __init__(self) -> None:
+        self.slots = array("I")
+        self.starts = array("I")
+        self.positions = array("H")
+
+    def add(self, slot: int, positions: list[int]) -> None:
+        self.slots.append(slot)
+        self.starts.append(len(self.positions))
+        self.positions.extend(positions)
+
+    def __contains__(self, slot: int) -> bool:
+        i = bisect.bisect_left(self.slots, slot)
+        return i < len(self.slots) and self.slots[i] == slot
+
+    def positions_of(self, slot: int) -> array:
+        i = bisect.bisect_left(self.slots, slot)
+        end = self.starts[i + 1] if i + 1 < len(self.starts) else len(self.positions)
+        return self.positions[self.starts[i] : end]
+
+
+class _Single:
+    """
+    Postings of a lexeme in a single document, which is most of them (email
+    addresses, phone numbers, rare names): a fraction of _Postings' size.
+    """
+
+    __slots__ = ("slot", "positions")
+
+    def __init__(self, slot: int, positions: list[int]) -> None:
+        self.slot = slot
+        self.positions = tuple(positions)
+
+    @property
+    def slots(self) -> tuple[int]:
+        return (self.slot,)
+
+    def __contains__(self, slot: int) -> bool:
+        return slot == self.slot
+
+    def positions_of(self, slot: int) -> tuple[int, ...]:
+        return self.positions
+
+    def postings(self) -> _Postings:
+        postings = _Postings()
+        postings.add(self.slot, list(self.positions))
+        return postings
+
+
+@dataclass(frozen=True)
+class FacetRequest:
+    dimension: str
+    column: str
+    limit: int
+    q: str  # stripped facet_q ("" = none)
+    codes: tuple[str, ...]  # codes whose descr matches q
+
+
+class OrgIndex:
+    def __init__(self, org_id: int, versions: tuple[int, int]) -> None:
+        self.org_id = org_id
+        self.versions = versions  # (data, refdata) read before the load
+        self.keys: list[tuple[datetime, UUID]] = []  # per slot, ascending
+        self.values: dict[str, list[Any]] = {c: [] for c in _COLUMNS}
+        self.postings: dict[str, _Postings | _Single] = {}
+        self.alive = 0  # every slot; the base of each mask
+        self.filters: dict[str, dict[str | None, int]] = {c: {} for c in CODE_COLUMNS}
+        self.collation: dict[str, int] = {}
+        self.stale = False  # the org changed since `versions` (SQL until rebuilt)
+        self.loaded_at = self.checked_at = time.monotonic()
+        self._term_bitmaps: dict[str, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.keys)
+
+    def covers(self, versions: tuple[int, int]) -> bool:
+        return all(
+            have >= want for have, want in zip(self.versions, versions, strict=True)
+        )
+
+    @classmethod
+    def build(
+        cls, org_id: int, versions: tuple[int, int], batches: Iterable[list[dict]]
+    ) -> OrgIndex:
+        index = cls(org_id, versions)
+        bits: dict[str, dict[str | None, list[int]]] = {c: {} for c in CODE_COLUMNS}
+        for rows in batches:
+            for row in rows:
+                slot = index._append(row)
+                for c in CODE_COLUMNS:
+                    bits[c].setdefault(row[c], []).append(slot)
+        n = len(index.keys)
+        index.alive = (1 << n) - 1
+        for c, codes in bits.items():
+            index.filters[c] = {code: _bitmap(s, n) for code, s in codes.items()}
+        return index
+
+    def _append(self, row: dict[str, Any]) -> int:
+        slot = len(self.keys)
+        key = (row["updated_at"], row["employee_id"])
+        self.keys.append(key)
+        for c in PERSON_COLUMNS:
+            self.values[c].append(row[c])
+        for c in CODE_COLUMNS:  # one string per distinct code, not per row
+            code = row[c]
+            self.values[c].append(None if code is None else sys.intern(code))
+        for lexeme, positions in _parse_tsvector(row["doc"] or ""):
+            postings = self.postings.get(lexeme)
+            if postings is None:
+                self.postings[lexeme] = _Single(slot, positions)
+                continue
+            if isinstance(postings, _Single):
+                postings = self.postings[lexeme] = postings.postings()
+            postings.add(slot, positions)
+        return slot
+
+    def codes(self) -> set[str]:
+        return {code for c in CODE_COLUMNS for code in self.filters[c] if code}
+
+    def _postings(self, words: tuple[str, ...]) -> list[_Postings | _Single] | None:
+        # Distinct words in query item order (sorted like SortAndUniqItems)
+        postings = []
+        for w in sorted(set(words), key=str.encode):
+            p = self.postings.get(w)
+            if p is None:
+                return None
+            postings.append(p)
+        return postings
+
+    def _mask(self, filters: dict[str, str], skip: str | None = None) -> int:
+        mask = self.alive
+        for column, code in filters.items():
+            if column != skip:
+                mask &= self.filters[column].get(code, 0)
+        return mask
+
+    def _matches(
+        self, mask: int, postings: list[_Postings | _Single], hi: int
+    ) -> Iterator[int]:
+        # Matching slots below `hi`, most recent first
+        bits = mask.to_bytes((len(self.keys) + 7) // 8, "little")
+        if postings:
+            driver, *others = sorted(postings, key=lambda p: len(p.slots))
+            slots = driver.slots
+            for j in range(bisect.bisect_left(slots, hi) - 1, -1, -1):
+                s = slots[j]
+                if bits[s >> 3] >> (s & 7) & 1 and all(s in p for p in others):
+                    yield s
+            return
+        for i in range((hi - 1) >> 3, -1, -1):
+            byte = bits[i]
+            if not byte:
+                continue
+            for bit in range(7, -1, -1):
+                s = i << 3 | bit
+                if byte >> bit & 1 and s < hi:
+                    yield s
+
+    def _rank(
+        self, slot: int, postings: list[_Postings | _Single], conjunction: bool
+    ) -> float:
+        return ts_rank([p.positions_of(slot) for p in postings], conjunction)
+
+    def _row(self, slot: int, keys: tuple[str, ...], rank: float | None) -> dict:
+        updated_at, employee_id = self.keys[slot]
+        row: dict[str, Any] = {"employee_id": employee_id, "updated_at": updated_at}
+        for k in keys:
+            row[k] = self.values[k][slot]
+        row["rank"] = rank
+        return row
+
+    def search(
+        self,
+        *,
+        words: tuple[str, ...],
+        filters: dict[str, str],
+        limit: int,
+        keys: tuple[str, ...],
+        sort: str,
+        after: tuple[datetime, UUID] | None,
+        after_rank: tuple[float, UUID] | None,
+    ) -> list[dict[str, Any]] | None:
+        """The page; None when a relevance sort has too many matches to rank."""
+        postings: list[_Postings | _Single] = []
+        if words:
+            found = self._postings(words)
+            if found is None:
+                return []
+            postings = found
+        mask = self._mask(filters)
+        if not mask:
+            return []
+        conjunction = len(words) > 1
+
+        if sort == "relevance":
+            # Every match is ranked, like the SQL top-k
+            slots = list(
+                itertools.islice(
+                    self._matches(mask, postings, len(self.keys)), _MAX_RANKED + 1
+                )
+            )
+            if len(slots) > _MAX_RANKED:
+                return None
+            ranked = (
+                (self._rank(s, postings, conjunction), self.keys[s][1], s)
+                for s in slots
+            )
+            if after_rank is not None:
+                bound = (_f4(after_rank[0]), after_rank[1])
+                ranked = (r for r in ranked if (r[0], r[1]) < bound)
+            return [
+                self._row(s, keys, as_real(rank))
+                for rank, _, s in heapq.nlargest(limit, ranked)
+            ]
+
+        hi = len(self.keys)
+        if after is not None:
+            hi = bisect.bisect_left(self.keys, after)
+        page = itertools.islice(self._matches(mask, postings, hi), limit)
+        return [
+            self._row(
+                s,
+                keys,
+                as_real(self._rank(s, postings, conjunction)) if words else None,
+            )
+            for s in page
+        ]
+
+    def _term_bitmap(self, words: tuple[str, ...]) -> int:
+        out = self.alive
+        for w in set(words):
+            bm = self._term_bitmaps.get(w)
+            if bm is None:
+                p = self.postings.get(w)
+                bm = _bitmap(p.slots, len(self.keys)) if p is not None else 0
+                if len(self._term_bitmaps) >= _TERM_BITMAPS:
+                    self._term_bitmaps.clear()
+                self._term_bitmaps[w] = bm
+            out &= bm
+        return out
+
+    def facet_rows(
+        self,
+        *,
+        words: tuple[str, ...],
+        filters: dict[str, str],
+        facets: list[FacetRequest],
+    ) -> list[dict[str, Any]]:
+        """
+        Same rows as the facet SQL: (dim, key, count), each dimension counted
+        without its own filter, top `limit` by count then code.
+        """
+        base = self._term_bitmap(words) if words else self.alive
+        last = len(self.collation)
+        out = []
+        for f in facets:
+            mask = base & self._mask(filters, skip=f.column)
+            needle = f.q.lower()
+            counts = []
+            for code, bm in self.filters[f.column].items():
+                if f.q and (
+                    code is None or (needle not in code.lower() and code not in f.codes)
+                ):
+                    continue
+                n = (mask & bm).bit_count()
+                if n:
+                    order = last + 1 if code is None else self.collation.get(code, last)
+                    counts.append((-n, order, code))
+            counts.sort()
+            out += [
+                {"dim": f.dimension, "key": code, "count": -n}
+                for n, _, code in counts[: f.limit]
+            ]
+        return out
+
+
+def _cursor_values(
+    updated_at: datetime | str, employee_id: UUID | str
+) -> tuple[datetime, UUID] | None:
+    # None: not values the index compares exactly (the SQL path decides)
+    try:
+        if isinstance(updated_at, str):
+            updated_at = datetime.fromisoformat(updated_at)
+        if isinstance(employee_id, str):
+            employee_id = UUID(employee_id)
+    except ValueError:
+        return None
+    if updated_at.tzinfo is None:
+        return None
+    return updated_at, employee_id
+
+
+# Versions (data, refdata) the current block's answers must reflect (None: any)
+_reading: ContextVar[tuple[int, int] | None] = ContextVar("memindex", default=None)
+
+
+class SearchIndexes:
+    """
+    The opted-in orgs' indexes. Builds and version checks run on one
+    background thread; requests never wait for them (no current index = SQL
+    path).
+    """
+
+    def __init__(
+        self, *, orgs: Iterable[int], refresh_seconds: float, reload_seconds: float
+    ) -> None:
+        self.orgs = frozenset(orgs)
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self._indexes: dict[int, OrgIndex] = {}
+        self._pending: set[int] = set()
+        self._dirty: set[int] = set()  # notified since the last build/check began
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self.served = 0
+        self.fallbacks = 0
+        self.builds = 0
+        self.checks = 0
+
+    def start(self) -> None:
+        for org_id in self.orgs:
+            self._schedule(org_id)
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _schedule(self, org_id: int) -> None:
+        with self._lock:
+            if org_id in self._pending:
+                return
+            self._pending.add(org_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="memindex"
+                )
+        self._executor.submit(self._maintain, org_id)
+
+    def _maintain(self, org_id: int) -> None:
+        try:
+            index = self._indexes.get(org_id)
+            if (
+                index is None
+                or time.monotonic() - index.loaded_at >= self.reload_seconds
+            ):
+                self.build(org_id)
+            else:
+                self.refresh(org_id)
+        except Exception:
+            logger.warning("memindex org=%s: refresh failed", org_id, exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(org_id)
+                again = org_id in self._dirty  # notified while this ran
+            if again:
+                self._schedule(org_id)
+
+    def get(self, org_id: int) -> OrgIndex | None:
+        """The org's index if it is current, else None (and a check is queued)."""
+        if org_id not in self.orgs:
+            return None
+        index = self._indexes.get(org_id)
+        # NOTIFYs schedule their own check; this is the backstop
+        if index is None or time.monotonic() - index.checked_at >= self.refresh_seconds:
+            self._schedule(org_id)
+        if index is None:
+            return None
+        wanted = _reading.get()
+        if index.stale or (wanted is not None and not index.covers(wanted)):
+            return self._fallback()
+        return index
+
+    @contextmanager
+    def reading(self, versions: tuple[int, int]) -> Generator[None, None, None]:
+        """Answer the block's searches only from indexes at least this new."""
+        token = _reading.set(versions)
+        try:
+            yield
+        finally:
+            _reading.reset(token)
+
+    def invalidate(self, org_id: int | None = None) -> None:
+        # A change was committed: SQL until a check finds the index current
+        orgs = self.orgs if org_id is None else self.orgs & {org_id}
+        with self._lock:
+            self._dirty |= orgs
+        for key in orgs:
+            index = self._indexes.get(key)
+            if index is not None:
+                index.stale = True
+                self._schedule(key)
+
+    def on_notify(self, payload: str) -> None:
+        # payload = org_id (hr_org_changed_trigger / hr_refdata_changed_trigger)
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            self.invalidate()
+
+    def _collation(self, index: OrgIndex) -> dict[str, int]:
+        rows = fetch_all_dicts(_COLLATION_SQL, {"codes": sorted(index.codes())})
+        return {code: i for i, code in enumerate(rows[0]["codes"] or [])}
+
+    def build(self, org_id: int) -> OrgIndex:
+        """Load the org from scratch and swap the new index in."""
+        started = time.monotonic()
+        with self._lock:
+            self._dirty.discard(org_id)
+        state = fetch_all_dicts(_STATE_SQL, {"org_id": org_id})[0]
+        index = OrgIndex.build(
+            org_id,
+            (state["data_version"], state["refdata_version"]),
+            iter_dict_batches(
+                _LOAD_SQL, {"org_id": org_id}, batch_size=settings.export_batch_size
+            ),
+        )
+        index.collation = self._collation(index)
+        with self._lock:
+            # A NOTIFY during the load may be for a change it missed
+            index.stale = org_id in self._dirty
+            self._indexes[org_id] = index
+            self.builds += 1
+        logger.info(
+            "memindex org=%s: %d employees, %d lexemes in %.1fs",
+            org_id,
+            index.size,
+            len(index.postings),
+            time.monotonic() - started,
+        )
+        return index
+
+    def refresh(self, org_id: int) -> None:
+        """
+        Compare the index with the org's versions (one PK lookup each) and
+        rebuild it when either moved. A reference-data reindex rewrites the
+        documents in batches: the index stays stale (SQL) until it drains.
+        """
+        index = self._indexes[org_id]
+        with self._lock:
+            self._dirty.discard(org_id)
+        state = fetch_all_dicts(_STATE_SQL, {"org_id": org_id})[0]
+        self.checks += 1
+        if (state["data_version"], state["refdata_version"]) == index.versions:
+            # E.g. a NOTIFY for a change the load had already seen
+            with self._lock:
+                index.stale = org_id in self._dirty
+        elif not state["reindexing"]:
+            self.build(org_id)
+            return
+        else:
+            index.stale = True
+        index.checked_at = time.monotonic()
+
+    def search(
+        self,
+        *,
+        org_id: int,
+        q: str | None,
+        filters: dict[str, str],
+        limit: int,
+        keys: tuple[str, ...],
+        sort: str,
+        cursor_updated_at: datetime | str | None = None,
+        cursor_employee_id: UUID | str | None = None,
+        cursor_rank: float | None = None,
+    ) -> list[dict[str, Any]] | None:
+        """
+        A search page as the SQL path returns it (before descriptor
+        resolution), or None when the org is not indexed or the request is
+        not one the index answers exactly.
+        """
+        index = self.get(org_id)
+        if index is None:
+            return None
+        words: tuple[str, ...] = ()
+        if q and q.strip():
+            found = query_words(q)
+            if found is None:
+                return self._fallback()
+            words = found
+
+        after = after_rank = None
+        if sort == "relevance":
+            if cursor_rank is not None and cursor_employee_id is not None:
+                # Any aware timestamp: only the id is compared
+                parsed = _cursor_values(datetime.now(UTC), cursor_employee_id)
+                if parsed is None:
+                    return self._fallback()
+                after_rank = (float(cursor_rank), parsed[1])
+        elif cursor_updated_at and cursor_employee_id:
+            after = _cursor_values(cursor_updated_at, cursor_employee_id)
+            if after is None:
+                return self._fallback()
+
+        rows = index.search(
+            words=words,
+            filters=filters,
+            limit=limit,
+            keys=keys,
+            sort=sort,
+            after=after,
+            after_rank=after_rank,
+        )
+        if rows is None:
+            return self._fallback()
+        self.served += 1
+        return rows
+
+    def facet_rows(
+        self,
+        *,
+        org_id: int,
+        q: str | None,
+        filters: dict[str, str],
+        facets: list[FacetRequest],
+    ) -> list[dict[str, Any]] | None:
+        index = self.get(org_id)
+        if index is None:
+            return None
+        words: tuple[str, ...] = ()
+        if q and q.strip():
+            found = query_words(q)
+            if found is None:
+                return self._fallback()
+            words = found
+        # facet_q is an ILIKE pattern: only plain ASCII text matches the same
+        if any(
+            f.q and (not f.q.isascii() or any(ch in f.q for ch in "%_\\"))
+            for f in facets
+        ):
+            return self._fallback()
+        rows = index.facet_rows(words=words, filters=filters, facets=facets)
+        self.served += 1
+        return rows
+
+    def _fallback(self) -> None:
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> list[Sample]:
+        samples = [
+            Sample(
+                "hrms_memindex_employees",
+                "Employees in the org's in-process search index",
+                index.size,
+                labels={"org_id": str(org_id)},
+            )
+            # Only the configured (MEMINDEX_ORGS) orgs: a bounded label set
+            for org_id, index in list(self._indexes.items())
+            if org_id in self.orgs
+        ]
+        for name, help_text, value in (
+            ("served", "Searches answered by the in-process index", self.served),
+            ("fallbacks", "Indexed-org searches sent to Postgres", self.fallbacks),
+            ("builds", "Full in-process index builds", self.builds),
+            ("checks", "Version checks of in-process indexes", self.checks),
+        ):
+            samples.append(
+                Sample(f"hrms_memindex_{name}_total", help_text, value, type="counter")
+            )
+        return samples
+
+
+indexes = SearchIndexes(
+    orgs=settings.memindex_orgs,
+    refresh_seconds=settings.memindex_refresh_seconds,
+    reload_seconds=settings.memindex_reload_seconds,
+)
+
+# Committed changes mark the org's index stale at once; a (re)connect may
+# have lost some, so every index is re-checked
+listener.subscribe(ORG_CHANNEL, indexes.on_notify, on_reset=indexes.invalidate)
+listener.subscribe(REFDATA_CHANNEL, indexes.on_notify)
+register_collector(indexes.stats)
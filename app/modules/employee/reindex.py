@@ -0,0 +1,324 @@
+# app/modules/employee/reindex.py
+"""
+Set-based search_tsv reindex, drained from `hr_search_reindex_queue`.
+
+The queue holds (org, column, code) keys: "every employee of org 42 with
+deptid = 'IT'" after a department rename, or '' / '' for a whole org. Each key
+is processed in primary-key order, `batch_size` rows per transaction: one
+UPDATE ... FROM joining the reference tables (no per-row lookups), with the
+watermark stored in the queue row in the same transaction. A crash or a lock
+timeout resumes from the last committed batch; re-enqueueing a key while it
+is being processed restarts it, so the final documents are always current.
+
+    python -m app.modules.employee.reindex                 # drain the queue
+    python -m app.modules.employee.reindex --org-id 42     # whole org
+    python -m app.modules.employee.reindex --follow        # keep draining
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from uuid import UUID
+
+import psycopg
+from psycopg.rows import dict_row
+
+from app.core.config import settings
+from app.modules.org.repository import REFERENCE_TABLES
+
+logger = logging.getLogger(__name__)
+
+# Session advisory-lock namespace: one worker per queue entry
+_LOCK_NAMESPACE = 7_318_201
+# Watermark of an entry not started yet (sorts before every uuid)
+_START = UUID(int=0)
+
+_CLAIM_SQL = """
+SELECT id, org_id, column_name, code
+FROM hr_search_reindex_queue
+WHERE %(org_id)s::bigint IS NULL OR org_id = %(org_id)s
+ORDER BY id
+LIMIT 32
+"""
+
+_LOCK_ENTRY_SQL = """
+SELECT last_employee_id, rows_done
+FROM hr_search_reindex_queue
+WHERE id = %(id)s
+FOR UPDATE
+"""
+
+
+def _scope_predicate(column: str) -> str:
+    if column == "":
+        return ""
+    if column not in REFERENCE_TABLES:
+        raise ValueError(f"Unknown reindex column: {column!r}")
+    return f"AND e.{column} = %(code)s"
+
+
+def _batch_sql(column: str) -> str:
+    """
+    One batch: lock the next `batch_size` employees of the scope after the
+    watermark (row locks bound the batch), build their documents with the
+    same function as the row trigger, and write only the ones that changed,
+    by ctid (stable while the rows are locked).
+    """
+    return f"""
+    WITH batch AS MATERIALIZED (
+      SELECT
+        e.ctid AS row_ctid,
+        e.employee_id,
+        e.search_tsv,
+        hr_employment_search_doc(
+          p.display_name, p.email_addr, p.phone,
+          c.descr, d.descr, l.descr, j.descr, ps.descr
+        ) AS doc
+      FROM hr_employment e
+      LEFT JOIN hr_person p
+        ON p.org_id = e.org_id AND p.employee_id = e.employee_id
+      LEFT JOIN hr_company c ON c.org_id = e.org_id AND c.company = e.company
+      LEFT JOIN hr_department d ON d.org_id = e.org_id AND d.deptid = e.deptid
+      LEFT JOIN hr_location l ON l.org_id = e.org_id AND l.location = e.location
+      LEFT JOIN hr_jobcode j ON j.org_id = e.org_id AND j.jobcode = e.jobcode
+      LEFT JOIN hr_position ps
+        ON ps.org_id = e.org_id AND ps.position_nbr = e.position_nbr
+      WHERE e.org_id = %(org_id)s {_scope_predicate(column)}
+        AND e.employee_id > %(after)s::uuid
+      ORDER BY e.employee_id
+      LIMIT %(batch_size)s
+      FOR UPDATE OF e
+    ),
+    updated AS (
+      UPDATE hr_employment e
+      SET search_tsv = b.doc
+      FROM batch b
+      WHERE e.ctid = b.row_ctid
+        AND b.search_tsv IS DISTINCT FROM b.doc
+      RETURNING 1
+    )
+    SELECT
+      (SELECT count(*) FROM batch) AS scanned,
+      (SELECT count(*) FROM updated) AS updated,
+      (SELECT employee_id FROM batch ORDER BY employee_id DESC LIMIT 1) AS last_id
+    """
+
+
+def _count_sql(column: str) -> str:
+    return f"""
+    SELECT count(*) AS total
+    FROM hr_employment e
+    WHERE e.org_id = %(org_id)s {_scope_predicate(column)}
+    """
+
+
+@dataclass
+class Progress:
+    entry_id: int
+    org_id: int
+    scope: str
+    total: int  # estimate taken when the entry was claimed
+    done: int = 0
+    updated: int = 0
+    started: float = 0.0
+    logged: float = 0.0
+
+    def log(self, *, final: bool = False) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        logger.info(
+            "reindex org=%s %s: %d/%d rows (%d changed), %.0f rows/s%s",
+            self.org_id,
+            self.scope,
+            self.done,
+            self.total,
+            self.updated,
+            self.done / elapsed,
+            ", done" if final else "",
+        )
+        self.logged = time.monotonic()
+
+
+def enqueue(conn: psycopg.Connection, org_id: int, column: str = "", code: str = ""):
+    _scope_predicate(column)  # validate
+    conn.execute("SELECT hr_search_reindex_enqueue(%s, %s, %s)", (org_id, column, code))
+
+
+def _lock_key(entry_id: int) -> int:
+    # Single-bigint form: queue ids are a BIGSERIAL (every enqueue, upserts
+    # included, takes one) and would not fit the (int, int) one. A hash
+    # collision only makes two entries' workers take turns
+    digest = hashlib.blake2b(
+        f"{_LOCK_NAMESPACE}:{entry_id}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _try_lock(conn: psycopg.Connection, entry_id: int) -> bool:
+    row = conn.execute(
+        "SELECT pg_try_advisory_lock(%s)", (_lock_key(entry_id),)
+    ).fetchone()
+    return bool(row[0])
+
+
+def _unlock(conn: psycopg.Connection, entry_id: int) -> None:
+    conn.execute("SELECT pg_advisory_unlock(%s)", (_lock_key(entry_id),))
+
+
+def process_entry(
+    conn: psycopg.Connection,
+    entry: dict,
+    *,
+    batch_size: int,
+    lock_timeout_ms: int,
+    pause_seconds: float = 0.0,
+    progress_seconds: float = 5.0,
+) -> Progress:
+    """
+    Reindex one queue entry to completion, one short transaction per batch.
+    `conn` must be in autocommit mode and hold the entry's advisory lock.
+    """
+    column, params = entry["column_name"], {"org_id": entry["org_id"]}
+    params["code"] = entry["code"]
+    batch_sql = _batch_sql(column)
+    total = conn.execute(_count_sql(column), params).fetchone()[0]
+    now = time.monotonic()
+    progress = Progress(
+        entry_id=entry["id"],
+        org_id=entry["org_id"],
+        scope=f"{column}={entry['code']}" if column else "all",
+        total=total,
+        started=now,
+        logged=now,
+    )
+
+    while True:
+        try:
+            with conn.transaction(), conn.cursor(row_factory=dict_row) as cur:
+                # Bounded lock waits: give way to OLTP writers, retry the batch
+                cur.execute(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+                # Row lock on the entry: an enqueue of the same key waits for
+                # this batch, then resets the watermark for the next one
+                cur.execute(_LOCK_ENTRY_SQL, {"id": entry["id"]})
+                state = cur.fetchone()
+                if state is None:
+                    return progress  # removed by someone else
+                if state["last_employee_id"] is None and progress.done:
+                    progress.done = progress.updated = 0  # re-enqueued: restart
+                cur.execute(
+                    batch_sql,
+                    {
+                        **params,
+                        "after": state["last_employee_id"] or _START,
+                        "batch_size": batch_size,
+                    },
+                )
+                batch = cur.fetchone()
+                progress.done += batch["scanned"]
+                progress.updated += batch["updated"]
+                finished = batch["scanned"] < batch_size
+                if finished:
+                    cur.execute(
+                        "DELETE FROM hr_search_reindex_queue WHERE id = %s",
+                        (entry["id"],),
+                    )
+                else:
+                    cur.execute(
+                        """
+                        UPDATE hr_search_reindex_queue
+                        SET last_employee_id = %s, rows_done = %s
+                        WHERE id = %s
+                        """,
+                        (batch["last_id"], progress.done, entry["id"]),
+                    )
+        except psycopg.errors.LockNotAvailable:
+            logger.info("reindex org=%s: lock timeout, retrying", entry["org_id"])
+            time.sleep(max(pause_seconds, 0.1))
+            continue
+
+        if finished:
+            progress.log(final=True)
+            return progress
+        if time.monotonic() - progress.logged >= progress_seconds:
+            progress.log()
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+
+def drain(
+    conn: psycopg.Connection,
+    *,
+    org_id: int | None = None,
+    batch_size: int | None = None,
+    lock_timeout_ms: int | None = None,
+    pause_seconds: float = 0.0,
+) -> int:
+    """
+    Process queue entries until none is left (or all are held by other
+    workers). Returns the number of entries completed.
+    """
+    batch_size = batch_size or settings.reindex_batch_size
+    lock_timeout_ms = lock_timeout_ms or settings.reindex_lock_timeout_ms
+    completed = 0
+    while True:
+        with conn.cursor(row_factory=dict_row) as cur:
+            entries = cur.execute(_CLAIM_SQL, {"org_id": org_id}).fetchall()
+        claimed = [e for e in entries if _try_lock(conn, e["id"])]
+        if not claimed:
+            return completed
+        for entry in claimed:
+            try:
+                process_entry(
+                    conn,
+                    entry,
+                    batch_size=batch_size,
+                    lock_timeout_ms=lock_timeout_ms,
+                    pause_seconds=pause_seconds,
+                )
+                completed += 1
+            finally:
+                _unlock(conn, entry["id"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--org-id", type=int, help="enqueue a whole-org reindex, then drain it"
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.reindex_batch_size)
+    parser.add_argument(
+        "--lock-timeout-ms", type=int, default=settings.reindex_lock_timeout_ms
+    )
+    parser.add_argument(
+        "--pause", type=float, default=0.0, help="seconds between batches"
+    )
+    parser.add_argument(
+        "--follow", action="store_true", help="keep polling for new entries"
+    )
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds (--follow)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(message)s")
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        if args.org_id is not None:
+            enqueue(conn, args.org_id)
+        while True:
+            drain(
+                conn,
+                org_id=args.org_id,
+                batch_size=args.batch_size,
+                lock_timeout_ms=args.lock_timeout_ms,
+                pause_seconds=args.pause,
+            )
+            if not args.follow:
+                break
+            time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,219 @@
 # app/modules/employee/repository.py
+import asyncio
+import re
+from collections.abc import AsyncGenerator, Callable, Generator
+from contextlib import aclosing, closing
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Any
+from uuid import UUID
 
-from app.db.utils import fetch_all_dicts
+from app.core.config import settings
+from app.core.metrics import stage
+from app.db.statements import statements
+from app.db.utils import (
+    fetch_all_dicts,
+    fetch_all_dicts_async,
+    fetch_many_dicts_pipelined,
+    fetch_many_dicts_pipelined_async,
+    iter_dict_batches,
+    iter_dict_batches_async,
+)
+from app.modules.employee import memindex
+from app.modules.org.service import RefData, refdata_cache
 
+# Filterable hr_employment columns, in the order their predicates are emitted
+FILTER_COLUMNS = (
+    "empl_status",
+    "company",
+    "deptid",
+    "location",
+    "jobcode",
+    "position_nbr",
+)
 
-def search_employees(
+# hr_employment column -> output name of its descriptor (resolved via refdata_cache)
+DESCRIPTOR_COLUMNS = {
+    "company": "company_descr",
+    "deptid": "dept_descr",
+    "location": "location_descr",
+    "jobcode": "jobcode_descr",
+    "position_nbr": "position_descr",
+}
+
+# Facet name -> hr_employment column. Names are what clients send in `facets=`.
+FACET_DIMENSIONS = {
+    "company": "company",
+    "dept": "deptid",
+    "location": "location",
+    "jobcode": "jobcode",
+    "position": "position_nbr",
+    "empl_status": "empl_status",
+}
+
+# Output column -> select item that feeds it. Descriptors select their code and
+# are resolved from the reference-data cache; `p.*` items require hr_person.
+PROJECTIONS = {
+    "first_name": "p.first_name",
+    "last_name": "p.last_name",
+    "display_name": "p.display_name",
+    "email_addr": "p.email_addr",
+    "phone": "p.phone",
+    "empl_status": "e.empl_status",
+    "company_descr": "e.company",
+    "dept_descr": "e.deptid",
+    "location_descr": "e.location",
+    "jobcode_descr": "e.jobcode",
+    "position_descr": "e.position_nbr",
+}
+
+
+# Search strategies:
+#   single:    one query joins what the page needs, then ORDER BY ... LIMIT
+#   two_phase: late materialization; phase 1 picks the page of
+#              (employee_id, updated_at, rank) from hr_employment alone (index
+#              friendly), phase 2 hydrates only those ids. One statement/round trip.
+SEARCH_STRATEGIES = ("single", "two_phase")
+
+# Sort orders:
+#   recent:    (updated_at, employee_id) DESC, the default
+#   relevance: (rank, employee_id) DESC over every match (requires q)
+SEARCH_SORTS = ("recent", "relevance")
+
+_RANK = "ts_rank(e.search_tsv, websearch_to_tsquery('simple', %(q)s))"
+
+
+def _select_items(columns: tuple[str, ...]) -> list[str]:
+    items: list[str] = []
+    for c in columns:
+        item = PROJECTIONS.get(c)
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def _hydrate_joins(items: list[str]) -> str:
+    # Joins that fill the select items of a page of ids picked in phase 1 (`pg`)
+    joins = ""
+    if any(item.startswith("e.") for item in items):
+        joins += """
+    JOIN hr_employment e
+      ON e.org_id = %(org_id)s AND e.employee_id = pg.employee_id"""
+    if any(item.startswith("p.") for item in items):
+        joins += """
+    JOIN hr_person p
+      ON p.org_id = %(org_id)s AND p.employee_id = pg.employee_id"""
+    return joins
+
+
+def _compile_relevance_sql(items: list[str], where: list[str], keyset: bool) -> str:
+    """
+    Top-k relevance page:
+      1. m:  every match the GIN index finds, ranked; no candidate cut-off,
+             so the best matches are found however old they are
+      2. pg: keyset over (rank, employee_id), top-N heapsort of the page
+      3. hydrate only the page's ids
+    Every page ranks the whole match set (about 17 ms for 18k matches), so
+    the query runs under the search budget as its statement_timeout.
+    Ranks are float4 and the cursor carries the exact value, so pages are stable.
+    """
+    after = ""
+    if keyset:
+        after = """
+      WHERE (rank, employee_id) < (%(cursor_rank)s::real, %(cursor_employee_id)s::uuid)"""
+    select = ["pg.employee_id", "pg.updated_at", *items, "pg.rank"]
+    return f"""
+    WITH pg AS (
+      SELECT employee_id, updated_at, rank
+      FROM (
+        SELECT e.employee_id, e.updated_at, {_RANK} AS rank
+        FROM hr_employment e
+        WHERE {" AND ".join(where)}
+      ) m{after}
+      ORDER BY
+        rank DESC,
+        employee_id DESC
+      LIMIT %(limit)s
+    )
+    SELECT
+      {", ".join(select)}
+    FROM pg{_hydrate_joins(items)}
+    ORDER BY
+      pg.rank DESC,
+      pg.employee_id DESC
+    """
+
+
+def _compile_search_sql(
+    columns: tuple[str, ...],
+    filters: tuple[str, ...],
+    use_fts: bool,
+    keyset: bool,
+    strategy: str = "single",
+    sort: str = "recent",
+) -> str:
+    """
+    SELECT list and joins compiled from the org's column config. Built once per
+    (columns, filter shape, strategy, sort) via the statement registry.
+    Columns without a projection (e.g. "status") are simply not selected.
+    """
+    items = _select_items(columns)
+    rank = f"{_RANK} AS rank" if use_fts else "NULL::float AS rank"
+
+    where = ["e.org_id = %(org_id)s"]
+    where += [f"e.{f} = %({f})s" for f in filters]
+    if use_fts:
+        where.append("e.search_tsv @@ websearch_to_tsquery('simple', %(q)s)")
+
+    if sort == "relevance":
+        return _compile_relevance_sql(items, where, keyset)
+
+    if keyset:
+        where.append(
+            "(e.updated_at, e.employee_id) < (%(cursor_updated_at)s::timestamptz, %(cursor_employee_id)s::uuid)"
+        )
+
+    if strategy == "two_phase":
+        # employee_id/updated_at feed the cursor, rank feeds relevance
+        select = ["pg.employee_id", "pg.updated_at", *items, "pg.rank"]
+        return f"""
+    WITH pg AS MATERIALIZED (
+      SELECT e.employee_id, e.updated_at, {rank}
+      FROM hr_employment e
+      WHERE {" AND ".join(where)}
+      ORDER BY
+        e.updated_at DESC,
+        e.employee_id DESC
+      LIMIT %(limit)s
+    )
+    SELECT
+      {", ".join(select)}
+    FROM pg{_hydrate_joins(items)}
+    ORDER BY
+      pg.updated_at DESC,
+      pg.employee_id DESC
+    """
+
+    join = ""
+    if any(item.startswith("p.") for item in items):
+        join = """
+    JOIN hr_person p
+      ON p.org_id = e.org_id AND p.employee_id = e.employee_id"""
+    # employee_id/updated_at feed the cursor, rank feeds relevance
+    select = ["e.employee_id", "e.updated_at", *items, rank]
+    return f"""
+    SELECT
+      {", ".join(select)}
+    FROM hr_employment e{join}
+    WHERE {" AND ".join(where)}
+    ORDER BY
+      e.updated_at DESC,
+      e.employee_id DESC
+    LIMIT %(limit)s
+    """
+
+
+def _build_search_query(
     *,
     org_id: int,
     q: str | None,
@@ -15,127 +224,681 @@ def search_employees(
     company: str | None = None,
     empl_status: str | None = None,
     limit: int = 20,
-    cursor_updated_at: str | None = None,  # ISO string
-    cursor_employee_id: str | None = None,  # UUID string
-) -> list[dict[str, Any]]:
+    cursor_updated_at: datetime | str | None = None,  # datetime or ISO string
+    cursor_employee_id: UUID | str | None = None,
+    cursor_rank: float | None = None,  # sort=relevance
+    columns: tuple[str, ...] = tuple(PROJECTIONS),
+    strategy: str = "single",
+    sort: str = "recent",
+) -> tuple[str, dict[str, Any]]:
     limit = max(1, min(limit, 100))
-
-    where = ["e.org_id = %(org_id)s"]
     params: dict[str, Any] = {"org_id": org_id, "limit": limit}
 
-    if empl_status:
-        where.append("e.empl_status = %(empl_status)s")
-        params["empl_status"] = empl_status
-    if company:
-        where.append("e.company = %(company)s")
-        params["company"] = company
-    if deptid:
-        where.append("e.deptid = %(deptid)s")
-        params["deptid"] = deptid
-    if location:
-        where.append("e.location = %(location)s")
-        params["location"] = location
-    if jobcode:
-        where.append("e.jobcode = %(jobcode)s")
-        params["jobcode"] = jobcode
-    if position_nbr:
-        where.append("e.position_nbr = %(position_nbr)s")
-        params["position_nbr"] = position_nbr
+    values = {
+        "empl_status": empl_status,
+        "company": company,
+        "deptid": deptid,
+        "location": location,
+        "jobcode": jobcode,
+        "position_nbr": position_nbr,
+    }
+    active = tuple(f for f in FILTER_COLUMNS if values[f])
+    for f in active:
+        params[f] = values[f]
 
     use_fts = bool(q and q.strip())
     if use_fts:
-        where.append("e.search_tsv @@ websearch_to_tsquery('simple', %(q)s)")
         params["q"] = q.strip()
 
-    if cursor_updated_at and cursor_employee_id:
-        where.append(
-            "(e.updated_at, e.employee_id) < (%(cursor_updated_at)s::timestamptz, %(cursor_employee_id)s::uuid)"
-        )
-        params["cursor_updated_at"] = cursor_updated_at
-        params["cursor_employee_id"] = cursor_employee_id
+    if sort == "relevance":
+        if not use_fts:
+            raise ValueError("sort=relevance requires q")
+        strategy = "top_k"  # relevance has a single shape
+        keyset = cursor_rank is not None and cursor_employee_id is not None
+        if keyset:
+            params["cursor_rank"] = cursor_rank
+            params["cursor_employee_id"] = cursor_employee_id
+    else:
+        keyset = bool(cursor_updated_at and cursor_employee_id)
+        if keyset:
+            params["cursor_updated_at"] = cursor_updated_at
+            params["cursor_employee_id"] = cursor_employee_id
+
+    sql = statements.get(
+        ("search", columns, active, use_fts, keyset, strategy, sort),
+        lambda: _compile_search_sql(columns, active, use_fts, keyset, strategy, sort),
+        params,
+    )
+    return sql, params
+
+
+def _build_export_query(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    columns: tuple[str, ...],
+) -> tuple[str, dict[str, Any]]:
+    """
+    Whole filtered directory in primary-key order, for a server-side cursor.
+    Not routed through the statement registry: DECLARE ... CURSOR statements
+    are never prepared, and an export runs one statement for many rows anyway.
+    """
+    params: dict[str, Any] = {"org_id": org_id}
+    where = ["e.org_id = %(org_id)s"]
+    for f in FILTER_COLUMNS:
+        if filters.get(f):
+            params[f] = filters[f]
+            where.append(f"e.{f} = %({f})s")
+    if q and q.strip():
+        params["q"] = q.strip()
+        where.append("e.search_tsv @@ websearch_to_tsquery('simple', %(q)s)")
 
+    items = _select_items(columns)
+    join = ""
+    if any(item.startswith("p.") for item in items):
+        join = """
+    JOIN hr_person p
+      ON p.org_id = e.org_id AND p.employee_id = e.employee_id"""
     sql = f"""
     SELECT
-      e.employee_id, p.first_name, p.last_name, p.display_name, p.email_addr, p.phone,
-      e.empl_status, e.company,
-      c.descr AS company_descr,
-      e.deptid,
-      d.descr AS dept_descr,
-      e.location,
-      l.descr AS location_descr,
-      e.jobcode,
-      j.descr AS jobcode_descr,
-      e.position_nbr,
-      x.descr AS position_descr,
-      e.reports_to_employee_id,
-      e.updated_at,
-      {"ts_rank(e.search_tsv, websearch_to_tsquery('simple', %(q)s)) AS rank" if use_fts else "NULL::float AS rank"}
-    FROM hr_employment e
-    JOIN hr_person p
-      ON p.org_id = e.org_id AND p.employee_id = e.employee_id
-    LEFT JOIN hr_company c
-      ON c.org_id = e.org_id AND c.company = e.company
-    LEFT JOIN hr_department d
-      ON d.org_id = e.org_id AND d.deptid = e.deptid
-    LEFT JOIN hr_location l
-      ON l.org_id = e.org_id AND l.location = e.location
-    LEFT JOIN hr_jobcode j
-      ON j.org_id = e.org_id AND j.jobcode = e.jobcode
-    LEFT JOIN hr_position x
-      ON x.org_id = e.org_id AND x.position_nbr = e.position_nbr
+      {", ".join(["e.employee_id", *items])}
+    FROM hr_employment e{join}
     WHERE {" AND ".join(where)}
+    ORDER BY e.employee_id
+    """
+    return sql, params
+
+
+# Typeahead prefix tiers, best first: hr_person expression -> output column the
+# org must expose for the tier to be used (matching a hidden column would leak it)
+SUGGEST_TIERS = {
+    "display_name": "display_name",
+    "last_name": "display_name",  # part of the display name
+    "email_addr": "email_addr",
+}
+
+
+def _compile_suggest_sql(tiers: tuple[str, ...], use_fts: bool, named: bool) -> str:
+    """
+    Typeahead: each prefix tier is a range scan of its `lower(col) COLLATE "C"`
+    index cut by LIMIT, so its cost does not depend on how many names share the
+    prefix. The full-text tier (word prefixes of the search document: any name
+    part, email, phone, descriptors) only runs when the prefix tiers came up
+    short, and ranks every match like sort=relevance (under a statement_timeout).
+    """
+    prefixed = (
+        " UNION ALL ".join(
+            f"""(
+      SELECT p.employee_id, {i} AS tier
+      FROM hr_person p
+      WHERE p.org_id = %(org_id)s
+        AND lower(p.{column}) COLLATE "C" >= %(lo)s
+        AND lower(p.{column}) COLLATE "C" < %(hi)s
+      ORDER BY lower(p.{column}) COLLATE "C", p.employee_id
+      LIMIT %(limit)s
+    )"""
+            for i, column in enumerate(tiers)
+        )
+        or "SELECT NULL::uuid AS employee_id, 0 AS tier WHERE false"
+    )
+
+    tokens = ""
+    if use_fts:
+        tokens = """
+    tokens AS MATERIALIZED (
+      SELECT
+        e.employee_id,
+        ts_rank(e.search_tsv, to_tsquery('simple', %(tsquery)s)) AS rank
+      FROM hr_employment e
+      WHERE e.org_id = %(org_id)s
+        AND e.search_tsv @@ to_tsquery('simple', %(tsquery)s)
+        AND (SELECT count(*) FROM prefixed) < %(limit)s
+        AND e.employee_id NOT IN (SELECT employee_id FROM prefixed)
+      ORDER BY
+        rank DESC,
+        e.employee_id
+      LIMIT %(limit)s
+    ),"""
+        matches = f"""
+      UNION ALL
+      SELECT employee_id, {len(tiers)}, rank FROM tokens"""
+    else:
+        matches = ""
+
+    select = ["b.employee_id"]
+    if named:
+        select.append("p.display_name")
+    return f"""
+    WITH prefixed AS MATERIALIZED (
+      {prefixed}
+    ),{tokens}
+    best AS (
+      SELECT DISTINCT ON (employee_id) employee_id, tier, rank
+      FROM (
+        SELECT employee_id, tier, NULL::real AS rank FROM prefixed{matches}
+      ) m
+      ORDER BY employee_id, tier
+    )
+    SELECT
+      {", ".join(select)}
+    FROM best b
+    JOIN hr_person p
+      ON p.org_id = %(org_id)s AND p.employee_id = b.employee_id
     ORDER BY
-      e.updated_at DESC,
-      e.employee_id DESC
+      b.tier,
+      b.rank DESC NULLS LAST,
+      lower(p.display_name) COLLATE "C",
+      b.employee_id
     LIMIT %(limit)s
     """
-    return fetch_all_dicts(sql, params)
 
 
-def facet_positions(
-    *,
-    org_id: int,
-    q: str | None,
-    position_nbr: str | None = None,
-    empl_status: str | None = None,
-    facet_limit: int = 20,
-    facet_q: str | None = None,
-) -> list[dict[str, Any]]:
-    facet_limit = max(1, min(facet_limit, 50))
-    where = ["e.org_id = %(org_id)s"]
+def _suggest_prepare(params: dict[str, Any]) -> bool | None:
+    # None: the connection's prepare_threshold decides, as for every query
+    return False if "tsquery" in params else None
+
+
+def _ranking_timeout(ranks_every_match: bool) -> float | None:
+    # Queries that rank the whole match set are bounded by time, not by a
+    # row cut-off that would drop better, older matches
+    return settings.search_timeout_seconds if ranks_every_match else None
+
+
+def _build_suggest_query(
+    *, org_id: int, prefix: str, limit: int, columns: tuple[str, ...]
+) -> tuple[str, dict[str, Any]]:
+    """
+    `prefix` is already normalized (lower case, single spaces, non-empty).
+    """
+    tiers = tuple(t for t, needs in SUGGEST_TIERS.items() if needs in columns)
+    words = re.findall(r"\w+", prefix)
+    use_fts = len(prefix) >= settings.suggest_fts_min_chars and bool(words)
     params: dict[str, Any] = {
         "org_id": org_id,
-        "facet_limit": facet_limit,
-        "facet_q": facet_q.strip() if facet_q else "",
-        "facet_q_like": f"%{facet_q.strip()}%" if facet_q else "%",
+        "limit": max(1, min(limit, 20)),
+        # [prefix, next prefix): every string starting with `prefix`
+        "lo": prefix,
+        "hi": prefix[:-1] + chr(min(ord(prefix[-1]) + 1, 0x10FFFF)),
     }
-    if empl_status:
-        where.append("e.empl_status = %(empl_status)s")
-        params["empl_status"] = empl_status
-    if position_nbr:
-        where.append("e.position_nbr = %(position_nbr)s")
-        params["position_nbr"] = position_nbr
-    use_fts = bool(q and q.strip())
+    if use_fts:
+        # Words are \w+ only, so quoting them makes a valid tsquery
+        params["tsquery"] = " & ".join(f"'{w}':*" for w in words)
+
+    named = "display_name" in columns
+    sql = statements.get(
+        ("suggest", tiers, use_fts, named),
+        lambda: _compile_suggest_sql(tiers, use_fts, named),
+        params,
+        # How many rows a word prefix matches varies wildly ("a" vs a surname):
+        # a generic plan would bitmap-scan every match of a common one
+        prepare=not use_fts,
+    )
+    return sql, params
+
+
+@dataclass(frozen=True)
+class FacetSpec:
+    dimension: str  # key of FACET_DIMENSIONS
+    limit: int = 20
+    q: str | None = None  # substring match on the value or its descr
+
+
+def _compile_facet_sql(
+    dimensions: tuple[str, ...], filters: tuple[str, ...], use_fts: bool
+) -> str:
+    """
+    Counts for every requested facet dimension in ONE scan of the filtered set
+    (GROUPING SETS, one set per dimension).
+
+    Facet semantics: a dimension's own filter is ignored for its counts (so the
+    client can still see the alternatives), every other filter applies. Filters on
+    facetted dimensions are therefore evaluated per grouping set with
+    `COUNT(*) FILTER (...)` instead of in WHERE.
+    """
+    where = ["e.org_id = %(org_id)s"]
     if use_fts:
         where.append("e.search_tsv @@ websearch_to_tsquery('simple', %(q)s)")
+
+    columns = [FACET_DIMENSIONS[d] for d in dimensions]
+
+    # Active filters on facetted columns -> per-dimension FILTER predicates
+    facet_matches: dict[str, str] = {}
+    for column in filters:
+        predicate = f"e.{column} = %({column})s"
+        if column in columns:
+            facet_matches[column] = f"({predicate}) IS TRUE"
+        else:
+            where.append(predicate)
+    if len(facet_matches) > 1:
+        # A row that fails two facetted filters cannot count for any dimension
+        misses = " + ".join(f"(NOT {m})::int" for m in facet_matches.values())
+        where.append(f"({misses}) <= 1")
+
+    dim_cases, key_cases, count_cases, grouping_sets, specs = [], [], [], [], []
+    for i, (dimension, column) in enumerate(zip(dimensions, columns, strict=True)):
+        grouped = f"GROUPING(e.{column}) = 0"
+        others = [m for c, m in facet_matches.items() if c != column]
+        count = "COUNT(*)"
+        if others:
+            count += f" FILTER (WHERE {' AND '.join(others)})"
+        dim_cases.append(f"WHEN {grouped} THEN '{dimension}'")
+        key_cases.append(f"WHEN {grouped} THEN e.{column}")
+        count_cases.append(f"WHEN {grouped} THEN {count}")
+        grouping_sets.append(f"(e.{column})")
+        specs.append(
+            f"('{dimension}', %(facet_limit_{i})s::int, "
+            f"%(facet_like_{i})s::text, %(facet_codes_{i})s::text[])"
+        )
+
+    return f"""
+    WITH counts AS (
+      SELECT
+        CASE {" ".join(dim_cases)} END AS dim,
+        CASE {" ".join(key_cases)} END AS key,
+        CASE {" ".join(count_cases)} END AS count
+      FROM hr_employment e
+      WHERE {" AND ".join(where)}
+      GROUP BY GROUPING SETS ({", ".join(grouping_sets)})
+    ),
+    specs (dim, lim, q_like, q_codes) AS (
+      VALUES {", ".join(specs)}
+    ),
+    ranked AS (
+      SELECT
+        c.dim, c.key, c.count, s.lim,
+        row_number() OVER (PARTITION BY c.dim ORDER BY c.count DESC, c.key) AS rn
+      FROM counts c
+      JOIN specs s ON s.dim = c.dim
+      WHERE c.count > 0
+        AND (s.q_like IS NULL OR c.key ILIKE s.q_like OR c.key = ANY(s.q_codes))
+    )
+    SELECT dim, key, count
+    FROM ranked
+    WHERE rn <= lim
+    ORDER BY dim, rn
+    """
+
+
+def _facet_requests(
+    facets: list[FacetSpec], refdata: RefData
+) -> list[memindex.FacetRequest]:
+    # facet_q matches the code (ILIKE) or its descr; descr matches are looked up in
+    # the reference-data cache and passed as a code list, so no reference joins.
+    requests = []
+    for f in facets:
+        column = FACET_DIMENSIONS[f.dimension]
+        fq = f.q.strip() if f.q else ""
+        codes = (
+            refdata.codes_matching(column, fq)
+            if fq and column in DESCRIPTOR_COLUMNS
+            else []
+        )
+        requests.append(
+            memindex.FacetRequest(
+                f.dimension, column, max(1, min(f.limit, 50)), fq, tuple(codes)
+            )
+        )
+    return requests
+
+
+def _build_facet_query(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    facets: list[FacetSpec],
+    refdata: RefData,
+) -> tuple[str, dict[str, Any]]:
+    params: dict[str, Any] = {"org_id": org_id}
+
+    use_fts = bool(q and q.strip())
+    if use_fts:
         params["q"] = q.strip()
-    sql = f"""
-    SELECT
-      e.position_nbr,
-      COALESCE(x.descr, '') AS position_descr,
-      COUNT(*)::bigint AS count
-    FROM hr_employment e
-    LEFT JOIN hr_position x
-      ON x.org_id = e.org_id AND x.position_nbr = e.position_nbr
-    WHERE {" AND ".join(where)}
-      AND (
-        %(facet_q)s = ''
-        OR e.position_nbr ILIKE %(facet_q_like)s
-        OR x.descr ILIKE %(facet_q_like)s
-      )
-    GROUP BY e.position_nbr, x.descr
-    ORDER BY count DESC, e.position_nbr
-    LIMIT %(facet_limit)s
+
+    active = tuple(f for f in FILTER_COLUMNS if filters.get(f))
+    for f in active:
+        params[f] = filters[f]
+
+    for i, f in enumerate(_facet_requests(facets, refdata)):
+        params[f"facet_limit_{i}"] = f.limit
+        params[f"facet_like_{i}"] = f"%{f.q}%" if f.q else None
+        params[f"facet_codes_{i}"] = list(f.codes)
+
+    dimensions = tuple(f.dimension for f in facets)
+    sql = statements.get(
+        ("facets", dimensions, active, use_fts),
+        lambda: _compile_facet_sql(dimensions, active, use_fts),
+        params,
+    )
+    return sql, params
+
+
+def _group_facet_rows(
+    facets: list[FacetSpec], rows: list[dict[str, Any]], refdata: RefData
+) -> dict[str, list[dict[str, Any]]]:
+    # {"position": [{"position_nbr": ..., "position_descr": ..., "count": ...}], ...}
+    out: dict[str, list[dict[str, Any]]] = {f.dimension: [] for f in facets}
+    for r in rows:
+        column = FACET_DIMENSIONS[r["dim"]]
+        item = {column: r["key"]}
+        if column in DESCRIPTOR_COLUMNS:
+            item[DESCRIPTOR_COLUMNS[column]] = refdata.descr(column, r["key"]) or ""
+        item["count"] = r["count"]
+        out[r["dim"]].append(item)
+    return out
+
+
+def _resolve_descriptors(
+    rows: list[dict[str, Any]], refdata: RefData, columns: tuple[str, ...]
+) -> list[dict[str, Any]]:
+    wanted = [(c, a) for c, a in DESCRIPTOR_COLUMNS.items() if a in columns]
+    with stage("descriptors"):
+        for r in rows:
+            for column, alias in wanted:
+                r[alias] = refdata.descr(column, r[column])
+    return rows
+
+
+def _search_in_memory(kwargs: dict[str, Any]) -> list[dict[str, Any]] | None:
+    # The page from the org's in-process index, if it has one that can answer
+    # (memindex); rows as the SQL path returns them, before descriptors
+    if kwargs["org_id"] not in memindex.indexes.orgs:
+        return None
+    sort = kwargs.get("sort", "recent")
+    if sort == "relevance" and not (kwargs["q"] and kwargs["q"].strip()):
+        return None  # the SQL builder rejects it
+    items = _select_items(kwargs["columns"])
+    with stage("memindex"):
+        return memindex.indexes.search(
+            org_id=kwargs["org_id"],
+            q=kwargs["q"],
+            filters={f: kwargs[f] for f in FILTER_COLUMNS if kwargs.get(f)},
+            limit=max(1, min(kwargs.get("limit", 20), 100)),
+            keys=tuple(item.split(".", 1)[1] for item in items),
+            sort=sort,
+            cursor_updated_at=kwargs.get("cursor_updated_at"),
+            cursor_employee_id=kwargs.get("cursor_employee_id"),
+            cursor_rank=kwargs.get("cursor_rank"),
+        )
+
+
+def _facets_in_memory(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    facets: list[FacetSpec],
+    refdata: RefData,
+) -> list[dict[str, Any]] | None:
+    # Facet rows (dim, key, count) from the org's in-process index, or None
+    if org_id not in memindex.indexes.orgs:
+        return None
+    with stage("memindex"):
+        return memindex.indexes.facet_rows(
+            org_id=org_id,
+            q=q,
+            filters={f: filters[f] for f in FILTER_COLUMNS if filters.get(f)},
+            facets=_facet_requests(facets, refdata),
+        )
+
+
+async def _in_memory_async(
+    org_id: int, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+) -> Any:
+    # The index walk is CPU work: on the asyncio path it runs on a worker
+    # thread (context copied: stage timing, memindex.reading)
+    if org_id not in memindex.indexes.orgs:
+        return None
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def _page_and_facets_in_memory(
+    search: dict[str, Any], facets: dict[str, Any], refdata: RefData
+) -> tuple[list[dict[str, Any]] | None, list[dict[str, Any]] | None]:
+    rows = _search_in_memory(search)
+    facet_rows = None if rows is None else _facets_in_memory(**facets, refdata=refdata)
+    return rows, facet_rows
+
+
+def _batch_in_memory(searches: list[dict[str, Any]]) -> list[Any]:
+    return [_search_in_memory(s) for s in searches]
+
+
+# Public API: the sync functions run on the threadpool path, the `_async` twins on
+# the asyncio path (`settings.db_async`). Both share the same SQL builders. Orgs
+# with an in-process index (settings.memindex_orgs) are answered from it when it
+# can, Postgres otherwise.
+
+
+def search_employees(**kwargs: Any) -> list[dict[str, Any]]:
+    """
+    One page of employees. `columns` (the org's output columns) drives which
+    columns and joins the statement includes; defaults to every projection.
+    """
+    columns = kwargs.setdefault("columns", tuple(PROJECTIONS))
+    rows = _search_in_memory(kwargs)
+    if rows is None:
+        rows = fetch_all_dicts(
+            *_build_search_query(**kwargs),
+            statement_timeout=_ranking_timeout(kwargs.get("sort") == "relevance"),
+        )
+    return _resolve_descriptors(rows, refdata_cache.get(kwargs["org_id"]), columns)
+
+
+async def search_employees_async(**kwargs: Any) -> list[dict[str, Any]]:
+    columns = kwargs.setdefault("columns", tuple(PROJECTIONS))
+    rows = await _in_memory_async(kwargs["org_id"], _search_in_memory, kwargs)
+    if rows is None:
+        rows = await fetch_all_dicts_async(
+            *_build_search_query(**kwargs),
+            statement_timeout=_ranking_timeout(kwargs.get("sort") == "relevance"),
+        )
+    refdata = await refdata_cache.get_async(kwargs["org_id"])
+    return _resolve_descriptors(rows, refdata, columns)
+
+
+def facet_counts(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    facets: list[FacetSpec],
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Counts for the requested facet dimensions, one DB round trip for all of them.
+    """
+    refdata = refdata_cache.get(org_id)
+    rows = _facets_in_memory(
+        org_id=org_id, q=q, filters=filters, facets=facets, refdata=refdata
+    )
+    if rows is None:
+        rows = fetch_all_dicts(
+            *_build_facet_query(
+                org_id=org_id, q=q, filters=filters, facets=facets, refdata=refdata
+            )
+        )
+    return _group_facet_rows(facets, rows, refdata)
+
+
+async def facet_counts_async(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    facets: list[FacetSpec],
+) -> dict[str, list[dict[str, Any]]]:
+    refdata = await refdata_cache.get_async(org_id)
+    rows = await _in_memory_async(
+        org_id,
+        _facets_in_memory,
+        org_id=org_id,
+        q=q,
+        filters=filters,
+        facets=facets,
+        refdata=refdata,
+    )
+    if rows is None:
+        rows = await fetch_all_dicts_async(
+            *_build_facet_query(
+                org_id=org_id, q=q, filters=filters, facets=facets, refdata=refdata
+            )
+        )
+    return _group_facet_rows(facets, rows, refdata)
+
+
+def search_employees_with_facets(
+    *,
+    search: dict[str, Any],
+    facets: dict[str, Any],
+    statement_timeout: float | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, list[dict[str, Any]]]]:
+    """
+    Search page + facet counts over one connection in a single round trip
+    (psycopg pipeline mode). `search`/`facets` are the kwargs of the single calls.
+    """
+    columns = search.setdefault("columns", tuple(PROJECTIONS))
+    refdata = refdata_cache.get(search["org_id"])
+    rows, facet_rows = _page_and_facets_in_memory(search, facets, refdata)
+    if facet_rows is None:
+        rows, facet_rows = fetch_many_dicts_pipelined(
+            [
+                _build_search_query(**search),
+                _build_facet_query(**facets, refdata=refdata),
+            ],
+            statement_timeout=statement_timeout,
+        )
+    return (
+        _resolve_descriptors(rows, refdata, columns),
+        _group_facet_rows(facets["facets"], facet_rows, refdata),
+    )
+
+
+async def search_employees_with_facets_async(
+    *,
+    search: dict[str, Any],
+    facets: dict[str, Any],
+    statement_timeout: float | None = None,
+) -> tuple[list[dict[str, Any]], dict[str, list[dict[str, Any]]]]:
+    columns = search.setdefault("columns", tuple(PROJECTIONS))
+    refdata = await refdata_cache.get_async(search["org_id"])
+    rows, facet_rows = await _in_memory_async(
+        search["org_id"], _page_and_facets_in_memory, search, facets, refdata
+    ) or (None, None)
+    if facet_rows is None:
+        rows, facet_rows = await fetch_many_dicts_pipelined_async(
+            [
+                _build_search_query(**search),
+                _build_facet_query(**facets, refdata=refdata),
+            ],
+            statement_timeout=statement_timeout,
+        )
+    return (
+        _resolve_descriptors(rows, refdata, columns),
+        _group_facet_rows(facets["facets"], facet_rows, refdata),
+    )
+
+
+def search_employees_batch(
+    searches: list[dict[str, Any]], *, statement_timeout: float | None = None
+) -> list[list[dict[str, Any]]]:
+    """
+    Several pages of ONE org (kwargs of `search_employees` each) over one
+    connection in a single round trip (pipeline mode).
+    """
+    refdata = refdata_cache.get(searches[0]["org_id"])
+    for s in searches:
+        s.setdefault("columns", tuple(PROJECTIONS))
+    results = _batch_in_memory(searches)
+    if None in results:
+        results = fetch_many_dicts_pipelined(
+            [_build_search_query(**s) for s in searches],
+            statement_timeout=statement_timeout,
+        )
+    return [
+        _resolve_descriptors(rows, refdata, s["columns"])
+        for s, rows in zip(searches, results, strict=True)
+    ]
+
+
+async def search_employees_batch_async(
+    searches: list[dict[str, Any]], *, statement_timeout: float | None = None
+) -> list[list[dict[str, Any]]]:
+    refdata = await refdata_cache.get_async(searches[0]["org_id"])
+    for s in searches:
+        s.setdefault("columns", tuple(PROJECTIONS))
+    results = await _in_memory_async(searches[0]["org_id"], _batch_in_memory, searches)
+    if results is None or None in results:
+        results = await fetch_many_dicts_pipelined_async(
+            [_build_search_query(**s) for s in searches],
+            statement_timeout=statement_timeout,
+        )
+    return [
+        _resolve_descriptors(rows, refdata, s["columns"])
+        for s, rows in zip(searches, results, strict=True)
+    ]
+
+
+def suggest_employees(**kwargs: Any) -> list[dict[str, Any]]:
+    """
+    Typeahead matches for a normalized prefix: employee_id (+ display_name
+    when the org exposes it), best match first.
     """
+    sql, params = _build_suggest_query(**kwargs)
+    return fetch_all_dicts(
+        sql,
+        params,
+        prepare=_suggest_prepare(params),
+        statement_timeout=_ranking_timeout("tsquery" in params),
+    )
 
-    return fetch_all_dicts(sql, params)
+
+async def suggest_employees_async(**kwargs: Any) -> list[dict[str, Any]]:
+    sql, params = _build_suggest_query(**kwargs)
+    return await fetch_all_dicts_async(
+        sql,
+        params,
+        prepare=_suggest_prepare(params),
+        statement_timeout=_ranking_timeout("tsquery" in params),
+    )
+
+
+def export_employees(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    columns: tuple[str, ...],
+) -> Generator[list[dict[str, Any]], None, None]:
+    """
+    Every matching employee, streamed in batches of `settings.export_batch_size`
+    with descriptors resolved from the reference-data cache.
+    """
+    refdata = refdata_cache.get(org_id)
+    sql, params = _build_export_query(
+        org_id=org_id, q=q, filters=filters, columns=columns
+    )
+    # Closed along with this generator, not whenever it is collected
+    with closing(
+        iter_dict_batches(sql, params, batch_size=settings.export_batch_size)
+    ) as batches:
+        for rows in batches:
+            yield _resolve_descriptors(rows, refdata, columns)
+
+
+async def export_employees_async(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    columns: tuple[str, ...],
+) -> AsyncGenerator[list[dict[str, Any]], None]:
+    refdata = await refdata_cache.get_async(org_id)
+    sql, params = _build_export_query(
+        org_id=org_id, q=q, filters=filters, columns=columns
+    )
+    async with aclosing(
+        iter_dict_batches_async(sql, params, batch_size=settings.export_batch_size)
+    ) as batches:
+        async for rows in batches:
+            yield _resolve_descriptors(rows, refdata, columns)
@@ -0,0 +1,294 @@
+# app/modules/employee/result_cache.py
+"""
+Short-TTL cache of search responses (service.search / search_async).
+
+Keys are normalized requests that always include the org and its output
+columns, so an entry is never served across orgs or column configs. Each org
+has an epoch that moves whenever its data may have changed:
+  - NOTIFY hr_org_changed / hr_refdata_changed (listener): immediately
+  - hr_org_version / hr_refdata_version, re-read at most every
+    `revalidate_seconds` per org (one PK lookup): the backstop when no NOTIFY
+    arrives
+An entry only serves the epoch it was filled under, read before its query
+ran, and a fill that raced an invalidation is not stored. Identical
+concurrent misses share one execution (single flight).
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from app.core.coalesce import AsyncSingleFlight, SingleFlight
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector
+from app.db.listener import listener
+from app.modules.org import repository as org_repository
+from app.modules.org.service import REFDATA_CHANNEL
+
+Response = bytes  # the encoded body (encoding)
+
+
+@dataclass
+class _Entry:
+    response: Response
+    org_id: int
+    epoch: int
+    expires_at: float
+
+
+@dataclass
+class _OrgState:
+    epoch: int
+    versions: tuple[int, int] | None = None  # (data, refdata) last read
+    lsn: int | None = None  # primary WAL position when `versions` were first read
+    checked_lsn: int = 0  # primary WAL position at the last read
+    checked_at: float = float("-inf")
+
+
+class OrgVersion(NamedTuple):
+    versions: tuple[int, int]
+    epoch: int
+    lsn: int  # reads on a replica must have replayed it (app/db/replicas.py)
+
+
+class SearchResultCache:
+    """
+    LRU of at most `max_entries` responses, each kept `ttl_seconds` at most.
+    """
+
+    def __init__(
+        self, *, max_entries: int, ttl_seconds: float, revalidate_seconds: float
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._epochs = itertools.count(1)  # never reused: no ABA on re-invalidation
+        self._orgs: dict[int, _OrgState] = {}
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._flight = SingleFlight()
+        self._flight_async = AsyncSingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @property
+    def coalesced(self) -> int:
+        return self._flight.followers + self._flight_async.followers
+
+    def _state(self, org_id: int) -> _OrgState:
+        with self._lock:
+            state = self._orgs.get(org_id)
+            if state is None:
+                state = self._orgs[org_id] = _OrgState(next(self._epochs))
+            return state
+
+    def _is_due(self, state: _OrgState, read_after: int | None) -> bool:
+        return (
+            state.versions is None
+            # A client's write the last read may not have seen (X-Read-After)
+            or (read_after is not None and read_after > state.checked_lsn)
+            or time.monotonic() - state.checked_at >= self.revalidate_seconds
+        )
+
+    def _checked(
+        self, state: _OrgState, versions: tuple[int, int], lsn: int
+    ) -> OrgVersion:
+        with self._lock:
+            if versions != state.versions:
+                if state.versions is not None:
+                    state.epoch = next(self._epochs)
+                    self.invalidations += 1
+                # Unchanged versions keep the older position: replicas that
+                # replayed it already have them
+                state.lsn = lsn
+            state.versions = versions
+            state.checked_lsn = max(state.checked_lsn, lsn)
+            state.checked_at = time.monotonic()
+            return OrgVersion(versions, state.epoch, state.lsn)
+
+    def _current(self, state: _OrgState) -> OrgVersion | None:
+        with self._lock:
+            if state.versions is None or state.lsn is None:
+                return None
+            return OrgVersion(state.versions, state.epoch, state.lsn)
+
+    def version(self, org_id: int, read_after: int | None = None) -> OrgVersion:
+        """
+        The org's (data, refdata) versions as this cache sees them, re-read
+        when due, and the epoch they belong to. Responses built under that
+        epoch, from the primary or a replica that replayed `lsn`, reflect at
+        least those versions (what ETags are derived from). `read_after`: a
+        client's write position; versions last read before it are re-read, so
+        its cached responses and ETags never predate the write.
+        """
+        state = self._state(org_id)
+        due = self._is_due(state, read_after)
+        current = None if due else self._current(state)
+        if current is None:
+            current = self._checked(state, *org_repository.get_data_versions(org_id))
+        return current
+
+    async def version_async(
+        self, org_id: int, read_after: int | None = None
+    ) -> OrgVersion:
+        state = self._state(org_id)
+        due = self._is_due(state, read_after)
+        current = None if due else self._current(state)
+        if current is None:
+            versions, lsn = await org_repository.get_data_versions_async(org_id)
+            current = self._checked(state, versions, lsn)
+        return current
+
+    def _lookup(self, key: Hashable, epoch: int) -> Response | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is None
+                or entry.epoch != epoch
+                or entry.expires_at <= time.monotonic()
+            ):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def _store(
+        self, key: Hashable, org_id: int, epoch: int, response: Response
+    ) -> None:
+        with self._lock:
+            if self._orgs[org_id].epoch != epoch:
+                return  # invalidated while the query ran
+            self._entries[key] = _Entry(
+                response, org_id, epoch, time.monotonic() + self.ttl_seconds
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(
+        self,
+        org_id: int,
+        key: Hashable,
+        compute: Callable[[], Response],
+        version: OrgVersion | None = None,
+    ) -> Response:
+        """
+        The cached response for `key` (which must include `org_id`), or compute
+        it. `version`: the org's, if the caller already read it for `compute`.
+        """
+        if not self.enabled:
+            return compute()
+        epoch = (version or self.version(org_id)).epoch
+        response = self._lookup(key, epoch)
+        if response is not None:
+            return response
+
+        def fill() -> Response:
+            response = compute()
+            self._store(key, org_id, epoch, response)
+            return response
+
+        return self._flight.do((key, epoch), fill)
+
+    async def get_async(
+        self,
+        org_id: int,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Response]],
+        version: OrgVersion | None = None,
+    ) -> Response:
+        if not self.enabled:
+            return await compute()
+        epoch = (version or await self.version_async(org_id)).epoch
+        response = self._lookup(key, epoch)
+        if response is not None:
+            return response
+
+        async def fill() -> Response:
+            response = await compute()
+            self._store(key, org_id, epoch, response)
+            return response
+
+        return await self._flight_async.do((key, epoch), fill)
+
+    def invalidate(self, org_id: int | None = None) -> None:
+        with self._lock:
+            if org_id is None:
+                states = list(self._orgs.values())
+                self._entries.clear()
+            else:
+                states = [s for s in (self._orgs.get(org_id),) if s is not None]
+            for state in states:
+                state.epoch = next(self._epochs)
+                # Re-read on next use; recorded, not compared: the NOTIFY
+                # already covered the change
+                state.versions = None
+            self.invalidations += 1
+
+    def on_notify(self, payload: str) -> None:
+        # payload = org_id (hr_org_changed_trigger / hr_refdata_changed_trigger)
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            self.invalidate()
+
+    def stats(self) -> list[Sample]:
+        return [
+            Sample(
+                "hrms_search_cache_hits_total",
+                "Search responses served from the result cache",
+                self.hits,
+                type="counter",
+            ),
+            Sample(
+                "hrms_search_cache_misses_total",
+                "Search result cache lookups that ran (or joined) a search",
+                self.misses,
+                type="counter",
+            ),
+            Sample(
+                "hrms_search_cache_coalesced_total",
+                "Cache misses served by an identical in-flight search",
+                self.coalesced,
+                type="counter",
+            ),
+            Sample(
+                "hrms_search_cache_invalidations_total",
+                "Org (or whole-cache) invalidations of the result cache",
+                self.invalidations,
+                type="counter",
+            ),
+            Sample(
+                "hrms_search_cache_entries",
+                "Responses held by the search result cache",
+                len(self._entries),
+            ),
+        ]
+
+
+ORG_CHANNEL = "hr_org_changed"
+
+result_cache = SearchResultCache(
+    max_entries=settings.search_cache_max_entries,
+    ttl_seconds=settings.search_cache_ttl_seconds,
+    revalidate_seconds=settings.search_cache_revalidate_seconds,
+)
+# Descriptors come from reference data: its changes invalidate responses too.
+# Everything is dropped on (re)connect: NOTIFYs sent while disconnected are lost
+listener.subscribe(
+    ORG_CHANNEL, result_cache.on_notify, on_reset=result_cache.invalidate
+)
+listener.subscribe(REFDATA_CHANNEL, result_cache.on_notify)
+register_collector(result_cache.stats)
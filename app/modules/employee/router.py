@@ -1,19 +1,46 @@
-from fastapi import APIRouter, Depends, Query
+from collections.abc import AsyncGenerator, Generator
+from typing import Literal
+
+import anyio
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from app.api.deps import get_principal
-from app.api.rate_limit_deps import rate_limit_dep
+from app.api.rate_limit_deps import (
+    charge_db_time,
+    charge_rate_limit,
+    request_cost,
+    streamed_charge,
+)
+from app.core.config import settings
 from app.core.security import Principal
 from app.modules.employee import service
+from app.modules.employee.encoding import MEDIA_TYPE
+from app.modules.employee.schemas import BatchSearchRequest
 
 router = APIRouter(prefix="/orgs/{org_id}/employees", tags=["employees"])
 
 # Module-level singleton to satisfy linter
 _principal_dependency = Depends(get_principal)
+_read_after_header = Header(
+    default=None,
+    alias="X-Read-After",
+    description="LSN of your last write: read from a replica that has replayed it",
+)
+_facets_query = Query(
+    default=None,
+    description=(
+        "Facet dimensions as name[:limit[:q]]: company, dept, location, "
+        "jobcode, position, empl_status. Defaults to position."
+    ),
+)
 
 
-@router.get("/search", dependencies=[Depends(rate_limit_dep)])
-def search_employees(
+@router.get("/search")
+async def search_employees(
     org_id: int,
+    response: Response,
     q: str | None = Query(default=None),
     deptid: str | None = None,
     location: str | None = None,
@@ -23,17 +50,25 @@ def search_employees(
     empl_status: str | None = None,
     limit: int = Query(default=20, ge=1, le=100),
     include_facets: bool = Query(default=False),
+    facets: list[str] | None = _facets_query,
     facet_limit: int = Query(default=20, ge=1, le=50),
     facet_q: str | None = Query(default=None),
-    cursor_updated_at: str | None = None,
-    cursor_employee_id: str | None = None,
+    sort: Literal["recent", "relevance"] = "recent",
+    cursor: str | None = Query(
+        default=None, description="`next_cursor` of the previous page"
+    ),
+    cursor_updated_at: str | None = Query(default=None, deprecated=True),
+    cursor_employee_id: str | None = Query(default=None, deprecated=True),
+    strategy: Literal["single", "two_phase"] | None = None,
+    if_none_match: str | None = Header(default=None),
+    read_after: str | None = _read_after_header,
     principal: Principal = _principal_dependency,
 ):
-    return service.search(
-        principal=principal,
-        org_id=org_id,
-        q=q,
-        filters={
+    kwargs = {
+        "principal": principal,
+        "org_id": org_id,
+        "q": q,
+        "filters": {
             "deptid": deptid,
             "location": location,
             "jobcode": jobcode,
@@ -41,10 +76,179 @@ def search_employees(
             "position_nbr": position_nbr,
             "empl_status": empl_status,
         },
+        "limit": limit,
+        "include_facets": include_facets,
+        "facets": facets,
+        "facet_limit": facet_limit,
+        "facet_q": facet_q,
+        "cursor_updated_at": cursor_updated_at,
+        "cursor_employee_id": cursor_employee_id,
+        "strategy": strategy,
+        "sort": sort,
+        "cursor": cursor,
+        "if_none_match": if_none_match,
+        "headers": response.headers,
+        "read_after": read_after,
+    }
+    cost = service.search_cost(
+        q=q,
+        filters=kwargs["filters"],
         limit=limit,
+        sort=sort,
         include_facets=include_facets,
-        facet_limit=facet_limit,
-        facet_q=facet_q,
-        cursor_updated_at=cursor_updated_at,
-        cursor_employee_id=cursor_employee_id,
+        facets=facets,
+    )
+    # 403 before any tokens are taken: a forbidden call costs the caller nothing
+    service.authorize(principal, org_id)
+    # A 304 or a cached body runs no query: admission takes 1 token, the rest
+    # of the shape cost is debited only when the search actually runs
+    charge_rate_limit(response, principal, cost=1.0)
+    kwargs["on_query"] = streamed_charge(
+        principal, request_cost(cost) - 1.0, prepaid_rows=0, response=response
+    )
+    with charge_db_time(response, principal):
+        if settings.db_async:
+            body = await service.search_async(**kwargs)
+        else:
+            # Sync path (A/B baseline): same threadpool behaviour as a plain `def` route
+            body = await run_in_threadpool(service.search, **kwargs)
+    # Already JSON (encoding): sent as is. A returned Response does not get the
+    # injected one's headers, so they are passed on explicitly
+    return Response(body, media_type=MEDIA_TYPE, headers=response.headers)
+
+
+@router.get("/suggest")
+async def suggest_employees(
+    org_id: int,
+    response: Response,
+    q: str = Query(default="", max_length=100),
+    limit: int = Query(default=8, ge=1, le=20),
+    session: str | None = Header(
+        default=None,
+        alias="X-Suggest-Session",
+        max_length=64,
+        description="Input box id: older in-flight requests of it answer 204",
+    ),
+    principal: Principal = _principal_dependency,
+):
+    service.authorize(principal, org_id)
+    # One call per keystroke, each an index range scan: a fraction of a search
+    charge_rate_limit(response, principal, cost=request_cost(0.2))
+    kwargs = {
+        "principal": principal,
+        "org_id": org_id,
+        "q": q,
+        "limit": limit,
+        "session": session,
+    }
+    with charge_db_time(response, principal):
+        if settings.db_async:
+            return await service.suggest_async(**kwargs)
+        return await run_in_threadpool(service.suggest, **kwargs)
+
+
+@router.post("/search/batch")
+async def search_employees_batch(
+    org_id: int,
+    body: BatchSearchRequest,
+    response: Response,
+    read_after: str | None = _read_after_header,
+    principal: Principal = _principal_dependency,
+):
+    # Each sub-search is charged as if sent alone: batching saves round trips,
+    # not quota
+    cost = sum(
+        request_cost(
+            service.search_cost(
+                q=spec.q, filters=spec.filters(), limit=spec.limit, sort=spec.sort
+            )
+        )
+        for spec in body.searches
+    )
+    service.authorize(principal, org_id)
+    charge_rate_limit(response, principal, cost=cost)
+    kwargs = {
+        "principal": principal,
+        "org_id": org_id,
+        "searches": body.searches,
+        "read_after": read_after,
+    }
+    with charge_db_time(response, principal):
+        if settings.db_async:
+            return await service.search_batch_async(**kwargs)
+        return await run_in_threadpool(service.search_batch, **kwargs)
+
+
+class _ExportResponse(StreamingResponse):
+    """
+    Closes the export's generator however the response ends. Starlette only
+    stops iterating when the client disconnects; closing the generator is what
+    releases its server-side cursor and pooled connection right away.
+    """
+
+    def __init__(
+        self,
+        content: Generator[bytes, None, None] | AsyncGenerator[bytes, None],
+        **kwargs,
+    ) -> None:
+        super().__init__(content, **kwargs)
+        self._content = content
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                if isinstance(self._content, AsyncGenerator):
+                    await self._content.aclose()
+                else:
+                    # Never running here: a cancelled threadpool step is awaited
+                    await run_in_threadpool(self._content.close)
+
+
+@router.get("/export")
+async def export_employees(
+    org_id: int,
+    response: Response,
+    q: str | None = Query(default=None),
+    deptid: str | None = None,
+    location: str | None = None,
+    jobcode: str | None = None,
+    position_nbr: str | None = None,
+    company: str | None = None,
+    empl_status: str | None = None,
+    fmt: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    principal: Principal = _principal_dependency,
+):
+    kwargs = {
+        "principal": principal,
+        "org_id": org_id,
+        "q": q,
+        "filters": {
+            "deptid": deptid,
+            "location": location,
+            "jobcode": jobcode,
+            "company": company,
+            "position_nbr": position_nbr,
+            "empl_status": empl_status,
+        },
+        "fmt": fmt,
+    }
+    # Charged per row, at the rate of paging them out of search: admission
+    # pays for the first page, the rest is debited as the batches stream
+    row_cost = service.export_row_cost(q=q, filters=kwargs["filters"])
+    page = service.EXPORT_PAGE_ROWS
+    service.authorize(principal, org_id)
+    charge_rate_limit(response, principal, cost=request_cost(row_cost * page))
+    kwargs["on_rows"] = streamed_charge(principal, row_cost, prepaid_rows=page)
+    if settings.db_async:
+        body = await service.export_async(**kwargs)
+    else:
+        # Sync generator: Starlette iterates it on the threadpool
+        body = await run_in_threadpool(service.export, **kwargs)
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="employees-{org_id}.{fmt}"'
+    )
+    return _ExportResponse(
+        body, media_type=service.EXPORT_MEDIA_TYPES[fmt], headers=response.headers
     )
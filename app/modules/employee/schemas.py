@@ -1 +1,39 @@
-# Placeholder for Pydantic models.
+# app/modules/employee/schemas.py
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+# Sub-searches per batch request; each one is charged to the rate limit
+MAX_BATCH_SEARCHES = 10
+
+
+class SearchSpec(BaseModel):
+    """
+    One search of a batch: the query parameters of GET /search (no facets).
+    """
+
+    q: str | None = None
+    deptid: str | None = None
+    location: str | None = None
+    jobcode: str | None = None
+    position_nbr: str | None = None
+    company: str | None = None
+    empl_status: str | None = None
+    limit: int = Field(default=20, ge=1, le=100)
+    sort: Literal["recent", "relevance"] = "recent"
+    cursor: str | None = None
+    strategy: Literal["single", "two_phase"] | None = None
+
+    def filters(self) -> dict[str, str | None]:
+        return {
+            "deptid": self.deptid,
+            "location": self.location,
+            "jobcode": self.jobcode,
+            "company": self.company,
+            "position_nbr": self.position_nbr,
+            "empl_status": self.empl_status,
+        }
+
+
+class BatchSearchRequest(BaseModel):
+    searches: list[SearchSpec] = Field(min_length=1, max_length=MAX_BATCH_SEARCHES)
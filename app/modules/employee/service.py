@@ -1,11 +1,322 @@
 # app/modules/employee/service.py
+import asyncio
+import contextvars
+import csv
+import hashlib
+import io
+import json
+import re
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Generator,
+    Iterator,
+    MutableMapping,
+)
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from typing import Any
 
 from fastapi import HTTPException
+from psycopg.errors import QueryCanceled
 
+from app.api.errors import bad_request
+from app.core.coalesce import (
+    AsyncSingleFlight,
+    SingleFlight,
+    Superseded,
+    Supersession,
+)
+from app.core.config import settings
+from app.core.metrics import Sample, register_collector, stage
 from app.core.security import Principal
-from app.modules.employee import repository
+from app.db.deps import admitted, db_deadline
+from app.db.replicas import parse_lsn, replicas
+from app.modules.employee import encoding, memindex, repository
 from app.modules.employee.config import ALLOWED_COLUMNS, get_columns_for_org
+from app.modules.employee.cursor import Cursor, decode_cursor, encode_cursor
+from app.modules.employee.result_cache import result_cache
+from app.modules.employee.schemas import SearchSpec
+from app.modules.org.service import refdata_cache
+
+# Runs the facet query next to the search query on the sync path (concurrent mode).
+# Sized like the pool: more threads than connections would only queue on checkout.
+_facet_executor = ThreadPoolExecutor(
+    max_workers=settings.db_pool_max_size, thread_name_prefix="facets"
+)
+
+
+def _read_after(read_after: str | None) -> int | None:
+    # Client read-your-writes watermark: an LSN from after its write
+    if not read_after:
+        return None
+    try:
+        return parse_lsn(read_after)
+    except ValueError as err:
+        raise bad_request("Invalid X-Read-After (an LSN, e.g. 16/B374D848)") from err
+
+
+def _search_timeout() -> HTTPException:
+    return HTTPException(status_code=504, detail="Search timed out")
+
+
+@contextmanager
+def _statement_timeouts() -> Generator[None, None, None]:
+    # A statement_timeout fired on the server: the search ran out of budget
+    try:
+        yield
+    except QueryCanceled as err:
+        raise _search_timeout() from err
+
+
+def authorize(principal: Principal, org_id: int) -> None:
+    # check org_id
+    if principal.org_id != org_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    # check scope
+    if "employee.read" not in principal.scopes:
+        raise HTTPException(status_code=403, detail="Insufficient scope")
+
+
+def _output_columns(org_id: int) -> tuple[str, ...]:
+    # Dynamic columns per org + allowlist = no leakage
+    columns = get_columns_for_org(org_id)
+    return tuple(c for c in columns if c in ALLOWED_COLUMNS)
+
+
+def _cursor_context(org_id: int, sort: str, q: str | None) -> str:
+    # Ranks are only comparable within one query, so relevance cursors bind q too
+    query = (q or "").strip() if sort == "relevance" else ""
+    return f"{org_id}:{sort}:{query}"
+
+
+def _search_kwargs(
+    *,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    limit: int,
+    cursor_updated_at: str | None,
+    cursor_employee_id: str | None,
+    strategy: str | None,
+    sort: str = "recent",
+    cursor: str | None = None,
+) -> dict[str, Any]:
+    if sort == "relevance" and not (q and q.strip()):
+        raise bad_request("sort=relevance requires q")
+
+    keyset: dict[str, Any] = {
+        "cursor_updated_at": cursor_updated_at,  # legacy raw cursor (sort=recent)
+        "cursor_employee_id": cursor_employee_id,
+        "cursor_rank": None,
+    }
+    if sort == "relevance" and (cursor_updated_at or cursor_employee_id):
+        raise bad_request("sort=relevance only accepts `cursor`")
+    if cursor:
+        c = decode_cursor(cursor, context=_cursor_context(org_id, sort, q))
+        keyset = {
+            "cursor_updated_at": c.updated_at,
+            "cursor_employee_id": c.employee_id,
+            "cursor_rank": c.rank,
+        }
+
+    return {
+        "org_id": org_id,
+        "q": q,
+        "deptid": filters.get("deptid"),
+        "location": filters.get("location"),
+        "jobcode": filters.get("jobcode"),
+        "position_nbr": filters.get("position_nbr"),
+        "company": filters.get("company"),
+        "empl_status": filters.get("empl_status"),
+        "limit": limit,
+        **keyset,
+        # Projection pushdown: only the org's columns are selected/joined
+        "columns": _output_columns(org_id),
+        "strategy": strategy or settings.search_strategy,
+        "sort": sort,
+    }
+
+
+def _facet_specs(
+    *,
+    include_facets: bool,
+    facets: list[str] | None,
+    facet_limit: int,
+    facet_q: str | None,
+) -> list[repository.FacetSpec]:
+    """
+    Parse `facets=name[:limit[:q]]` entries (repeatable or comma separated).
+    `facet_limit`/`facet_q` are the defaults for entries that don't override them.
+    `include_facets=true` without `facets` keeps the original position-only facet.
+    """
+    entries = [e.strip() for raw in facets or [] for e in raw.split(",") if e.strip()]
+    if not entries and include_facets:
+        entries = ["position"]
+
+    specs: dict[str, repository.FacetSpec] = {}
+    for entry in entries:
+        name, *rest = entry.split(":", 2)
+        if name not in repository.FACET_DIMENSIONS:
+            allowed = ", ".join(repository.FACET_DIMENSIONS)
+            raise bad_request(f"Unknown facet '{name}' (allowed: {allowed})")
+        limit = facet_limit
+        if rest and rest[0]:
+            if not rest[0].isdigit() or not 1 <= int(rest[0]) <= 50:
+                raise bad_request(f"Invalid limit for facet '{name}' (1-50)")
+            limit = int(rest[0])
+        q = rest[1] if len(rest) > 1 else facet_q
+        specs.setdefault(name, repository.FacetSpec(dimension=name, limit=limit, q=q))
+    return list(specs.values())
+
+
+def _item(row: dict[str, Any], safe_cols: tuple[str, ...]) -> dict[str, Any]:
+    item = {"employee_id": str(row["employee_id"])}  # always include opaque id
+    for c in safe_cols:
+        item[c] = row.get(c)
+    return item
+
+
+def search_cost(
+    *,
+    q: str | None,
+    filters: dict[str, str | None],
+    limit: int,
+    sort: str = "recent",
+    include_facets: bool = False,
+    facets: list[str] | None = None,
+) -> float:
+    """
+    Rate-limit tokens for one search, from its shape. A plain or cursor page of
+    20 costs 1; FTS, relevance ranking and facet scans add to it, divided by
+    how much the exact-match filters narrow the scanned set; wider pages add up
+    to 2 more.
+    """
+    scan = 0.0
+    if q and q.strip():
+        scan += 2.0
+        if sort == "relevance":
+            scan += 1.0
+    specs = _facet_specs(
+        include_facets=include_facets, facets=facets, facet_limit=20, facet_q=None
+    )
+    if specs:
+        scan += 2.0 + len(specs)  # the grouping scan + one set per dimension
+    narrowing = 1 + sum(1 for v in filters.values() if v)
+    return 1.0 + max(0, limit - 20) / 40 + scan / narrowing
+
+
+def _next_cursor(
+    *, org_id: int, rows: list[dict[str, Any]], sort: str, q: str | None
+) -> str | None:
+    if not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(
+        Cursor(
+            sort=sort,
+            employee_id=last["employee_id"],
+            updated_at=last["updated_at"],
+            rank=last["rank"] if sort == "relevance" else None,
+        ),
+        context=_cursor_context(org_id, sort, q),
+    )
+
+
+def _build_response(
+    *,
+    org_id: int,
+    rows: list[dict[str, Any]],
+    limit: int,
+    sort: str = "recent",
+    q: str | None = None,
+) -> dict[str, Any]:
+    projection = encoding.projection(_output_columns(org_id))
+    with stage("projection"):
+        items = projection.items(rows)
+    next_cursor = _next_cursor(org_id=org_id, rows=rows, sort=sort, q=q)
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+def _encode_response(
+    *,
+    org_id: int,
+    rows: list[dict[str, Any]],
+    limit: int,
+    sort: str,
+    q: str | None,
+    facets: dict[str, list[dict[str, Any]]] | None = None,
+) -> bytes:
+    # The search route's body, already JSON (encoding): no per-item dicts to
+    # re-encode downstream, and the result cache holds the bytes themselves
+    projection = encoding.projection(_output_columns(org_id))
+    next_cursor = _next_cursor(org_id=org_id, rows=rows, sort=sort, q=q)
+    with stage("projection"):
+        return encoding.encode_page(
+            projection, rows, next_cursor=next_cursor, limit=limit, facets=facets
+        )
+
+
+def _cache_key(
+    search_kwargs: dict[str, Any], specs: list[repository.FacetSpec]
+) -> tuple[Any, ...]:
+    """
+    Result-cache key: requests with the same response share it. The org and its
+    output columns are always part of it; `strategy` is not (same rows).
+    """
+    q = (search_kwargs["q"] or "").strip()
+    if search_kwargs["sort"] != "relevance":
+        # FTS is case- and spacing-insensitive; relevance cursors bind q as sent
+        q = " ".join(q.lower().split())
+    keyset = ("cursor_updated_at", "cursor_employee_id", "cursor_rank")
+    return (
+        search_kwargs["org_id"],
+        search_kwargs["columns"],
+        search_kwargs["sort"],
+        q,
+        tuple(search_kwargs[f] or None for f in repository.FILTER_COLUMNS),
+        search_kwargs["limit"],
+        tuple(
+            None if search_kwargs[k] is None else str(search_kwargs[k]) for k in keyset
+        ),
+        tuple((f.dimension, f.limit, (f.q or "").strip()) for f in specs),
+    )
+
+
+def _cache_control() -> str:
+    # Every use revalidates (a 304 costs one version read) unless shared caches
+    # may serve a response as is for a few seconds; Vary keeps them per API key
+    s_maxage = settings.search_http_s_maxage
+    return f"public, max-age=0, s-maxage={s_maxage}" if s_maxage else "no-cache"
+
+
+def _validators(
+    headers: MutableMapping[str, str],
+    key: tuple[Any, ...],
+    versions: tuple[int, int],
+    if_none_match: str | None,
+) -> None:
+    """
+    Strong ETag of the response to `key` at the org's (data, refdata) versions:
+    the same on every instance, and it changes with any write to the org.
+    Raises 304 when the client's copy is current.
+    """
+    digest = hashlib.blake2b(repr((versions, key)).encode(), digest_size=16)
+    etag = f'"{digest.hexdigest()}"'
+    headers["ETag"] = etag
+    headers["Cache-Control"] = _cache_control()
+    headers["Vary"] = "X-API-Key"
+    if if_none_match is None:
+        return
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    if etag in tags or "*" in tags:
+        raise HTTPException(
+            status_code=304,
+            headers={k: headers[k] for k in ("ETag", "Cache-Control", "Vary")},
+        )
 
 
 def search(
@@ -20,58 +331,536 @@ def search(
     facet_q: str | None,
     cursor_updated_at: str | None,
     cursor_employee_id: str | None,
-) -> dict[str, Any]:
-    # check org_id
-    if principal.org_id != org_id:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    # check scope
-    if "employee.read" not in principal.scopes:
-        raise HTTPException(status_code=403, detail="Insufficient scope")
+    facets: list[str] | None = None,
+    strategy: str | None = None,
+    sort: str = "recent",
+    cursor: str | None = None,
+    if_none_match: str | None = None,
+    headers: MutableMapping[str, str] | None = None,
+    read_after: str | None = None,
+    on_query: Callable[[int], None] | None = None,
+) -> bytes:
+    """
+    One page (+ facets) as a JSON body. With `headers` (the HTTP response's),
+    sets the ETag and caching headers, and answers 304 when `if_none_match`
+    matches before running any search. The queries may run on a read replica
+    that has replayed `read_after` (an LSN) and the org's current versions.
+    `on_query(1)` is called when the search runs (not on a 304 or cache hit).
+    """
+    authorize(principal, org_id)
 
-    # get employee data
-    rows = repository.search_employees(
+    search_kwargs = _search_kwargs(
         org_id=org_id,
         q=q,
-        deptid=filters.get("deptid"),
-        location=filters.get("location"),
-        jobcode=filters.get("jobcode"),
-        position_nbr=filters.get("position_nbr"),
-        company=filters.get("company"),
-        empl_status=filters.get("empl_status"),
+        filters=filters,
         limit=limit,
         cursor_updated_at=cursor_updated_at,
         cursor_employee_id=cursor_employee_id,
+        strategy=strategy,
+        sort=sort,
+        cursor=cursor,
+    )
+    specs = _facet_specs(
+        include_facets=include_facets,
+        facets=facets,
+        facet_limit=facet_limit,
+        facet_q=facet_q,
     )
+    key = _cache_key(search_kwargs, specs)
+    min_lsn = _read_after(read_after)
+    version = result_cache.version(org_id, read_after=min_lsn)
+    if headers is not None:
+        _validators(headers, key, version.versions, if_none_match)
+    # Replica reads, in-process indexes and descriptors must be at least as
+    # new as the versions (cache, ETag)
+    min_lsn = max(min_lsn or 0, version.lsn)
 
-    # Dynamic columns per org + allowlist = no leakage
-    columns = get_columns_for_org(org_id)
-    safe_cols = [c for c in columns if c in ALLOWED_COLUMNS]
-    items: list[dict[str, Any]] = []
-    for r in rows:
-        item = {"employee_id": str(r["employee_id"])}  # always include opaque id
-        for c in safe_cols:
-            item[c] = r.get(c)
-        items.append(item)
-
-    next_cursor = None
-    if rows:
-        last = rows[-1]
-        next_cursor = {
-            "updated_at": last["updated_at"].isoformat(),
-            "employee_id": str(last["employee_id"]),
-        }
+    def compute() -> bytes:
+        if on_query is not None:
+            on_query(1)
+        with (
+            _statement_timeouts(),
+            admitted(),  # one slot for the page and facet queries
+            replicas.reading(min_lsn),
+            memindex.indexes.reading(version.versions),
+            refdata_cache.reading(version.versions[1]),
+        ):
+            return _search(search_kwargs, specs, filters=filters)
 
-    resp: dict[str, Any] = {"items": items, "next_cursor": next_cursor, "limit": limit}
+    return result_cache.get(org_id, key, compute, version)
 
-    # Facets
-    if include_facets:
-        facets_position = repository.facet_positions(
+
+def _search(
+    search_kwargs: dict[str, Any],
+    specs: list[repository.FacetSpec],
+    *,
+    filters: dict[str, str | None],
+) -> bytes:
+    org_id, q = search_kwargs["org_id"], search_kwargs["q"]
+    limit, sort = search_kwargs["limit"], search_kwargs["sort"]
+    # Every query below gets the time left as its statement_timeout
+    with db_deadline(settings.search_timeout_seconds) as deadline:
+        if not specs:
+            rows = repository.search_employees(**search_kwargs)
+            return _encode_response(
+                org_id=org_id, rows=rows, limit=limit, sort=sort, q=q
+            )
+
+        facet_kwargs = {"org_id": org_id, "q": q, "filters": filters, "facets": specs}
+        mode = settings.search_facets_mode
+
+        if mode == "pipeline":
+            rows, facet_results = repository.search_employees_with_facets(
+                search=search_kwargs, facets=facet_kwargs
+            )
+        elif mode == "concurrent":
+            # Facets on a helper thread while this thread runs the page query
+            # copy_context: the helper thread still reports into this request's
+            # DB-time accumulator (rate limiting in db_time mode) and deadline
+            facets_future = _facet_executor.submit(
+                contextvars.copy_context().run, repository.facet_counts, **facet_kwargs
+            )
+            try:
+                rows = repository.search_employees(**search_kwargs)
+                facet_results = facets_future.result(timeout=deadline.remaining())
+            except FutureTimeoutError as err:
+                raise _search_timeout() from err
+            finally:
+                if not facets_future.done() and not facets_future.cancel():
+                    deadline.cancel()  # running: stop its query, not just the wait
+        else:
+            rows = repository.search_employees(**search_kwargs)
+            facet_results = repository.facet_counts(**facet_kwargs)
+
+    return _encode_response(
+        org_id=org_id, rows=rows, limit=limit, sort=sort, q=q, facets=facet_results
+    )
+
+
+async def search_async(
+    *,
+    principal: Principal,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    limit: int,
+    include_facets: bool,
+    facet_limit: int,
+    facet_q: str | None,
+    cursor_updated_at: str | None,
+    cursor_employee_id: str | None,
+    facets: list[str] | None = None,
+    strategy: str | None = None,
+    sort: str = "recent",
+    cursor: str | None = None,
+    if_none_match: str | None = None,
+    headers: MutableMapping[str, str] | None = None,
+    read_after: str | None = None,
+    on_query: Callable[[int], None] | None = None,
+) -> bytes:
+    """
+    Same contract as `search`, but awaits the DB on the asyncio pool so the
+    request never occupies a threadpool slot.
+    """
+    authorize(principal, org_id)
+
+    search_kwargs = _search_kwargs(
+        org_id=org_id,
+        q=q,
+        filters=filters,
+        limit=limit,
+        cursor_updated_at=cursor_updated_at,
+        cursor_employee_id=cursor_employee_id,
+        strategy=strategy,
+        sort=sort,
+        cursor=cursor,
+    )
+    specs = _facet_specs(
+        include_facets=include_facets,
+        facets=facets,
+        facet_limit=facet_limit,
+        facet_q=facet_q,
+    )
+    key = _cache_key(search_kwargs, specs)
+    min_lsn = _read_after(read_after)
+    version = await result_cache.version_async(org_id, read_after=min_lsn)
+    if headers is not None:
+        _validators(headers, key, version.versions, if_none_match)
+    min_lsn = max(min_lsn or 0, version.lsn)
+
+    async def compute() -> bytes:
+        if on_query is not None:
+            on_query(1)
+        with (
+            _statement_timeouts(),
+            admitted(),  # one slot for the page and facet queries
+            replicas.reading(min_lsn),
+            memindex.indexes.reading(version.versions),
+            refdata_cache.reading(version.versions[1]),
+        ):
+            return await _search_async(search_kwargs, specs, filters=filters)
+
+    return await result_cache.get_async(org_id, key, compute, version)
+
+
+async def _search_async(
+    search_kwargs: dict[str, Any],
+    specs: list[repository.FacetSpec],
+    *,
+    filters: dict[str, str | None],
+) -> bytes:
+    org_id, q = search_kwargs["org_id"], search_kwargs["q"]
+    limit, sort = search_kwargs["limit"], search_kwargs["sort"]
+    facet_kwargs = {"org_id": org_id, "q": q, "filters": filters, "facets": specs}
+    mode = settings.search_facets_mode
+    budget = settings.search_timeout_seconds
+
+    # The task is cancelled at the deadline and every query carries the time
+    # left as its statement_timeout, so the server stops it as well
+    try:
+        async with asyncio.timeout(budget):
+            with db_deadline(budget):
+                if not specs:
+                    rows = await repository.search_employees_async(**search_kwargs)
+                    facet_results = None
+                elif mode == "pipeline":
+                    (
+                        rows,
+                        facet_results,
+                    ) = await repository.search_employees_with_facets_async(
+                        search=search_kwargs, facets=facet_kwargs
+                    )
+                elif mode == "concurrent":
+                    rows, facet_results = await asyncio.gather(
+                        repository.search_employees_async(**search_kwargs),
+                        repository.facet_counts_async(**facet_kwargs),
+                    )
+                else:
+                    rows = await repository.search_employees_async(**search_kwargs)
+                    facet_results = await repository.facet_counts_async(**facet_kwargs)
+    except TimeoutError as err:
+        raise _search_timeout() from err
+
+    return _encode_response(
+        org_id=org_id, rows=rows, limit=limit, sort=sort, q=q, facets=facet_results
+    )
+
+
+def _batch_kwargs(org_id: int, searches: list[SearchSpec]) -> list[dict[str, Any]]:
+    return [
+        _search_kwargs(
             org_id=org_id,
-            q=q,
-            position_nbr=filters.get("position_nbr"),
-            empl_status=filters.get("empl_status"),
-            facet_limit=facet_limit,
-            facet_q=facet_q,
+            q=spec.q,
+            filters=spec.filters(),
+            limit=spec.limit,
+            cursor_updated_at=None,
+            cursor_employee_id=None,
+            strategy=spec.strategy,
+            sort=spec.sort,
+            cursor=spec.cursor,
+        )
+        for spec in searches
+    ]
+
+
+def _build_batch_response(
+    org_id: int, searches: list[SearchSpec], results: list[list[dict[str, Any]]]
+) -> dict[str, Any]:
+    return {
+        "results": [
+            _build_response(
+                org_id=org_id, rows=rows, limit=spec.limit, sort=spec.sort, q=spec.q
+            )
+            for spec, rows in zip(searches, results, strict=True)
+        ]
+    }
+
+
+def search_batch(
+    *,
+    principal: Principal,
+    org_id: int,
+    searches: list[SearchSpec],
+    read_after: str | None = None,
+) -> dict[str, Any]:
+    """
+    N searches of one org, one DB round trip (pipeline mode); results in order.
+    The caller has already been charged N rate-limit tokens.
+    """
+    authorize(principal, org_id)
+    with _statement_timeouts(), replicas.reading(_read_after(read_after)):
+        results = repository.search_employees_batch(
+            _batch_kwargs(org_id, searches),
+            statement_timeout=settings.search_timeout_seconds,
         )
-        resp["facets"] = {"position": facets_position}
-    return resp
+    return _build_batch_response(org_id, searches, results)
+
+
+async def search_batch_async(
+    *,
+    principal: Principal,
+    org_id: int,
+    searches: list[SearchSpec],
+    read_after: str | None = None,
+) -> dict[str, Any]:
+    authorize(principal, org_id)
+    budget = settings.search_timeout_seconds
+    min_lsn = _read_after(read_after)
+    try:
+        async with asyncio.timeout(budget):
+            with _statement_timeouts(), replicas.reading(min_lsn):
+                results = await repository.search_employees_batch_async(
+                    _batch_kwargs(org_id, searches), statement_timeout=budget
+                )
+    except TimeoutError as err:
+        raise _search_timeout() from err
+    return _build_batch_response(org_id, searches, results)
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Exports are charged as the same rows paged out of search at the widest limit
+EXPORT_PAGE_ROWS = 100
+
+
+def export_row_cost(*, q: str | None, filters: dict[str, str | None]) -> float:
+    """Rate-limit tokens per exported row: a search page of 100, per row."""
+    return search_cost(q=q, filters=filters, limit=EXPORT_PAGE_ROWS) / EXPORT_PAGE_ROWS
+
+
+def _encode_batch(
+    rows: list[dict[str, Any]], safe_cols: tuple[str, ...], fmt: str, header: bool
+) -> bytes:
+    # One chunk per DB batch: few, large writes instead of one per row
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if header:
+            writer.writerow(["employee_id", *safe_cols])
+        writer.writerows(_item(r, safe_cols).values() for r in rows)
+        return buf.getvalue().encode()
+    lines = (json.dumps(_item(r, safe_cols), separators=(",", ":")) for r in rows)
+    return "".join(line + "\n" for line in lines).encode()
+
+
+def _encode_export(
+    first: list[dict[str, Any]],
+    batches: Generator[list[dict[str, Any]], None, None],
+    safe_cols: tuple[str, ...],
+    fmt: str,
+    on_rows: Callable[[int], None] | None,
+) -> Iterator[bytes]:
+    # Closing this generator (the client went away) closes `batches` at once:
+    # its server-side cursor and pooled connection are released right there
+    try:
+        rows, header = first, True
+        while True:
+            if on_rows is not None:
+                on_rows(len(rows))
+            yield _encode_batch(rows, safe_cols, fmt, header=header)
+            rows, header = next(batches, None), False
+            if rows is None:
+                return
+    finally:
+        batches.close()
+
+
+async def _encode_export_async(
+    first: list[dict[str, Any]],
+    batches: AsyncGenerator[list[dict[str, Any]], None],
+    safe_cols: tuple[str, ...],
+    fmt: str,
+    on_rows: Callable[[int], None] | None,
+) -> AsyncIterator[bytes]:
+    try:
+        rows, header = first, True
+        while True:
+            if on_rows is not None:
+                on_rows(len(rows))
+            yield _encode_batch(rows, safe_cols, fmt, header=header)
+            rows, header = await anext(batches, None), False
+            if rows is None:
+                return
+    finally:
+        await batches.aclose()
+
+
+def export(
+    *,
+    principal: Principal,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    fmt: str,
+    on_rows: Callable[[int], None] | None = None,
+) -> Generator[bytes, None, None]:
+    """
+    Stream the org's filtered directory as NDJSON or CSV, constant memory.
+    Same isolation, column allowlist and filters as `search`. `on_rows` gets
+    each batch's row count before it is sent. Close the returned generator
+    when the response ends early: that returns the connection to the pool.
+    """
+    authorize(principal, org_id)
+    safe_cols = _output_columns(org_id)
+    batches = repository.export_employees(
+        org_id=org_id, q=q, filters=filters, columns=safe_cols
+    )
+    # Pull the first batch now: pool exhaustion/query errors become a proper
+    # 503/500 instead of a truncated 200 stream
+    first = next(batches, [])
+    return _encode_export(first, batches, safe_cols, fmt, on_rows)
+
+
+async def export_async(
+    *,
+    principal: Principal,
+    org_id: int,
+    q: str | None,
+    filters: dict[str, str | None],
+    fmt: str,
+    on_rows: Callable[[int], None] | None = None,
+) -> AsyncGenerator[bytes, None]:
+    authorize(principal, org_id)
+    safe_cols = _output_columns(org_id)
+    batches = repository.export_employees_async(
+        org_id=org_id, q=q, filters=filters, columns=safe_cols
+    )
+    first = await anext(batches, [])
+    return _encode_export_async(first, batches, safe_cols, fmt, on_rows)
+
+
+# Typeahead: identical concurrent lookups share one query, and a newer
+# keystroke from the same input box makes the older request moot
+_suggest_flight = SingleFlight()
+_suggest_flight_async = AsyncSingleFlight()
+_suggest_latest = Supersession()
+
+register_collector(
+    lambda: [
+        Sample(
+            "hrms_suggest_queries_total",
+            "Suggest lookups that ran a query",
+            _suggest_flight.leaders + _suggest_flight_async.leaders,
+            type="counter",
+        ),
+        Sample(
+            "hrms_suggest_coalesced_total",
+            "Suggest lookups served by another request's query",
+            _suggest_flight.followers + _suggest_flight_async.followers,
+            type="counter",
+        ),
+        Sample(
+            "hrms_suggest_superseded_total",
+            "Suggest requests dropped for a newer one from the same client",
+            _suggest_latest.superseded,
+            type="counter",
+        ),
+    ]
+)
+
+_CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
+
+
+def _normalize_prefix(q: str | None) -> str:
+    # Case-insensitive and whitespace-insensitive; control characters (NUL
+    # above all) can never match a name and would break the range bounds
+    return " ".join(_CONTROL_CHARS.sub(" ", q or "").lower().split())
+
+
+def _superseded() -> HTTPException:
+    # The client has already moved on: nothing worth sending back
+    return HTTPException(status_code=204)
+
+
+def _suggest_response(
+    rows: list[dict[str, Any]], columns: tuple[str, ...]
+) -> dict[str, Any]:
+    named = "display_name" in columns
+    with stage("projection"):
+        items = [
+            {"employee_id": str(r["employee_id"]), "display_name": r["display_name"]}
+            if named
+            else {"employee_id": str(r["employee_id"])}
+            for r in rows
+        ]
+    return {"items": items}
+
+
+def suggest(
+    *,
+    principal: Principal,
+    org_id: int,
+    q: str | None,
+    limit: int,
+    session: str | None = None,
+) -> dict[str, Any]:
+    """
+    Typeahead matches for `q` as a prefix of display name, last name or email
+    (then of any word of the search document). `session` identifies the
+    client's input box: a request is answered with 204 once a newer one from
+    the same caller and session has arrived.
+    """
+    authorize(principal, org_id)
+    prefix = _normalize_prefix(q)
+    if not prefix:
+        return {"items": []}
+    columns = _output_columns(org_id)
+
+    def lookup() -> list[dict[str, Any]]:
+        with _statement_timeouts():
+            return repository.suggest_employees(
+                org_id=org_id, prefix=prefix, limit=limit, columns=columns
+            )
+
+    key = (org_id, prefix, limit, columns)
+    if session is None:
+        return _suggest_response(_suggest_flight.do(key, lookup), columns)
+
+    client = (principal.caller_id, org_id, session)
+    token = _suggest_latest.begin(client)
+    try:
+        # Checked around the query: the sync driver cannot be interrupted, but
+        # a superseded request still skips the query or the response
+        _suggest_latest.check(client, token)
+        rows = _suggest_flight.do(key, lookup)
+        _suggest_latest.check(client, token)
+    except Superseded as err:
+        raise _superseded() from err
+    finally:
+        _suggest_latest.end(client, token)
+    return _suggest_response(rows, columns)
+
+
+async def suggest_async(
+    *,
+    principal: Principal,
+    org_id: int,
+    q: str | None,
+    limit: int,
+    session: str | None = None,
+) -> dict[str, Any]:
+    """
+    Same contract as `suggest`; a superseded request's query is cancelled on
+    the server unless another request still shares it.
+    """
+    authorize(principal, org_id)
+    prefix = _normalize_prefix(q)
+    if not prefix:
+        return {"items": []}
+    columns = _output_columns(org_id)
+
+    async def query() -> list[dict[str, Any]]:
+        with _statement_timeouts():
+            return await repository.suggest_employees_async(
+                org_id=org_id, prefix=prefix, limit=limit, columns=columns
+            )
+
+    def lookup() -> Any:
+        return _suggest_flight_async.do((org_id, prefix, limit, columns), query)
+
+    if session is None:
+        return _suggest_response(await lookup(), columns)
+    try:
+        rows = await _suggest_latest.run((principal.caller_id, org_id, session), lookup)
+    except Superseded as err:
+        raise _superseded() from err
+    return _suggest_response(rows, columns)
@@ -1 +1,88 @@
-# Placeholder.
+# app/modules/org/repository.py
+from typing import Any
+
+from app.db.replicas import parse_lsn
+from app.db.utils import (
+    fetch_all_dicts,
+    fetch_all_dicts_async,
+    fetch_many_dicts_pipelined,
+    fetch_many_dicts_pipelined_async,
+)
+
+# hr_employment column -> reference table holding its `descr`
+REFERENCE_TABLES = {
+    "company": "hr_company",
+    "deptid": "hr_department",
+    "location": "hr_location",
+    "jobcode": "hr_jobcode",
+    "position_nbr": "hr_position",
+}
+
+_VERSION_SQL = """
+SELECT COALESCE(
+  (SELECT version FROM hr_refdata_version WHERE org_id = %(org_id)s), 0
+) AS version
+"""
+
+_REFDATA_SQL = " UNION ALL ".join(
+    f"SELECT '{column}' AS kind, {column} AS code, descr "
+    f"FROM {table} WHERE org_id = %(org_id)s"
+    for column, table in REFERENCE_TABLES.items()
+)
+
+
+def get_refdata_version(org_id: int) -> int:
+    return fetch_all_dicts(_VERSION_SQL, {"org_id": org_id})[0]["version"]
+
+
+async def get_refdata_version_async(org_id: int) -> int:
+    rows = await fetch_all_dicts_async(_VERSION_SQL, {"org_id": org_id})
+    return rows[0]["version"]
+
+
+# Everything a search response reads: employee rows and reference data. Read
+# on the primary, with its WAL position: a replica that has replayed it has
+# (at least) these versions
+_DATA_VERSIONS_SQL = """
+SELECT
+  COALESCE(
+    (SELECT version FROM hr_org_version WHERE org_id = %(org_id)s), 0
+  ) AS data_version,
+  COALESCE(
+    (SELECT version FROM hr_refdata_version WHERE org_id = %(org_id)s), 0
+  ) AS refdata_version,
+  pg_current_wal_lsn()::text AS lsn
+"""
+
+
+def _data_versions(row: dict[str, Any]) -> tuple[tuple[int, int], int]:
+    return (row["data_version"], row["refdata_version"]), parse_lsn(row["lsn"])
+
+
+def get_data_versions(org_id: int) -> tuple[tuple[int, int], int]:
+    return _data_versions(fetch_all_dicts(_DATA_VERSIONS_SQL, {"org_id": org_id})[0])
+
+
+async def get_data_versions_async(org_id: int) -> tuple[tuple[int, int], int]:
+    rows = await fetch_all_dicts_async(_DATA_VERSIONS_SQL, {"org_id": org_id})
+    return _data_versions(rows[0])
+
+
+# Version is read BEFORE the data (same round trip): a concurrent change can only
+# make the data newer than its stamp, which the next revalidation corrects.
+
+
+def load_refdata(org_id: int) -> tuple[int, list[dict[str, Any]]]:
+    params = {"org_id": org_id}
+    version, rows = fetch_many_dicts_pipelined(
+        [(_VERSION_SQL, params), (_REFDATA_SQL, params)]
+    )
+    return version[0]["version"], rows
+
+
+async def load_refdata_async(org_id: int) -> tuple[int, list[dict[str, Any]]]:
+    params = {"org_id": org_id}
+    version, rows = await fetch_many_dicts_pipelined_async(
+        [(_VERSION_SQL, params), (_REFDATA_SQL, params)]
+    )
+    return version[0]["version"], rows
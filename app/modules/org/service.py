@@ -1 +1,173 @@
-# Placeholder.
+# app/modules/org/service.py
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.config import settings
+from app.db.listener import listener
+from app.modules.org import repository
+
+
+@dataclass
+class RefData:
+    """
+    One org's reference data: {employment column: {code: descr}}.
+    """
+
+    version: int
+    tables: dict[str, dict[str, str]]
+    checked_at: float = field(default_factory=time.monotonic)  # last validation
+
+    @classmethod
+    def from_rows(cls, version: int, rows: list[dict[str, Any]]) -> RefData:
+        tables: dict[str, dict[str, str]] = {c: {} for c in repository.REFERENCE_TABLES}
+        for r in rows:
+            tables[r["kind"]][r["code"]] = r["descr"]
+        return cls(version=version, tables=tables)
+
+    def descr(self, column: str, code: str | None) -> str | None:
+        if code is None:
+            return None
+        return self.tables[column].get(code)
+
+    def codes_matching(self, column: str, text: str) -> list[str]:
+        """
+        Codes whose descr contains `text` (case-insensitive).
+        """
+        needle = text.casefold()
+        return [c for c, d in self.tables[column].items() if needle in d.casefold()]
+
+
+# Lowest refdata version the current block may use (None: any)
+_reading: ContextVar[int | None] = ContextVar("refdata", default=None)
+
+
+class RefDataCache:
+    """
+    Per-org reference data cache (company/department/location/jobcode/position):
+      - Lazy: an org is loaded on first use (one round trip)
+      - Bounded: LRU eviction once more than `max_orgs` orgs are cached
+      - Invalidated by LISTEN/NOTIFY when the listener runs, and revalidated
+        against `hr_refdata_version` every `revalidate_seconds` as a backstop
+      - Callers stamping a response with a refdata version (ETags, result
+        cache) ask for at least that version (`min_version` / `reading`): an
+        older entry is reloaded, however recently it was validated
+      - A load never replaces a newer entry, and a load that raced an
+        invalidation is returned but not kept
+    """
+
+    def __init__(self, *, max_orgs: int, revalidate_seconds: float) -> None:
+        self.max_orgs = max_orgs
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, RefData] = OrderedDict()
+        self._generations = itertools.count(1)
+        self._generation = next(self._generations)  # moves on every invalidation
+
+    @contextmanager
+    def reading(self, version: int) -> Generator[None, None, None]:
+        """Resolve the block's descriptors from refdata at least this new."""
+        token = _reading.set(version)
+        try:
+            yield
+        finally:
+            _reading.reset(token)
+
+    def _wanted(self, min_version: int | None) -> int | None:
+        wanted = _reading.get()
+        if min_version is None or (wanted is not None and wanted > min_version):
+            return wanted
+        return min_version
+
+    def _lookup(self, org_id: int) -> RefData | None:
+        with self._lock:
+            entry = self._entries.get(org_id)
+            if entry is not None:
+                self._entries.move_to_end(org_id)
+            return entry
+
+    def _store(self, org_id: int, entry: RefData, generation: int) -> RefData:
+        with self._lock:
+            if generation != self._generation:
+                return entry  # invalidated while loading: maybe pre-change data
+            current = self._entries.get(org_id)
+            if current is not None and current.version > entry.version:
+                return current  # a replica or a slower load lagging behind
+            self._entries[org_id] = entry
+            self._entries.move_to_end(org_id)
+            while len(self._entries) > self.max_orgs:
+                self._entries.popitem(last=False)  # coldest org
+        return entry
+
+    def _is_stale(self, entry: RefData, wanted: int | None) -> bool:
+        if wanted is not None and entry.version < wanted:
+            return True
+        return time.monotonic() - entry.checked_at >= self.revalidate_seconds
+
+    def get(self, org_id: int, min_version: int | None = None) -> RefData:
+        """The org's reference data, at least `min_version` (or `reading`'s)."""
+        wanted = self._wanted(min_version)
+        entry = self._lookup(org_id)
+        if entry is not None and not self._is_stale(entry, wanted):
+            return entry
+        generation = self._generation
+        if (
+            entry is not None
+            and (wanted is None or entry.version >= wanted)
+            and repository.get_refdata_version(org_id) == entry.version
+        ):
+            entry.checked_at = time.monotonic()
+            return entry
+        version, rows = repository.load_refdata(org_id)
+        return self._store(org_id, RefData.from_rows(version, rows), generation)
+
+    async def get_async(self, org_id: int, min_version: int | None = None) -> RefData:
+        wanted = self._wanted(min_version)
+        entry = self._lookup(org_id)
+        if entry is not None and not self._is_stale(entry, wanted):
+            return entry
+        generation = self._generation
+        if (
+            entry is not None
+            and (wanted is None or entry.version >= wanted)
+            and await repository.get_refdata_version_async(org_id) == entry.version
+        ):
+            entry.checked_at = time.monotonic()
+            return entry
+        version, rows = await repository.load_refdata_async(org_id)
+        return self._store(org_id, RefData.from_rows(version, rows), generation)
+
+    def invalidate(self, org_id: int | None = None) -> None:
+        with self._lock:
+            self._generation = next(self._generations)
+            if org_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(org_id, None)
+
+    def on_notify(self, payload: str) -> None:
+        # payload = org_id (see hr_refdata_changed_trigger in schema.sql)
+        try:
+            self.invalidate(int(payload))
+        except ValueError:
+            self.invalidate()
+
+
+REFDATA_CHANNEL = "hr_refdata_changed"
+
+refdata_cache = RefDataCache(
+    max_orgs=settings.refdata_cache_max_orgs,
+    revalidate_seconds=settings.refdata_revalidate_seconds,
+)
+# Drop everything on (re)connect: NOTIFYs sent while disconnected are lost
+listener.subscribe(
+    REFDATA_CHANNEL, refdata_cache.on_notify, on_reset=refdata_cache.invalidate
+)
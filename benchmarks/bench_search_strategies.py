@@ -0,0 +1,81 @@
+"""
+Single-query vs two-phase (late materialization) search, per request shape.
+
+Runs the repository directly against the configured database (see .env), so
+it measures SQL + decode time only. Use a large org for meaningful numbers:
+
+    python -m benchmarks.bench_search_strategies --org-id 1 --iterations 200
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from app.db.pool import close_pool, init_pool
+from app.modules.employee import repository
+from app.modules.employee.config import ALLOWED_COLUMNS, get_columns_for_org
+
+logger = logging.getLogger("bench")
+
+SCENARIOS = {
+    "recent (no filter)": {},
+    "broad FTS": {"q": "a"},
+    "FTS + dept": {"q": "engineer", "deptid": "IT"},
+    "status filter": {"empl_status": "A"},
+}
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run(org_id: int, iterations: int, limit: int) -> None:
+    columns = tuple(c for c in get_columns_for_org(org_id) if c in ALLOWED_COLUMNS)
+    logger.info(
+        "%-22s %-10s %9s %9s %9s", "scenario", "strategy", "p50 ms", "p95 ms", "mean"
+    )
+    for name, filters in SCENARIOS.items():
+        for strategy in repository.SEARCH_STRATEGIES:
+            kwargs = {
+                "org_id": org_id,
+                "q": None,
+                "limit": limit,
+                "columns": columns,
+                "strategy": strategy,
+                **filters,
+            }
+            repository.search_employees(**kwargs)  # warm caches + prepare
+            samples = []
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                repository.search_employees(**kwargs)
+                samples.append((time.perf_counter() - t0) * 1000)
+            logger.info(
+                "%-22s %-10s %9.2f %9.2f %9.2f",
+                name,
+                strategy,
+                _percentile(samples, 0.50),
+                _percentile(samples, 0.95),
+                statistics.fmean(samples),
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--org-id", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_pool()
+    try:
+        run(args.org_id, args.iterations, args.limit)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
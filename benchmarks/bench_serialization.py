@@ -0,0 +1,85 @@
+"""
+CPU per search page: the generic response path vs the encoded one.
+
+Fetches one real page (rows as the repository returns them) and then times,
+in-process, only what happens after the query:
+
+  generic: an item dict per row, FastAPI's jsonable_encoder, JSONResponse
+  encoded: the org's compiled projection + orjson (encoding.encode_page)
+
+    python -m benchmarks.bench_serialization --org-id 1001 --limit 100
+"""
+
+import argparse
+import logging
+import time
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.db.pool import close_pool, init_pool
+from app.modules.employee import repository, service
+
+logger = logging.getLogger("bench")
+
+
+def _generic(org_id: int, rows: list[dict[str, Any]], limit: int) -> bytes:
+    # The route before: items built by _item, then FastAPI's serialization
+    safe_cols = service._output_columns(org_id)
+    body = {
+        "items": [service._item(r, safe_cols) for r in rows],
+        "next_cursor": service._next_cursor(
+            org_id=org_id, rows=rows, sort="recent", q=None
+        ),
+        "limit": limit,
+    }
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def _encoded(org_id: int, rows: list[dict[str, Any]], limit: int) -> bytes:
+    return service._encode_response(
+        org_id=org_id, rows=rows, limit=limit, sort="recent", q=None
+    )
+
+
+def _cpu_us(fn, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def run(org_id: int, limit: int, iterations: int) -> None:
+    rows = repository.search_employees(
+        org_id=org_id, q=None, limit=limit, columns=service._output_columns(org_id)
+    )
+    if _generic(org_id, rows, limit) != _encoded(org_id, rows, limit):
+        raise SystemExit("the two paths produce different bodies")
+
+    logger.info("%d-row page, %d bytes", len(rows), len(_encoded(org_id, rows, limit)))
+    results = {}
+    for name, fn in (("generic", _generic), ("encoded", _encoded)):
+        fn(org_id, rows, limit)  # warm up
+        results[name] = _cpu_us(lambda fn=fn: fn(org_id, rows, limit), iterations)
+        logger.info("%-8s %9.1f us CPU/page", name, results[name])
+    logger.info("speedup  %9.1fx", results["generic"] / results["encoded"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--org-id", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    init_pool()
+    try:
+        run(args.org_id, args.limit, args.iterations)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
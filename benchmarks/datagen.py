@@ -0,0 +1,353 @@
+"""
+Deterministic synthetic tenants for load testing, bulk-loaded with COPY.
+
+Org sizes follow a Zipf-like curve (a few very large tenants, a long tail of
+small ones), so plans are exercised at realistic selectivities. The same seed
+always produces the same rows. Generated orgs start above `--org-offset` and
+never touch the seed orgs:
+
+    python -m benchmarks.datagen --employees 5000000 --orgs 2000
+    python -m benchmarks.datagen --employees 200000 --orgs 50 --reset
+
+Writes an API-keys file (one `bench-<org_id>` key per org) for the load
+driver; start the app with `API_KEYS_FILE=<path>` to accept them.
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import UTC, date, datetime, timedelta
+
+import psycopg
+
+from app.core.config import settings
+
+logger = logging.getLogger("bench")
+
+FIRST_NAMES = (
+    "An", "Binh", "Chi", "Dung", "Giang", "Hoa", "Hung", "Khanh", "Linh", "Mai",
+    "Nam", "Oanh", "Phong", "Quynh", "Son", "Thao", "Tuan", "Uyen", "Viet", "Yen",
+    "Alice", "Ben", "Carol", "David", "Emma", "Frank", "Grace", "Henry", "Ivy",
+    "Jack", "Kate", "Liam", "Mia", "Noah", "Olivia", "Peter", "Ruby", "Sam",
+    "Tom", "Zoe",
+)  # fmt: skip
+LAST_NAMES = (
+    "Nguyen", "Tran", "Le", "Pham", "Hoang", "Phan", "Vu", "Dang", "Bui", "Do",
+    "Ho", "Ngo", "Duong", "Ly", "Lim", "Tan", "Lee", "Wong", "Smith", "Johnson",
+    "Brown", "Taylor", "Wilson", "Clark", "Walker", "Young", "King", "Wright",
+    "Scott", "Green",
+)  # fmt: skip
+DEPARTMENTS = (
+    "Engineering", "Sales", "Marketing", "Finance", "Human Resources",
+    "Operations", "Customer Support", "Legal", "Product", "Research",
+    "Facilities", "Procurement",
+)  # fmt: skip
+LOCATIONS = (
+    ("Ho Chi Minh City", "VN"), ("Ha Noi", "VN"), ("Da Nang", "VN"),
+    ("Singapore", "SG"), ("Bangkok", "TH"), ("Kuala Lumpur", "MY"),
+    ("Jakarta", "ID"), ("Manila", "PH"), ("Tokyo", "JP"), ("Seoul", "KR"),
+    ("Sydney", "AU"), ("London", "GB"), ("Berlin", "DE"), ("New York", "US"),
+    ("San Francisco", "US"), ("Toronto", "CA"),
+)  # fmt: skip
+JOB_TITLES = (
+    "Software Engineer", "Data Analyst", "Account Executive", "HR Generalist",
+    "Accountant", "Support Specialist", "Product Manager", "Designer",
+    "Recruiter", "Legal Counsel", "Operations Manager", "Sales Manager",
+    "Marketing Specialist", "Research Scientist", "Technician", "Buyer",
+    "Engineering Manager", "Finance Analyst", "QA Engineer", "Payroll Officer",
+)  # fmt: skip
+LEVELS = ("", " II", " III", " Senior", " Lead", " Principal")
+# empl_status skew: mostly active
+STATUSES = ("A",) * 17 + ("L", "T", "T")
+
+# search_tsv computed set-wise with the trigger's document function
+_INSERT_EMPLOYMENT = """
+INSERT INTO hr_employment (
+  org_id, employee_id, empl_status, hire_date, termination_date, company, deptid,
+  location, jobcode, position_nbr, reports_to_employee_id, updated_at, search_tsv
+)
+SELECT s.org_id, s.employee_id, s.empl_status, s.hire_date, s.termination_date,
+       s.company, s.deptid, s.location, s.jobcode, s.position_nbr,
+       s.reports_to_employee_id, s.updated_at,
+       hr_employment_search_doc(
+         p.display_name, p.email_addr, p.phone,
+         c.descr, d.descr, l.descr, j.descr, ps.descr
+       )
+FROM bench_stage_employment s
+JOIN hr_person p ON p.org_id = s.org_id AND p.employee_id = s.employee_id
+LEFT JOIN hr_company c ON c.org_id = s.org_id AND c.company = s.company
+LEFT JOIN hr_department d ON d.org_id = s.org_id AND d.deptid = s.deptid
+LEFT JOIN hr_location l ON l.org_id = s.org_id AND l.location = s.location
+LEFT JOIN hr_jobcode j ON j.org_id = s.org_id AND j.jobcode = s.jobcode
+LEFT JOIN hr_position ps
+  ON ps.org_id = s.org_id AND ps.position_nbr = s.position_nbr
+"""
+_TABLES = (
+    "hr_employment",
+    "hr_person",
+    "hr_company",
+    "hr_department",
+    "hr_location",
+    "hr_jobcode",
+    "hr_position",
+    "hr_refdata_version",
+    "hr_search_reindex_queue",
+)
+_NOW = datetime(2025, 1, 1, tzinfo=UTC)  # fixed: reruns produce identical rows
+
+
+def org_sizes(employees: int, orgs: int, skew: float) -> list[int]:
+    """Employees per org, largest first; Zipf(skew) with at least 1 each."""
+    weights = [1 / (rank + 1) ** skew for rank in range(orgs)]
+    total = sum(weights)
+    sizes = [max(1, int(employees * w / total)) for w in weights]
+    sizes[0] += max(0, employees - sum(sizes))
+    return sizes
+
+
+def refdata_counts(size: int) -> dict[str, int]:
+    # Reference data grows with the org, with floors so every org has the
+    # codes the load driver filters on (D001, L01, J001, P0001, ...)
+    return {
+        "company": 1 + (size > 5_000) + (size > 50_000),
+        "dept": min(60, max(5, size // 200)),
+        "location": min(len(LOCATIONS), max(2, size // 2_000)),
+        "jobcode": min(120, max(8, size // 100)),
+        "position": min(2_000, max(10, size // 20)),
+    }
+
+
+def _skewed(rng: random.Random, n: int) -> int:
+    # Index in [0, n) biased towards 0: a few big departments, names, ...
+    return int(n * rng.random() ** 2)
+
+
+# table -> (columns, rows(org_id, counts))
+_REFDATA = {
+    "hr_company": (
+        "(org_id, company, descr)",
+        lambda org_id, n: [
+            (org_id, f"C{i + 1:02d}", f"Company {org_id}-{i + 1}")
+            for i in range(n["company"])
+        ],
+    ),
+    "hr_department": (
+        "(org_id, deptid, descr)",
+        lambda org_id, n: [
+            (org_id, f"D{i + 1:03d}", _numbered(DEPARTMENTS, i))
+            for i in range(n["dept"])
+        ],
+    ),
+    "hr_location": (
+        "(org_id, location, descr, country)",
+        lambda org_id, n: [
+            (org_id, f"L{i + 1:02d}", *LOCATIONS[i]) for i in range(n["location"])
+        ],
+    ),
+    "hr_jobcode": (
+        "(org_id, jobcode, descr)",
+        lambda org_id, n: [
+            (org_id, f"J{i + 1:03d}", _job_title(i)) for i in range(n["jobcode"])
+        ],
+    ),
+    "hr_position": (
+        "(org_id, position_nbr, descr)",
+        lambda org_id, n: [
+            (org_id, f"P{i + 1:04d}", f"{_job_title(i)} {_numbered(DEPARTMENTS, i)}")
+            for i in range(n["position"])
+        ],
+    ),
+}
+
+
+def _numbered(names: tuple[str, ...], i: int) -> str:
+    n = i // len(names)
+    return names[i % len(names)] + (f" {n + 1}" if n else "")
+
+
+def _job_title(i: int) -> str:
+    level = LEVELS[(i // len(JOB_TITLES)) % len(LEVELS)]
+    return JOB_TITLES[i % len(JOB_TITLES)] + level
+
+
+def _employee_ids(seed: int, org_id: int, size: int):
+    # Separate stream: the person and employment passes regenerate the same ids
+    rng = random.Random(f"{seed}:{org_id}:ids")
+    for _ in range(size):
+        yield uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _person_rows(seed: int, org_id: int, size: int):
+    rng = random.Random(f"{seed}:{org_id}:person")
+    for i, employee_id in enumerate(_employee_ids(seed, org_id, size)):
+        first = FIRST_NAMES[_skewed(rng, len(FIRST_NAMES))]
+        last = LAST_NAMES[_skewed(rng, len(LAST_NAMES))]
+        yield (
+            org_id,
+            employee_id,
+            f"E{i + 1:07d}",
+            first,
+            last,
+            f"{first} {last}",
+            rng.choice("MF"),
+            date(1960, 1, 1) + timedelta(days=rng.randrange(16_000)),
+            f"{first.lower()}.{last.lower()}.{i + 1}@org{org_id}.example",
+            f"09{rng.randrange(10**8):08d}",
+        )
+
+
+def _employment_rows(seed: int, org_id: int, size: int, counts: dict[str, int]):
+    rng = random.Random(f"{seed}:{org_id}:employment")
+    managers: list[uuid.UUID] = []
+    for i, employee_id in enumerate(_employee_ids(seed, org_id, size)):
+        status = STATUSES[rng.randrange(len(STATUSES))]
+        hire_date = date(2000, 1, 1) + timedelta(days=rng.randrange(9_000))
+        term_date = hire_date + timedelta(days=rng.randrange(1, 2_000))
+        # Roughly one manager per 8 employees, chosen among earlier ones
+        manager = managers[_skewed(rng, len(managers))] if managers else None
+        if i % 8 == 0:
+            managers.append(employee_id)
+        yield (
+            org_id,
+            employee_id,
+            status,
+            hire_date,
+            term_date if status == "T" else None,
+            f"C{_skewed(rng, counts['company']) + 1:02d}",
+            f"D{_skewed(rng, counts['dept']) + 1:03d}",
+            f"L{_skewed(rng, counts['location']) + 1:02d}",
+            f"J{_skewed(rng, counts['jobcode']) + 1:03d}",
+            f"P{rng.randrange(counts['position']) + 1:04d}",
+            manager,
+            _NOW - timedelta(seconds=rng.randrange(3 * 365 * 86_400)),
+        )
+
+
+def reset(conn: psycopg.Connection, first_org: int, last_org: int) -> None:
+    with conn.cursor() as cur:
+        for table in _TABLES:
+            cur.execute(
+                f"DELETE FROM {table} WHERE org_id BETWEEN %s AND %s",
+                (first_org, last_org),
+            )
+            logger.info("  %-20s %9d rows deleted", table, cur.rowcount)
+
+
+def load(
+    conn: psycopg.Connection, sizes: list[int], org_offset: int, seed: int
+) -> None:
+    orgs = range(org_offset + 1, org_offset + 1 + len(sizes))
+    plan = [
+        (org_id, size, refdata_counts(size))
+        for org_id, size in zip(orgs, sizes, strict=True)
+    ]
+    with conn.cursor() as cur:
+        # search_tsv is built below in one join: no per-row trigger lookups,
+        # and nothing queued for reindex by the reference-data inserts
+        cur.execute("SET LOCAL hrms.skip_search_tsv_trigger = on")
+        t0 = time.perf_counter()
+        for table, (columns, build) in _REFDATA.items():
+            with cur.copy(f"COPY {table} {columns} FROM STDIN") as copy:
+                for org_id, _, counts in plan:
+                    for row in build(org_id, counts):
+                        copy.write_row(row)
+        logger.info("  reference data   %8.1fs", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with cur.copy(
+            "COPY hr_person (org_id, employee_id, emplid, first_name, last_name,"
+            " display_name, gender, birthdate, email_addr, phone) FROM STDIN"
+        ) as copy:
+            for org_id, size, _ in plan:
+                for row in _person_rows(seed, org_id, size):
+                    copy.write_row(row)
+        logger.info("  hr_person        %8.1fs", time.perf_counter() - t0)
+
+        # Employment goes through an unlogged staging table so search_tsv is
+        # built in one set-based join instead of the per-row trigger lookups
+        t0 = time.perf_counter()
+        cur.execute(
+            "CREATE UNLOGGED TABLE bench_stage_employment"
+            " (LIKE hr_employment INCLUDING DEFAULTS)"
+        )
+        with cur.copy(
+            "COPY bench_stage_employment (org_id, employee_id, empl_status,"
+            " hire_date, termination_date, company, deptid, location, jobcode,"
+            " position_nbr, reports_to_employee_id, updated_at) FROM STDIN"
+        ) as copy:
+            for org_id, size, counts in plan:
+                for row in _employment_rows(seed, org_id, size, counts):
+                    copy.write_row(row)
+        logger.info("  staging copy     %8.1fs", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        # Fresh stats for the join inputs, or a first load plans nested loops
+        cur.execute(
+            "ANALYZE bench_stage_employment, hr_person, hr_company, hr_department,"
+            " hr_location, hr_jobcode, hr_position"
+        )
+        cur.execute(_INSERT_EMPLOYMENT)
+        cur.execute("DROP TABLE bench_stage_employment")
+        logger.info("  hr_employment    %8.1fs", time.perf_counter() - t0)
+
+
+def write_api_keys(path: str, org_ids: range) -> None:
+    keys = {
+        f"bench-{org_id}": {
+            "org_id": org_id,
+            "roles": ["hr"],
+            "scopes": ["employee.read"],
+        }
+        for org_id in org_ids
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(keys, f, indent=0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=1_000_000)
+    parser.add_argument("--orgs", type=int, default=500)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--org-offset", type=int, default=1000)
+    parser.add_argument(
+        "--reset", action="store_true", help="delete the org range first"
+    )
+    parser.add_argument("--keys-file", default="bench_api_keys.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sizes = org_sizes(args.employees, args.orgs, args.skew)
+    org_ids = range(args.org_offset + 1, args.org_offset + 1 + args.orgs)
+    logger.info(
+        "%d employees in %d orgs (org %d: %d ... org %d: %d)",
+        sum(sizes),
+        args.orgs,
+        org_ids[0],
+        sizes[0],
+        org_ids[-1],
+        sizes[-1],
+    )
+
+    # One transaction: a failed load leaves nothing behind
+    with psycopg.connect(settings.database_url) as conn:
+        if args.reset:
+            reset(conn, org_ids[0], org_ids[-1])
+        load(conn, sizes, args.org_offset, args.seed)
+        conn.commit()
+        conn.autocommit = True
+        t0 = time.perf_counter()
+        for table in _TABLES:
+            conn.execute(f"ANALYZE {table}")
+        logger.info("  analyze          %8.1fs", time.perf_counter() - t0)
+
+    write_api_keys(args.keys_file, org_ids)
+    logger.info("API keys: %s (start the app with API_KEYS_FILE=...)", args.keys_file)
+
+
+if __name__ == "__main__":
+    main()
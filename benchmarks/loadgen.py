@@ -0,0 +1,235 @@
+"""
+Mixed-workload load driver for a running app (stdlib only: threads + one
+keep-alive HTTP connection per thread).
+
+Replays FTS, filtered, faceted, relevance and deep-cursor searches against the
+orgs generated by `benchmarks.datagen`, picking orgs with the same skew as
+their sizes, then reports throughput, p50/p95/p99 and DB time (`sql` stage of
+the `Server-Timing` header) per scenario:
+
+    API_KEYS_FILE=bench_api_keys.json RATE_LIMIT_PER_SEC=1e6 RATE_LIMIT_BURST=1000000 \\
+        SEARCH_CACHE_MAX_ENTRIES=0 uvicorn app.main:app --workers 4
+    python -m benchmarks.loadgen --concurrency 32 --duration 60 --out run.json
+    python -m benchmarks.report run.json --baseline baseline.json
+
+Run the app with a rate limit high enough not to throttle the driver, and
+without the result cache (repeated searches would measure the cache); 429s
+and 503s are counted as errors per scenario.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.datagen import FIRST_NAMES, JOB_TITLES, LAST_NAMES
+from benchmarks.report import RequestSample, check, log_table, summarize
+
+logger = logging.getLogger("bench")
+
+DEFAULT_MIX = "fts=4,filter=3,facets=2,relevance=1,deep_cursor=1"
+_TERMS = (
+    *FIRST_NAMES[:10],
+    *LAST_NAMES[:10],
+    *sorted({word.lower() for title in JOB_TITLES for word in title.split()}),
+)
+
+
+def _fts(rng: random.Random) -> dict:
+    return {"q": rng.choice(_TERMS)}
+
+
+# Codes every generated org has (see datagen.refdata_counts floors)
+_FILTER_VALUES = {
+    "deptid": [f"D{i:03d}" for i in range(1, 6)],
+    "jobcode": [f"J{i:03d}" for i in range(1, 9)],
+    "location": ["L01", "L02"],
+}
+
+
+def _filter(rng: random.Random) -> dict:
+    column = rng.choice(tuple(_FILTER_VALUES))
+    return {"empl_status": "A", column: rng.choice(_FILTER_VALUES[column])}
+
+
+def _facets(rng: random.Random) -> dict:
+    params = {"include_facets": "true", "facets": "dept,location,empl_status"}
+    if rng.random() < 0.5:
+        params["q"] = rng.choice(_TERMS)
+    return params
+
+
+def _relevance(rng: random.Random) -> dict:
+    return {"q": rng.choice(_TERMS), "sort": "relevance"}
+
+
+def _deep_cursor(rng: random.Random) -> dict:
+    return {"limit": 50, "empl_status": "A"}
+
+
+SCENARIOS = {
+    "fts": _fts,
+    "filter": _filter,
+    "facets": _facets,
+    "relevance": _relevance,
+    "deep_cursor": _deep_cursor,  # pages followed via next_cursor
+}
+
+
+def _db_seconds(server_timing: str | None) -> float:
+    # "sql;dur=1.20, decode;dur=0.10, ..., total;dur=3.40" -> sql seconds
+    total = 0.0
+    for part in (server_timing or "").split(","):
+        name, _, dur = part.strip().partition(";dur=")
+        if name == "sql" and dur:
+            total += float(dur) / 1000
+    return total
+
+
+class _Client:
+    def __init__(self, base_url: str, timeout: float) -> None:
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = self._connect()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def get(self, path: str, params: dict, api_key: str):
+        url = f"{self.prefix}{path}?{urlencode(params)}"
+        for attempt in (1, 2):
+            try:
+                self.conn.request("GET", url, headers={"X-API-Key": api_key})
+                response = self.conn.getresponse()
+                return response.status, response.read(), response.headers
+            except (OSError, http.client.HTTPException):
+                # Server closed the keep-alive connection: reconnect once
+                self.conn.close()
+                self.conn = self._connect()
+                if attempt == 2:
+                    raise
+        raise AssertionError("unreachable")
+
+
+def run(
+    base_url: str,
+    keys: dict[str, int],
+    mix: dict[str, int],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    deep_pages: int,
+    skew: float,
+    seed: int,
+) -> tuple[list[RequestSample], float]:
+    # Keys sorted by org id: datagen makes the lowest id the largest org
+    orgs = sorted(keys.items(), key=lambda kv: kv[1])
+    org_weights = [1 / (rank + 1) ** skew for rank in range(len(orgs))]
+    names, weights = list(mix), list(mix.values())
+    results: list[list[RequestSample]] = [[] for _ in range(concurrency)]
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker(n: int) -> None:
+        rng = random.Random(f"{seed}:{n}")
+        client = _Client(base_url, timeout=30)
+        out = results[n]
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights)[0]
+            api_key, org_id = rng.choices(orgs, org_weights)[0]
+            params = SCENARIOS[scenario](rng)
+            pages = deep_pages if scenario == "deep_cursor" else 1
+            for _ in range(pages):
+                t0 = time.perf_counter()
+                status, body, headers = client.get(
+                    f"/api/v1/orgs/{org_id}/employees/search", params, api_key
+                )
+                elapsed = time.perf_counter() - t0
+                if t0 >= measure_from:
+                    db = _db_seconds(headers.get("server-timing"))
+                    out.append(RequestSample(scenario, status, elapsed, db))
+                cursor = json.loads(body).get("next_cursor") if status == 200 else None
+                if not cursor:
+                    break
+                params = {**params, "cursor": cursor}
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - max(measure_from, started)
+    return [s for per_thread in results for s in per_thread], elapsed
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--keys-file", default="bench_api_keys.json")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds")
+    parser.add_argument("--deep-pages", type=int, default=20)
+    parser.add_argument("--skew", type=float, default=1.1, help="org popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write the summary as JSON")
+    parser.add_argument("--baseline", help="fail on regression vs this JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with open(args.keys_file, encoding="utf-8") as f:
+        keys = {key: cfg["org_id"] for key, cfg in json.load(f).items()}
+
+    samples, elapsed = run(
+        args.url,
+        keys,
+        args.mix,
+        args.concurrency,
+        args.duration,
+        args.warmup,
+        args.deep_pages,
+        args.skew,
+        args.seed,
+    )
+    summary = summarize(samples, elapsed)
+    logger.info(
+        "%d requests in %.1fs, %d threads, %d orgs",
+        len(samples),
+        elapsed,
+        args.concurrency,
+        len(keys),
+    )
+    log_table(summary)
+    if args.out:
+        meta = {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "scenarios": summary}, f, indent=2)
+    if args.baseline and not check(summary, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Query-plan regression check for every statement shape search, facets and
+suggest emit.
+
+Each shape (filter combination x FTS x keyset x strategy/sort; facet
+dimensions x filters x FTS; suggest prefix tiers with or without the
+full-text tier) is compiled by the real builders and explained
+against a large generated org (see benchmarks.datagen):
+  - custom plan: EXPLAIN ANALYZE with representative values (most common
+    filter codes of the org), so spills show up
+  - generic plan: EXPLAIN (GENERIC_PLAN) on Postgres 16+, the plan a prepared
+    statement may switch to after a few executions
+
+A plan regresses if it seq-scans hr_employment or hr_person, spills a sort or
+hash to disk, or (custom plans) its estimated cost exceeds the recorded
+baseline by more than the tolerance. Generic-plan costs swing too much
+between ANALYZE samples to compare, so only their shape is checked:
+
+    python -m benchmarks.plan_check --org-id 1001
+    python -m benchmarks.plan_check --org-id 1001 --update-baseline
+    PLAN_CHECK_ORG_ID=1001 python -m pytest tests/test_query_plans.py
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any
+
+import psycopg
+from psycopg.rows import dict_row
+
+from app.core.config import settings
+from app.modules.employee import repository
+from app.modules.org.service import RefData
+
+logger = logging.getLogger("bench")
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "plan_baseline.json")
+DEFAULT_TOLERANCE = 0.3
+DEFAULT_Q = "engineer"
+# Below SUGGEST_FTS_MIN_CHARS: the prefix tiers only
+SUGGEST_SHORT_PREFIX = "ng"
+# Tables whose plans must stay index-driven
+GUARDED_TABLES = ("hr_employment", "hr_person")
+# Facet dimension sets: the default (position only) and all of them
+FACET_SETS = (("position",), tuple(repository.FACET_DIMENSIONS))
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s")
+
+
+@dataclass(frozen=True)
+class Shape:
+    id: str
+    kind: str  # search | facets | suggest
+    filters: tuple[str, ...]
+    use_fts: bool
+    keyset: bool = False
+    strategy: str = "single"
+    sort: str = "recent"
+    dimensions: tuple[str, ...] = ()
+
+
+@dataclass
+class Dataset:
+    """Representative parameter values taken from the org under test."""
+
+    org_id: int
+    employees: int
+    filters: dict[str, str]  # column -> most common code
+    cursor: dict[str, Any]  # a row halfway down the recent order
+    q: str = DEFAULT_Q
+
+
+@dataclass
+class Result:
+    shape: Shape
+    costs: dict[str, float] = field(default_factory=dict)  # mode -> total cost
+    problems: list[str] = field(default_factory=list)
+
+
+def _filter_sets() -> list[tuple[str, ...]]:
+    columns = repository.FILTER_COLUMNS
+    return [
+        combo
+        for n in range(len(columns) + 1)
+        for combo in itertools.combinations(columns, n)
+    ]
+
+
+def shapes() -> list[Shape]:
+    out = []
+    for filters, use_fts, keyset in itertools.product(
+        _filter_sets(), (False, True), (False, True)
+    ):
+        suffix = f"{','.join(filters) or '-'}:{'fts' if use_fts else '-'}:{'keyset' if keyset else '-'}"
+        for strategy in repository.SEARCH_STRATEGIES:
+            out.append(
+                Shape(
+                    f"search:recent:{strategy}:{suffix}",
+                    "search",
+                    filters,
+                    use_fts,
+                    keyset,
+                    strategy,
+                )
+            )
+        if use_fts:
+            out.append(
+                Shape(
+                    f"search:relevance:{suffix}",
+                    "search",
+                    filters,
+                    use_fts,
+                    keyset,
+                    sort="relevance",
+                )
+            )
+    for dimensions, filters, use_fts in itertools.product(
+        FACET_SETS, _filter_sets(), (False, True)
+    ):
+        out.append(
+            Shape(
+                f"facets:{','.join(dimensions)}:{','.join(filters) or '-'}:{'fts' if use_fts else '-'}",
+                "facets",
+                filters,
+                use_fts,
+                dimensions=dimensions,
+            )
+        )
+    for use_fts in (False, True):
+        out.append(
+            Shape(f"suggest:{'fts' if use_fts else '-'}", "suggest", (), use_fts)
+        )
+    return out
+
+
+def load_dataset(conn: psycopg.Connection, org_id: int, q: str = DEFAULT_Q) -> Dataset:
+    modes = ", ".join(
+        f"mode() WITHIN GROUP (ORDER BY {c}) AS {c}" for c in repository.FILTER_COLUMNS
+    )
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            f"SELECT count(*) AS employees, {modes} FROM hr_employment WHERE org_id = %s",
+            (org_id,),
+        )
+        row = cur.fetchone()
+        cur.execute(
+            """
+            SELECT updated_at, employee_id FROM hr_employment
+            WHERE org_id = %(org_id)s
+            ORDER BY updated_at DESC, employee_id DESC
+            OFFSET %(half)s LIMIT 1
+            """,
+            {"org_id": org_id, "half": row["employees"] // 2},
+        )
+        cursor = cur.fetchone()
+    if cursor is None:
+        raise ValueError(f"org {org_id} has no employees; run benchmarks.datagen first")
+    return Dataset(
+        org_id=org_id,
+        employees=row.pop("employees"),
+        filters=row,
+        cursor=cursor,
+        q=q,
+    )
+
+
+def build(shape: Shape, data: Dataset) -> tuple[str, dict[str, Any]]:
+    filters = {c: data.filters[c] for c in shape.filters}
+    q = data.q if shape.use_fts else None
+    if shape.kind == "facets":
+        facets = [repository.FacetSpec(d) for d in shape.dimensions]
+        return repository._build_facet_query(
+            org_id=data.org_id,
+            q=q,
+            filters=filters,
+            facets=facets,
+            refdata=RefData(version=0, tables={}),  # only read for facet_q
+        )
+    if shape.kind == "suggest":
+        return repository._build_suggest_query(
+            org_id=data.org_id,
+            prefix=data.q if shape.use_fts else SUGGEST_SHORT_PREFIX,
+            limit=8,
+            columns=("display_name", "email_addr"),
+        )
+    cursor = {}
+    if shape.keyset and shape.sort == "relevance":
+        cursor = {"cursor_rank": 0.1, "cursor_employee_id": data.cursor["employee_id"]}
+    elif shape.keyset:
+        cursor = {
+            "cursor_updated_at": data.cursor["updated_at"],
+            "cursor_employee_id": data.cursor["employee_id"],
+        }
+    return repository._build_search_query(
+        org_id=data.org_id,
+        q=q,
+        strategy=shape.strategy,
+        sort=shape.sort,
+        **filters,
+        **cursor,
+    )
+
+
+def _numbered(sql: str) -> str:
+    # %(name)s -> $n (same name, same number) for EXPLAIN (GENERIC_PLAN)
+    names: dict[str, int] = {}
+    return _PLACEHOLDER.sub(
+        lambda m: f"${names.setdefault(m.group(1), len(names) + 1)}", sql
+    )
+
+
+def explain(
+    conn: psycopg.Connection, sql: str, params: dict[str, Any], *, generic: bool
+) -> dict[str, Any]:
+    if generic:
+        (doc,) = conn.execute(
+            f"EXPLAIN (GENERIC_PLAN, FORMAT JSON) {_numbered(sql)}", prepare=False
+        ).fetchone()
+    else:
+        (doc,) = conn.execute(
+            f"EXPLAIN (ANALYZE, TIMING false, FORMAT JSON) {sql}", params, prepare=False
+        ).fetchone()
+    return doc[0]["Plan"]
+
+
+def _nodes(plan: dict[str, Any]):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def violations(plan: dict[str, Any]) -> list[str]:
+    found = []
+    for node in _nodes(plan):
+        kind = node["Node Type"]
+        if kind == "Seq Scan" and node.get("Relation Name") in GUARDED_TABLES:
+            found.append(f"seq scan on {node['Relation Name']}")
+        if node.get("Sort Space Type") == "Disk":
+            found.append(f"sort spilled to disk ({node.get('Sort Method')})")
+        if node.get("HashAgg Batches", 1) > 1 or node.get("Disk Usage", 0) > 0:
+            found.append(f"{kind} spilled to disk")
+        if node.get("Hash Batches", 1) > 1:
+            found.append("hash spilled to disk")
+    return found
+
+
+def check(
+    conn: psycopg.Connection,
+    shape: Shape,
+    data: Dataset,
+    baseline: dict[str, float] | None,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> Result:
+    result = Result(shape)
+    sql, params = build(shape, data)
+    modes = ["custom"]
+    if conn.info.server_version >= 160000:
+        modes.append("generic")
+    for mode in modes:
+        plan = explain(conn, sql, params, generic=mode == "generic")
+        result.costs[mode] = plan["Total Cost"]
+        result.problems += [f"{mode}: {v}" for v in violations(plan)]
+    limit = (baseline or {}).get(shape.id)
+    cost = result.costs["custom"]
+    if limit is not None and cost > limit * (1 + tolerance):
+        result.problems.append(f"custom: cost {limit:.0f} -> {cost:.0f}")
+    return result
+
+
+def load_baseline(path: str, data: Dataset) -> dict[str, float]:
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    recorded = (doc["org_id"], doc["employees"])
+    if recorded != (data.org_id, data.employees):
+        raise ValueError(
+            f"{path} was recorded for org {recorded[0]} with {recorded[1]} employees,"
+            f" not org {data.org_id} with {data.employees}: regenerate the dataset"
+            f" ({doc['dataset']}) or record a new baseline (--update-baseline)"
+        )
+    return doc["costs"]
+
+
+def write_baseline(
+    path: str, data: Dataset, results: list[Result], dataset: str
+) -> None:
+    header = {"org_id": data.org_id, "employees": data.employees, "dataset": dataset}
+    # One line per shape so baseline updates review as small diffs
+    costs = ",\n".join(
+        f"  {json.dumps(r.shape.id)}: {round(r.costs['custom'], 1)}"
+        for r in sorted(results, key=lambda r: r.shape.id)
+    )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header, indent=1)[:-2] + ',\n "costs": {\n')
+        f.write(costs + "\n }\n}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--org-id", type=int, default=1001)
+    parser.add_argument("--q", default=DEFAULT_Q)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--dataset",
+        default="python -m benchmarks.datagen --employees 200000 --orgs 50",
+        help="how the dataset was generated, recorded in the baseline",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        data = load_dataset(conn, args.org_id, args.q)
+        baseline = None
+        if not args.update_baseline and os.path.exists(args.baseline):
+            baseline = load_baseline(args.baseline, data)
+        results = [check(conn, s, data, baseline, args.tolerance) for s in shapes()]
+
+    failed = [r for r in results if r.problems]
+    for r in failed:
+        logger.info("%s\n    %s", r.shape.id, "\n    ".join(r.problems))
+    logger.info(
+        "%d shapes on org %d (%d employees): %d regressed",
+        len(results),
+        data.org_id,
+        data.employees,
+        len(failed),
+    )
+    if args.update_baseline:
+        write_baseline(args.baseline, data, results, args.dataset)
+        logger.info("baseline written to %s", args.baseline)
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Load-test report: per-scenario throughput, latency percentiles and DB time,
+plus a regression check against a saved baseline run.
+
+    python -m benchmarks.report run.json
+    python -m benchmarks.report run.json --baseline baseline.json --tolerance 0.2
+
+Exits non-zero when a scenario's p95/p99 latency or throughput regressed by
+more than the tolerance.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+
+logger = logging.getLogger("bench")
+
+# (metric, higher is better)
+_CHECKED = (("p95_ms", False), ("p99_ms", False), ("rps", True))
+# Latency deltas below this are noise, whatever the ratio
+_MIN_DELTA_MS = 1.0
+
+
+@dataclass
+class RequestSample:
+    scenario: str
+    status: int
+    seconds: float
+    db_seconds: float  # `sql` stage of Server-Timing (execute + fetch)
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize(samples: list[RequestSample], elapsed: float) -> dict[str, dict]:
+    by_scenario: dict[str, list[RequestSample]] = defaultdict(list)
+    for s in samples:
+        by_scenario[s.scenario].append(s)
+
+    summary = {}
+    for name, rows in sorted(by_scenario.items()):
+        ok = [s for s in rows if s.status == 200]
+        latencies = [s.seconds * 1000 for s in ok] or [0.0]
+        db = [s.db_seconds * 1000 for s in ok] or [0.0]
+        statuses: dict[str, int] = defaultdict(int)
+        for s in rows:
+            statuses[str(s.status)] += 1
+        summary[name] = {
+            "requests": len(rows),
+            "errors": len(rows) - len(ok),
+            "rps": len(ok) / elapsed,
+            "p50_ms": _percentile(latencies, 0.50),
+            "p95_ms": _percentile(latencies, 0.95),
+            "p99_ms": _percentile(latencies, 0.99),
+            "db_p50_ms": _percentile(db, 0.50),
+            "db_p95_ms": _percentile(db, 0.95),
+            "db_share": sum(db) / max(sum(latencies), 1e-9),
+            "statuses": dict(statuses),
+        }
+    return summary
+
+
+def log_table(summary: dict[str, dict]) -> None:
+    logger.info(
+        "%-12s %8s %6s %8s %8s %8s %8s %8s %8s %6s",
+        "scenario",
+        "requests",
+        "errors",
+        "rps",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+        "db p50",
+        "db p95",
+        "db %",
+    )
+    for name, s in summary.items():
+        logger.info(
+            "%-12s %8d %6d %8.1f %8.2f %8.2f %8.2f %8.2f %8.2f %6.0f",
+            name,
+            s["requests"],
+            s["errors"],
+            s["rps"],
+            s["p50_ms"],
+            s["p95_ms"],
+            s["p99_ms"],
+            s["db_p50_ms"],
+            s["db_p95_ms"],
+            s["db_share"] * 100,
+        )
+        if s["errors"]:
+            logger.info("%-12s statuses %s", "", s["statuses"])
+
+
+def regressions(
+    current: dict[str, dict], baseline: dict[str, dict], tolerance: float
+) -> list[str]:
+    found = []
+    for name, base in baseline.items():
+        cur = current.get(name)
+        if cur is None:
+            continue
+        for metric, higher_is_better in _CHECKED:
+            before, after = base[metric], cur[metric]
+            if higher_is_better:
+                worse = after < before * (1 - tolerance)
+            else:
+                worse = (
+                    after > before * (1 + tolerance) and after - before > _MIN_DELTA_MS
+                )
+            if worse:
+                found.append(f"{name}: {metric} {before:.2f} -> {after:.2f}")
+    return found
+
+
+def check(current: dict[str, dict], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["scenarios"]
+    found = regressions(current, baseline, tolerance)
+    for line in found:
+        logger.info("REGRESSION %s", line)
+    if not found:
+        logger.info(
+            "no regressions vs %s (tolerance %.0f%%)", baseline_path, tolerance * 100
+        )
+    return not found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("run", help="JSON written by benchmarks.loadgen --out")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    with open(args.run, encoding="utf-8") as f:
+        current = json.load(f)["scenarios"]
+    log_table(current)
+    if args.baseline and not check(current, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    # The module-level limiter is shared by every test; give each its own
+    import app.api.rate_limit_deps as rld
+    from app.core.rate_limit import TokenBucketLimiter
+
+    limiter = TokenBucketLimiter(rate_per_sec=1000, capacity=1000)
+    monkeypatch.setattr(rld, "limiter", limiter)
+    return limiter
+
+
+@pytest.fixture
+def db_pool():
+    from app.db.pool import close_pool, init_pool
+
+    # Initialize DB pool (TestClient doesn't trigger startup events)
+    init_pool()
+    yield
+    close_pool()
+
+
+@pytest.fixture
+def client(no_rate_limit, db_pool):
+    return TestClient(app)
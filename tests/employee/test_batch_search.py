@@ -0,0 +1,58 @@
+import app.api.rate_limit_deps as rld
+from app.core.rate_limit import TokenBucketLimiter
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+SEARCHES = [
+    {"limit": 3},
+    {"deptid": "IT", "limit": 2},
+    {"q": "engineer", "sort": "relevance", "limit": 4},
+]
+
+
+def test_batch_matches_individual_searches(client):
+    r = client.post(
+        f"{BASE}/orgs/1/employees/search/batch",
+        headers=HEADERS,
+        json={"searches": SEARCHES},
+    )
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == len(SEARCHES)
+    for spec, result in zip(SEARCHES, results, strict=True):
+        single = client.get(
+            f"{BASE}/orgs/1/employees/search", headers=HEADERS, params=spec
+        )
+        assert result == single.json()
+
+
+def test_batch_charges_rate_limit_per_search(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "rate_limit_cost_mode", "flat")
+    monkeypatch.setattr(rld, "limiter", TokenBucketLimiter(rate_per_sec=0, capacity=4))
+    url = f"{BASE}/orgs/1/employees/search/batch"
+
+    r1 = client.post(url, headers=HEADERS, json={"searches": SEARCHES})
+    assert r1.status_code == 200
+    assert r1.headers["X-RateLimit-Remaining"] == "1"
+
+    r2 = client.post(url, headers=HEADERS, json={"searches": SEARCHES[:2]})
+    assert r2.status_code == 429
+    assert "Retry-After" in r2.headers
+
+
+def test_batch_validation_and_isolation(client):
+    url = f"{BASE}/orgs/1/employees/search/batch"
+    assert client.post(url, headers=HEADERS, json={"searches": []}).status_code == 422
+    too_many = {"searches": [{"limit": 1}] * 11}
+    assert client.post(url, headers=HEADERS, json=too_many).status_code == 422
+
+    r = client.post(
+        f"{BASE}/orgs/2/employees/search/batch",
+        headers=HEADERS,
+        json={"searches": SEARCHES},
+    )
+    assert r.status_code == 403
@@ -0,0 +1,79 @@
+import psycopg
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.modules.employee import service
+from app.modules.employee.config import ORG_COLUMNS
+from app.modules.employee.result_cache import SearchResultCache
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+@pytest.fixture
+def cache(monkeypatch, no_rate_limit, db_pool):
+    cache = SearchResultCache(max_entries=100, ttl_seconds=60, revalidate_seconds=0)
+    monkeypatch.setattr(service, "result_cache", cache)
+    return cache
+
+
+def _get(etag=None, **params):
+    headers = {**HEADERS, **({"If-None-Match": etag} if etag else {})}
+    return TestClient(app).get(
+        f"{BASE}/orgs/1/employees/search", headers=headers, params=params
+    )
+
+
+def test_matching_etag_is_answered_before_the_search(cache):
+    r = _get(q="engineer", facets="dept")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert etag.startswith('"') and r.headers["Vary"] == "X-API-Key"
+    assert r.headers["Cache-Control"] == "no-cache"
+    assert _get(q=" Engineer", facets="dept").headers["ETag"] == etag
+
+    misses = cache.misses
+    for sent in (etag, f'"x", W/{etag}', "*"):
+        r = _get(sent, q="engineer", facets="dept")
+        assert r.status_code == 304 and not r.content
+        assert r.headers["ETag"] == etag
+    assert cache.misses == misses  # no lookup, no query
+
+    assert _get('"x"', q="engineer", facets="dept").status_code == 200
+    assert _get(etag, q="engineer").status_code == 200
+
+
+def test_etag_changes_with_data_and_column_config(cache, monkeypatch):
+    etag = _get(empl_status="A", limit=5).headers["ETag"]
+
+    columns = ORG_COLUMNS[1]
+    monkeypatch.setitem(ORG_COLUMNS, 1, ["phone"])
+    r = _get(etag, empl_status="A", limit=5)
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    monkeypatch.setitem(ORG_COLUMNS, 1, columns)
+    assert _get(etag, empl_status="A", limit=5).status_code == 304
+
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute(
+            "UPDATE hr_employment SET empl_status = empl_status"
+            " WHERE org_id = 1 AND employee_id = ("
+            "   SELECT employee_id FROM hr_employment WHERE org_id = 1 LIMIT 1)"
+        )
+    r = _get(etag, empl_status="A", limit=5)
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    assert _get(r.headers["ETag"], empl_status="A", limit=5).status_code == 304
+
+
+def test_shared_caches_may_hold_responses_when_configured(cache, monkeypatch):
+    monkeypatch.setattr(settings, "search_http_s_maxage", 15)
+    monkeypatch.setattr(settings, "db_async", True)
+    with TestClient(app) as client:
+        r = client.get(f"{BASE}/orgs/1/employees/search", headers=HEADERS)
+        assert r.headers["Cache-Control"] == "public, max-age=0, s-maxage=15"
+        r = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers={**HEADERS, "If-None-Match": r.headers["ETag"]},
+        )
+    assert r.status_code == 304
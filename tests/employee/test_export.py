@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app.main import app
+from app.modules.employee.config import ORG_COLUMNS
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+def _search_all(client, **params):
+    items, cursor = [], None
+    while True:
+        r = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=HEADERS,
+            params={**params, "limit": 100, "cursor": cursor},
+        )
+        page = r.json()
+        if not page["items"]:
+            return items
+        items += page["items"]
+        cursor = page["next_cursor"]
+
+
+@pytest.mark.parametrize("params", [{}, {"q": "engineer", "deptid": "IT"}])
+def test_ndjson_export_matches_search(client, monkeypatch, params):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "export_batch_size", 7)  # several DB batches
+    r = client.get(f"{BASE}/orgs/1/employees/export", headers=HEADERS, params=params)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+
+    exported = [json.loads(line) for line in r.text.splitlines()]
+    expected = _search_all(client, **params)
+    key = lambda it: it["employee_id"]  # noqa: E731
+    assert sorted(exported, key=key) == sorted(expected, key=key)
+
+
+def test_csv_export_uses_org_columns(client):
+    r = client.get(
+        f"{BASE}/orgs/1/employees/export", headers=HEADERS, params={"format": "csv"}
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows[0] == ["employee_id", *ORG_COLUMNS[1]]
+    assert len(rows) - 1 == len(_search_all(client))
+
+
+def test_export_cross_org_forbidden(client):
+    r = client.get(f"{BASE}/orgs/2/employees/export", headers=HEADERS)
+    assert r.status_code == 403
+
+
+def test_export_is_charged_per_row(client, monkeypatch):
+    import app.api.rate_limit_deps as rld
+    from app.core.config import settings
+    from app.core.rate_limit import TokenBucketLimiter
+    from app.modules.employee import service
+
+    monkeypatch.setattr(settings, "rate_limit_cost_mode", "shape")
+    monkeypatch.setattr(settings, "export_batch_size", 7)
+    limiter = TokenBucketLimiter(rate_per_sec=0.0, capacity=1000)
+    monkeypatch.setattr(rld, "limiter", limiter)
+
+    r = client.get(f"{BASE}/orgs/1/employees/export", headers=HEADERS)
+    rows = len(r.text.splitlines())
+    assert r.status_code == 200 and rows > service.EXPORT_PAGE_ROWS
+    # Admission pays for one page up front
+    row_cost = service.export_row_cost(q=None, filters={})
+    assert float(r.headers["X-RateLimit-Cost"]) == pytest.approx(100 * row_cost)
+    # ... and every row past it once streamed: as many tokens as search pages
+    remaining = limiter.charge("org:1:key:dev-key-1", 0)
+    assert 1000 - remaining == pytest.approx(rows * row_cost)
+
+
+@pytest.mark.parametrize("db_async", [False, True])
+def test_disconnect_returns_the_connection(client, monkeypatch, db_async):
+    import asyncio
+
+    from app.core.config import settings
+    from app.db.pool import close_pool, get_pool, init_pool
+
+    monkeypatch.setattr(settings, "export_batch_size", 7)
+    monkeypatch.setattr(settings, "db_async", db_async)
+    # One connection: a pool growing in the background cannot blur the count
+    monkeypatch.setattr(settings, "db_pool_max_size", 1)
+    close_pool()
+    init_pool()
+    path = f"{BASE}/orgs/1/employees/export"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"x-api-key", b"dev-key-1"), (b"host", b"test")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def export_then_hang_up():
+        from app.db.pool import close_async_pool, get_async_pool, init_async_pool
+
+        if db_async:
+            await init_async_pool()
+        request_sent, first_chunk = False, asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body":
+                first_chunk.set()
+                await asyncio.sleep(1)  # a slow client: the disconnect wins
+
+        try:
+            await app(scope, receive, send)
+            pool = get_async_pool() if db_async else get_pool()
+            return pool.get_stats()
+        finally:
+            if db_async:
+                await close_async_pool()
+
+    # Released as the response ends, not whenever the generator is collected
+    stats = asyncio.run(export_then_hang_up())
+    assert stats["pool_available"] == stats["pool_size"] == 1
@@ -0,0 +1,91 @@
+import pytest
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+def _search(client, **params):
+    r = client.get(f"{BASE}/orgs/1/employees/search", headers=HEADERS, params=params)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_include_facets_defaults_to_position(client):
+    data = _search(client, limit=1, include_facets="true")
+    assert list(data["facets"]) == ["position"]
+    for row in data["facets"]["position"]:
+        assert set(row) == {"position_nbr", "position_descr", "count"}
+
+
+def test_multiple_dimensions_in_one_request(client):
+    data = _search(client, limit=1, facets="dept,empl_status,location:1")
+    facets = data["facets"]
+    assert list(facets) == ["dept", "empl_status", "location"]
+    assert len(facets["location"]) == 1
+    assert {"deptid", "dept_descr", "count"} == set(facets["dept"][0])
+    assert {"empl_status", "count"} == set(facets["empl_status"][0])
+
+
+def test_own_filter_is_excluded_from_its_dimension(client):
+    unfiltered = _search(client, limit=1, facets="dept")["facets"]["dept"]
+    data = _search(client, limit=1, deptid="IT", facets="dept,position")
+
+    # dept counts ignore deptid=IT, so every department is still offered
+    assert data["facets"]["dept"] == unfiltered
+    # other dimensions are narrowed by deptid=IT
+    total_it = next(r["count"] for r in unfiltered if r["deptid"] == "IT")
+    assert sum(r["count"] for r in data["facets"]["position"]) == total_it
+
+
+def test_per_dimension_facet_q(client):
+    data = _search(client, limit=1, facets="dept::finance,location")
+    assert [r["deptid"] for r in data["facets"]["dept"]] == ["FIN"]
+    assert len(data["facets"]["location"]) > 1
+
+
+def test_unknown_facet_rejected(client):
+    r = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers=HEADERS,
+        params={"facets": "salary"},
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("mode", ["concurrent", "sequential"])
+@pytest.mark.parametrize("slow", ["_build_search_query", "_build_facet_query"])
+def test_every_query_stops_at_the_search_deadline(client, monkeypatch, mode, slow):
+    import time
+
+    import psycopg
+
+    from app.core.config import settings
+    from app.modules.employee import repository, service
+    from app.modules.employee.result_cache import SearchResultCache
+
+    monkeypatch.setattr(
+        service,
+        "result_cache",
+        SearchResultCache(max_entries=0, ttl_seconds=0, revalidate_seconds=0),
+    )
+    monkeypatch.setattr(settings, "search_facets_mode", mode)
+    monkeypatch.setattr(settings, "search_timeout_seconds", 0.5)
+    monkeypatch.setattr(
+        repository, slow, lambda **kwargs: ("SELECT pg_sleep(30) AS slept", {})
+    )
+
+    started = time.monotonic()
+    r = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers=HEADERS,
+        params={"q": "engineer", "facets": "dept"},
+    )
+    assert r.status_code == 504
+    assert time.monotonic() - started < 5
+    # Stopped on the server too, not only abandoned by the request
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        running = conn.execute(
+            "SELECT count(*) FROM pg_stat_activity"
+            " WHERE query LIKE 'SELECT pg_sleep(30)%%' AND state = 'active'"
+        ).fetchone()[0]
+    assert running == 0
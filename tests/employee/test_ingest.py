@@ -0,0 +1,201 @@
+import psycopg
+import pytest
+from psycopg.rows import dict_row
+
+from app.core.config import settings
+from app.modules.employee import ingest
+
+ORG = 9101  # scratch org, removed after each test
+
+DEPARTMENTS = "DEPTID,DESCR,STATUS\nENG,Engineering,A\nOPS,Operations,A\n"
+PEOPLE = (
+    "EMPLID,FIRST_NAME,LAST_NAME,NAME,EMAIL_ADDR,PHONE\n"
+    "K1,Kim,Lee,,kim@x.example,0901\n"
+    "K2,Ana,Ruiz,Ana R.,ana@x.example,0902\n"
+    "K3,Bo,Tan,,bo@x.example,\n"
+)
+EMPLOYMENT = (
+    "EMPLID,EMPL_STATUS,HIRE_DT,DEPTID,SUPERVISOR_ID,EXTRA\n"
+    "K1,A,2020-01-01,ENG,,x\n"
+    "K2,A,2021-02-03,ENG,K1,x\n"
+    "K3,L,2022-03-04,OPS,K1,x\n"
+    "K9,A,2022-03-04,OPS,,x\n"  # no person: skipped
+)
+
+
+@pytest.fixture
+def conn():
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        yield conn
+        for table in (
+            "hr_employment",
+            "hr_person",
+            "hr_department",
+            "hr_refdata_version",
+            "hr_search_reindex_queue",
+        ):
+            conn.execute(f"DELETE FROM {table} WHERE org_id = %s", (ORG,))
+
+
+def _files(tmp_path, **contents: str) -> dict[str, str]:
+    files = {}
+    for name, text in contents.items():
+        path = tmp_path / f"{name}.csv"
+        path.write_text(text)
+        files[name] = str(path)
+    return files
+
+
+def _counts(stats) -> dict[str, tuple[int, int]]:
+    return {s.extract: (s.inserted, s.updated) for s in stats}
+
+
+def _employees(conn) -> dict[str, dict]:
+    with conn.cursor(row_factory=dict_row) as cur:
+        rows = cur.execute(
+            """
+            SELECT p.emplid, p.display_name, e.empl_status, e.deptid,
+                   m.emplid AS manager, e.updated_at,
+                   e.search_tsv::text AS doc,
+                   hr_employment_search_doc(
+                     p.display_name, p.email_addr, p.phone,
+                     NULL, d.descr, NULL, NULL, NULL
+                   )::text AS expected
+            FROM hr_employment e
+            JOIN hr_person p USING (org_id, employee_id)
+            LEFT JOIN hr_person m
+              ON m.org_id = e.org_id AND m.employee_id = e.reports_to_employee_id
+            LEFT JOIN hr_department d ON d.org_id = e.org_id AND d.deptid = e.deptid
+            WHERE e.org_id = %s
+            """,
+            (ORG,),
+        ).fetchall()
+    return {r["emplid"]: r for r in rows}
+
+
+def _queued(conn) -> int:
+    return conn.execute(
+        "SELECT count(*) FROM hr_search_reindex_queue WHERE org_id = %s", (ORG,)
+    ).fetchone()[0]
+
+
+def test_load_builds_documents_and_rerun_is_a_no_op(conn, tmp_path):
+    files = _files(
+        tmp_path, department=DEPARTMENTS, person=PEOPLE, employment=EMPLOYMENT
+    )
+    stats, _ = ingest.ingest(conn, ORG, files)
+    assert _counts(stats) == {
+        "department": (2, 0),
+        "person": (3, 0),
+        "employment": (3, 0),
+    }
+    assert stats[-1].skipped == 1
+
+    employees = _employees(conn)
+    assert employees["K1"]["display_name"] == "Kim Lee"  # derived
+    assert employees["K2"]["display_name"] == "Ana R."
+    assert employees["K3"]["manager"] == "K1"
+    assert all(e["doc"] == e["expected"] for e in employees.values())
+    assert _queued(conn) == 0
+
+    stats, refreshed = ingest.ingest(conn, ORG, files)
+    assert set(_counts(stats).values()) == {(0, 0)}
+    assert refreshed == 0
+    assert _employees(conn) == employees  # updated_at untouched too
+
+
+def test_changes_rebuild_only_affected_documents(conn, tmp_path):
+    ingest.ingest(
+        conn,
+        ORG,
+        _files(tmp_path, department=DEPARTMENTS, person=PEOPLE, employment=EMPLOYMENT),
+    )
+    before = _employees(conn)
+
+    changed = _files(
+        tmp_path,
+        department="DEPTID,DESCR\nOPS,Platform Wombats\n",
+        person=(
+            "EMPLID,FIRST_NAME,LAST_NAME,NAME,EMAIL_ADDR\n"
+            "K1,Kim,Zebra,Kim Zebra,kim@x.example\n"
+        ),
+        # Partial extract: other columns keep their live values
+        employment="EMPLID,DEPTID\nK2,OPS\n",
+    )
+    stats, refreshed = ingest.ingest(conn, ORG, changed)
+    assert _counts(stats) == {
+        "department": (0, 1),
+        "person": (0, 1),
+        "employment": (0, 1),
+    }
+    assert refreshed == 2  # K1 (name), K3 (department); K2 by the upsert
+
+    after = _employees(conn)
+    assert all(e["doc"] == e["expected"] for e in after.values())
+    assert "wombats" in after["K2"]["doc"] and "zebra" in after["K1"]["doc"]
+    assert after["K2"]["empl_status"] == "A" and after["K2"]["manager"] == "K1"
+    # Only the employment record itself moves in the updated_at order
+    assert after["K2"]["updated_at"] > before["K2"]["updated_at"]
+    assert after["K1"]["updated_at"] == before["K1"]["updated_at"]
+    assert _queued(conn) == 0
+
+
+def test_missing_or_empty_name_keeps_the_display_name(conn, tmp_path):
+    ingest.ingest(conn, ORG, _files(tmp_path, person=PEOPLE))
+    conn.execute(
+        "UPDATE hr_person SET display_name = 'Kimmy'"
+        " WHERE org_id = %s AND emplid = 'K1'",
+        (ORG,),
+    )
+
+    def names() -> dict[str, str]:
+        rows = conn.execute(
+            "SELECT emplid, display_name FROM hr_person WHERE org_id = %s", (ORG,)
+        ).fetchall()
+        return dict(rows)
+
+    # No NAME column: live names stay, new people get first + last
+    no_name = (
+        "EMPLID,FIRST_NAME,LAST_NAME,EMAIL_ADDR\n"
+        "K1,Kim,Lee,kim@x.example\n"
+        "K2,Ana,Ruiz,ana@x.example\n"
+        "K4,Di,Ho,di@x.example\n"
+    )
+    stats, _ = ingest.ingest(conn, ORG, _files(tmp_path, person=no_name))
+    assert _counts(stats) == {"person": (1, 0)}
+    assert names() == {"K1": "Kimmy", "K2": "Ana R.", "K3": "Bo Tan", "K4": "Di Ho"}
+
+    # An empty NAME is no name either; a given one still wins
+    empty = (
+        "EMPLID,FIRST_NAME,LAST_NAME,NAME,EMAIL_ADDR\n"
+        "K2,Ana,Ruiz,,ana@x.example\n"
+        "K3,Bo,Tan,Bo T.,bo@x.example\n"
+    )
+    stats, _ = ingest.ingest(conn, ORG, _files(tmp_path, person=empty))
+    assert _counts(stats) == {"person": (0, 1)}
+    assert names() == {"K1": "Kimmy", "K2": "Ana R.", "K3": "Bo T.", "K4": "Di Ho"}
+
+
+def test_failed_load_leaves_nothing_behind(conn, tmp_path):
+    with pytest.raises(psycopg.errors.InvalidDatetimeFormat):
+        ingest.ingest(
+            conn,
+            ORG,
+            _files(
+                tmp_path,
+                person=PEOPLE,
+                employment="EMPLID,HIRE_DT\nK1,not-a-date\n",
+            ),
+        )
+    assert _employees(conn) == {}
+    assert (
+        conn.execute(
+            "SELECT count(*) FROM hr_person WHERE org_id = %s", (ORG,)
+        ).fetchone()[0]
+        == 0
+    )
+
+
+def test_missing_required_column_is_rejected(conn, tmp_path):
+    with pytest.raises(ValueError, match="missing required column"):
+        ingest.ingest(conn, ORG, _files(tmp_path, person="EMPLID,NAME\nK1,Kim\n"))
@@ -0,0 +1,230 @@
+import psycopg
+import pytest
+
+from app.core.config import settings
+from app.modules.employee import ingest, memindex
+from app.modules.employee import repository as repo
+from app.modules.employee.result_cache import result_cache
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+ORG = 9102  # scratch org for refreshes, removed after the test
+
+
+def _indexes(*orgs: int) -> memindex.SearchIndexes:
+    # Refreshes are driven by the tests, not by request traffic
+    return memindex.SearchIndexes(orgs=orgs, refresh_seconds=1e9, reload_seconds=1e9)
+
+
+@pytest.fixture
+def org1(db_pool):
+    indexes = _indexes(1)
+    indexes.build(1)
+    return indexes
+
+
+def _both(monkeypatch, indexes, fn, **kwargs):
+    monkeypatch.setattr(memindex, "indexes", _indexes())
+    expected = fn(**kwargs)
+    monkeypatch.setattr(memindex, "indexes", indexes)
+    return expected, fn(**kwargs)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"q": "engineer"},
+        {"q": "  Information  technology "},
+        {"q": "engineer", "sort": "relevance"},
+        {"q": "a", "sort": "relevance", "deptid": "IT"},
+        {"empl_status": "A"},
+        {"q": "zzzq"},
+    ],
+)
+def test_pages_and_cursors_match_sql(org1, client, monkeypatch, params):
+    monkeypatch.setattr(result_cache, "max_entries", 0)  # both passes query
+
+    def pages():
+        out, cursor = [], None
+        for _ in range(4):
+            r = client.get(
+                f"{BASE}/orgs/1/employees/search",
+                headers=HEADERS,
+                params={**params, "limit": 7, **({"cursor": cursor} if cursor else {})},
+            )
+            assert r.status_code == 200
+            body = r.json()
+            out.append(body)
+            cursor = body.get("next_cursor")
+            if not cursor:
+                break
+        return out
+
+    monkeypatch.setattr(memindex, "indexes", _indexes())
+    expected = pages()
+    monkeypatch.setattr(memindex, "indexes", org1)
+    assert pages() == expected
+    assert org1.served >= len(expected) and not org1.fallbacks
+
+
+def test_ranks_match_ts_rank(org1, monkeypatch):
+    for q in ("engineer", "alice nguyen", "information technology", "1"):
+        expected, rows = _both(
+            monkeypatch,
+            org1,
+            repo.search_employees,
+            org_id=1,
+            q=q,
+            sort="relevance",
+            limit=100,
+        )
+        assert rows == expected
+        assert [r["rank"] for r in rows] == [r["rank"] for r in expected]
+
+
+def test_facets_match_sql(org1, monkeypatch):
+    facets = [
+        repo.FacetSpec("dept"),
+        repo.FacetSpec("location", limit=2),
+        repo.FacetSpec("jobcode", q="en"),
+        repo.FacetSpec("empl_status"),
+    ]
+    for q, filters in (
+        (None, {}),
+        ("engineer", {}),
+        (None, {"empl_status": "A", "deptid": "IT"}),
+        ("a", {"location": "HCM"}),
+    ):
+        expected, counts = _both(
+            monkeypatch,
+            org1,
+            repo.facet_counts,
+            org_id=1,
+            q=q,
+            filters=filters,
+            facets=facets,
+        )
+        assert counts == expected
+
+
+def test_queries_it_cannot_answer_exactly_go_to_postgres(org1, monkeypatch):
+    monkeypatch.setattr(memindex, "indexes", org1)
+    for q in ('"alice nguyen"', "alice -nguyen", "alice or bob", "nguyễn", "a.b"):
+        assert (
+            org1.search(org_id=1, q=q, filters={}, limit=5, keys=(), sort="recent")
+            is None
+        )
+        assert repo.search_employees(org_id=1, q=q, limit=5) is not None
+    assert org1.fallbacks == 10
+    # facet_q is an ILIKE pattern there
+    assert (
+        org1.facet_rows(
+            org_id=1,
+            q=None,
+            filters={},
+            facets=repo._facet_requests(
+                [repo.FacetSpec("dept", q="1_")], repo.refdata_cache.get(1)
+            ),
+        )
+        is None
+    )
+    # Not built yet: served from SQL while the build runs in the background
+    cold = _indexes(1)
+    monkeypatch.setattr(cold, "_schedule", lambda org_id: None)
+    monkeypatch.setattr(memindex, "indexes", cold)
+    assert repo.search_employees(org_id=1, q=None, limit=5)
+    assert not cold.served
+
+
+DEPARTMENTS = "DEPTID,DESCR\nENG,Engineering\nOPS,Operations\n"
+PEOPLE = (
+    "EMPLID,FIRST_NAME,LAST_NAME,EMAIL_ADDR\n"
+    "K1,Kim,Lee,kim@x.example\n"
+    "K2,Ana,Ruiz,ana@x.example\n"
+    "K3,Bo,Tan,bo@x.example\n"
+)
+EMPLOYMENT = "EMPLID,EMPL_STATUS,DEPTID\nK1,A,ENG\nK2,A,ENG\n"
+
+
+@pytest.fixture
+def scratch(db_pool, tmp_path):
+    def load(**contents):
+        files = {}
+        for name, text in contents.items():
+            path = tmp_path / f"{name}.csv"
+            path.write_text(text)
+            files[name] = str(path)
+        ingest.ingest(conn, ORG, files)
+
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        load(department=DEPARTMENTS, person=PEOPLE, employment=EMPLOYMENT)
+        yield load
+        for table in (
+            "hr_employment",
+            "hr_person",
+            "hr_department",
+            "hr_refdata_version",
+            "hr_search_reindex_queue",
+        ):
+            conn.execute(f"DELETE FROM {table} WHERE org_id = %s", (ORG,))
+
+
+def _names(indexes, **kwargs) -> list[str]:
+    rows = indexes.search(
+        org_id=ORG, limit=100, keys=("display_name",), sort="recent", **kwargs
+    )
+    return [r["display_name"] for r in rows]
+
+
+def test_changes_send_searches_to_postgres_until_rebuilt(scratch, monkeypatch):
+    indexes = _indexes(ORG)
+    monkeypatch.setattr(indexes, "_schedule", lambda org_id: None)
+    index = indexes.build(ORG)
+    assert sorted(_names(indexes, q="engineering", filters={})) == [
+        "Ana Ruiz",
+        "Kim Lee",
+    ]
+
+    # NOTIFY hr_org_changed: stale at once, SQL until the check rebuilds it
+    scratch(employment="EMPLID,EMPL_STATUS,DEPTID\nK1,A,OPS\nK3,A,ENG\n")
+    indexes.on_notify(str(ORG))
+    assert (
+        indexes.search(org_id=ORG, q=None, filters={}, limit=5, keys=(), sort="recent")
+        is None
+    )
+    indexes.refresh(ORG)
+    assert indexes._indexes[ORG] is not index
+    assert _names(indexes, q="engineering", filters={}) == ["Bo Tan", "Ana Ruiz"]
+    assert _names(indexes, q=None, filters={"deptid": "OPS"}) == ["Kim Lee"]
+
+    # No NOTIFY (listener down): the version check still sees person-only
+    # edits and deletes, which leave updated_at alone
+    scratch(
+        person="EMPLID,FIRST_NAME,LAST_NAME,NAME,EMAIL_ADDR\n"
+        "K3,Bo,Zebra,Bo Zebra,bo@x.example\n"
+    )
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute(
+            "DELETE FROM hr_employment e USING hr_person p"
+            " WHERE e.org_id = %s AND p.org_id = e.org_id"
+            " AND p.employee_id = e.employee_id AND p.emplid = 'K2'",
+            (ORG,),
+        )
+    index = indexes._indexes[ORG]
+    indexes.refresh(ORG)
+    assert indexes._indexes[ORG] is not index
+    assert _names(indexes, q="engineering", filters={}) == ["Bo Zebra"]
+
+    # Nothing changed: one version read, the index stays
+    index = indexes._indexes[ORG]
+    indexes.refresh(ORG)
+    assert indexes._indexes[ORG] is index and not index.stale
+    assert indexes.builds == 3 and indexes.checks == 3
+
+    # Answers the result cache / ETag stamp with newer versions come from SQL
+    data, refdata = index.versions
+    with indexes.reading((data + 1, refdata)):
+        assert indexes.get(ORG) is None
+    with indexes.reading((data, refdata)):
+        assert indexes.get(ORG) is index
@@ -0,0 +1,75 @@
+import json
+import uuid
+
+from app.modules.employee import encoding, repository
+from app.modules.employee.config import ORG_COLUMNS
+
+
+def _select_list(sql: str) -> str:
+    return sql.split("FROM", 1)[0]
+
+
+def test_projection_follows_org_columns():
+    sql, _ = repository._build_search_query(
+        org_id=2, q=None, columns=tuple(ORG_COLUMNS[2])
+    )
+    assert "p.display_name" in _select_list(sql)
+    assert "first_name" not in sql and "last_name" not in sql
+    assert "e.location" not in _select_list(sql)  # location_descr not configured
+
+
+def test_person_join_only_when_needed():
+    sql, _ = repository._build_search_query(
+        org_id=1, q=None, columns=("empl_status", "dept_descr")
+    )
+    assert "hr_person" not in sql
+    assert "e.deptid" in _select_list(sql)
+
+
+def test_statements_cached_by_columns_and_filter_shape():
+    columns = ("display_name", "dept_descr")
+    a, pa = repository._build_search_query(
+        org_id=1, q="x", deptid="IT", columns=columns
+    )
+    b, pb = repository._build_search_query(
+        org_id=7, q="y", deptid="HR", columns=columns
+    )
+    c, _ = repository._build_search_query(org_id=1, q="x", columns=columns)
+
+    assert a is b  # same compiled text object, only params differ
+    assert pa["deptid"] == "IT" and pb["deptid"] == "HR"
+    assert c != a
+
+
+def test_encoded_page_matches_the_generic_encoding():
+    employee_id = uuid.uuid4()
+    row = {
+        "employee_id": employee_id,
+        "updated_at": None,
+        "rank": 0.5,
+        "display_name": "Nguyễn An",
+        "dept_descr": None,
+        "deptid": "IT",
+    }
+    # "status" is allowed but never selected: always null
+    projection = encoding.projection(("dept_descr", "status", "display_name"))
+    assert encoding.projection(("dept_descr", "status", "display_name")) is projection
+
+    body = encoding.encode_page(
+        projection, [row], next_cursor=None, limit=5, facets={"dept": []}
+    )
+    assert json.loads(body) == {
+        "items": [
+            {
+                "employee_id": str(employee_id),
+                "dept_descr": None,
+                "status": None,
+                "display_name": "Nguyễn An",
+            }
+        ],
+        "next_cursor": None,
+        "limit": 5,
+        "facets": {"dept": []},
+    }
+    assert list(json.loads(body)["items"][0]) == list(projection.keys)
+    assert encoding.projection(()).items([row]) == [{"employee_id": employee_id}]
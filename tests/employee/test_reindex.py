@@ -0,0 +1,113 @@
+import psycopg
+import pytest
+
+from app.core.config import settings
+from app.modules.employee import reindex
+
+ORG = 1
+
+
+@pytest.fixture
+def conn():
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        yield conn
+        # Leave the seed org fully indexed whatever the test did
+        reindex.enqueue(conn, ORG)
+        reindex.drain(conn, org_id=ORG)
+
+
+def _matches(conn, term: str) -> int:
+    return conn.execute(
+        "SELECT count(*) FROM hr_employment WHERE org_id = %s"
+        " AND search_tsv @@ websearch_to_tsquery('simple', %s)",
+        (ORG, term),
+    ).fetchone()[0]
+
+
+def _queue(conn) -> list[tuple]:
+    return conn.execute(
+        "SELECT column_name, code FROM hr_search_reindex_queue WHERE org_id = %s",
+        (ORG,),
+    ).fetchall()
+
+
+def test_department_rename_is_enqueued_and_reindexed(conn):
+    in_it = conn.execute(
+        "SELECT count(*) FROM hr_employment WHERE org_id = %s AND deptid = 'IT'",
+        (ORG,),
+    ).fetchone()[0]
+    try:
+        conn.execute(
+            "UPDATE hr_department SET descr = 'Platform Wombats'"
+            " WHERE org_id = %s AND deptid = 'IT'",
+            (ORG,),
+        )
+        assert _queue(conn) == [("deptid", "IT")]
+        assert _matches(conn, "wombats") == 0  # stale until reindexed
+
+        assert reindex.drain(conn, org_id=ORG, batch_size=7) == 1
+        assert _matches(conn, "wombats") == in_it > 7  # several batches
+        assert _queue(conn) == []
+    finally:
+        conn.execute(
+            "UPDATE hr_department SET descr = 'Information Technology'"
+            " WHERE org_id = %s AND deptid = 'IT'",
+            (ORG,),
+        )
+
+
+def test_status_only_change_enqueues_nothing(conn):
+    conn.execute("UPDATE hr_department SET status = status WHERE org_id = %s", (ORG,))
+    assert _queue(conn) == []
+
+
+def test_resumes_from_watermark_and_reenqueue_restarts(conn):
+    total = conn.execute(
+        "SELECT count(*) FROM hr_employment WHERE org_id = %s", (ORG,)
+    ).fetchone()[0]
+    last = conn.execute(
+        "SELECT employee_id FROM hr_employment WHERE org_id = %s"
+        " ORDER BY employee_id DESC LIMIT 1",
+        (ORG,),
+    ).fetchone()[0]
+    # search_tsv is not a trigger column: the documents are simply gone
+    conn.execute("UPDATE hr_employment SET search_tsv = NULL WHERE org_id = %s", (ORG,))
+
+    # An interrupted run that already got past every row: resuming does nothing
+    reindex.enqueue(conn, ORG)
+    conn.execute(
+        "UPDATE hr_search_reindex_queue SET last_employee_id = %s WHERE org_id = %s",
+        (last, ORG),
+    )
+    reindex.drain(conn, org_id=ORG, batch_size=10)
+    assert _matches(conn, "nguyen") == 0
+
+    # Enqueueing the same key again resets its watermark
+    reindex.enqueue(conn, ORG)
+    assert (
+        conn.execute(
+            "SELECT last_employee_id FROM hr_search_reindex_queue WHERE org_id = %s",
+            (ORG,),
+        ).fetchone()[0]
+        is None
+    )
+    reindex.drain(conn, org_id=ORG, batch_size=10)
+    assert _matches(conn, "nguyen") > 0
+    assert (
+        conn.execute(
+            "SELECT count(*) FROM hr_employment WHERE org_id = %s"
+            " AND search_tsv IS NOT NULL",
+            (ORG,),
+        ).fetchone()[0]
+        == total
+    )
+
+
+def test_entry_locks_cover_bigserial_ids(conn):
+    entry_id = 2**31 + 7  # past int4: the queue id is a BIGSERIAL
+    with psycopg.connect(settings.database_url, autocommit=True) as other:
+        assert reindex._try_lock(conn, entry_id)
+        assert not reindex._try_lock(other, entry_id)
+        reindex._unlock(conn, entry_id)
+        assert reindex._try_lock(other, entry_id)
+        reindex._unlock(other, entry_id)
@@ -0,0 +1,161 @@
+import threading
+
+import psycopg
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.modules.employee import service
+from app.modules.employee.config import ORG_COLUMNS
+from app.modules.employee.result_cache import SearchResultCache
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+@pytest.fixture
+def cache(monkeypatch, no_rate_limit, db_pool):
+    cache = SearchResultCache(max_entries=100, ttl_seconds=60, revalidate_seconds=1e9)
+    monkeypatch.setattr(service, "result_cache", cache)
+    return cache
+
+
+def _search(**params):
+    r = TestClient(app).get(
+        f"{BASE}/orgs/1/employees/search", headers=HEADERS, params=params
+    )
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_equivalent_requests_share_an_entry(cache):
+    first = _search(q="Engineer", deptid="IT", facets="dept")
+    assert _search(q="  engineer ", deptid="IT", facets="dept") == first
+    assert (
+        _search(q="engineer", deptid="IT", facets="dept", strategy="two_phase") == first
+    )
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Relevance cursors bind q as sent: no sharing across spellings
+    _search(q="engineer", sort="relevance")
+    _search(q="Engineer", sort="relevance")
+    assert cache.misses == 3
+
+
+def test_column_config_is_part_of_the_key(cache, monkeypatch):
+    _search(q="engineer")
+    monkeypatch.setitem(ORG_COLUMNS, 1, ["phone"])
+    items = _search(q="engineer")["items"]
+    assert items and set(items[0]) == {"employee_id", "phone"}
+    assert cache.hits == 0
+
+
+def test_writes_and_notifications_invalidate(cache):
+    _search(empl_status="A", limit=5)
+    _search(empl_status="A", limit=5)
+    assert cache.hits == 1
+
+    cache.on_notify("1")  # NOTIFY hr_org_changed
+    _search(empl_status="A", limit=5)
+    assert cache.hits == 1
+
+    # Without NOTIFY, the version check notices the write
+    cache.revalidate_seconds = 0
+    _search(empl_status="A", limit=5)
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute(
+            "UPDATE hr_employment SET empl_status = empl_status"
+            " WHERE org_id = 1 AND employee_id = ("
+            "   SELECT employee_id FROM hr_employment WHERE org_id = 1 LIMIT 1)"
+        )
+    hits = cache.hits
+    _search(empl_status="A", limit=5)
+    assert cache.hits == hits and cache.invalidations == 2
+
+
+def test_concurrent_misses_run_once_and_raced_fills_are_not_stored(cache):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"{}"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(1, ("k",), slow)))
+        for _ in range(4)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    while cache.coalesced < 3:
+        pass
+    cache.invalidate(1)  # a write lands while the query runs
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1] and results == [b"{}"] * 4
+    cache.get(1, ("k",), slow)
+    assert len(calls) == 2  # the raced fill was not kept
+    assert cache.get(1, ("k",), slow) is not None and len(calls) == 2
+
+
+def test_async_path_uses_the_cache(cache, monkeypatch):
+    expected = _search(q="engineer", limit=5)
+    monkeypatch.setattr(settings, "db_async", True)
+    with TestClient(app) as client:
+        r = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=HEADERS,
+            params={"q": "ENGINEER", "limit": 5},
+        )
+    assert r.json() == expected and cache.hits == 1
+
+
+def test_version_position_moves_only_when_the_versions_do(cache):
+    cache.revalidate_seconds = 0
+    first = cache.version(1)
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute("CREATE TEMP TABLE wal_filler AS SELECT 1")  # moves the WAL
+    # Replicas that replayed `first.lsn` still hold these versions
+    assert cache.version(1) == first
+
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute(
+            "UPDATE hr_employment SET empl_status = empl_status"
+            " WHERE org_id = 1 AND employee_id = ("
+            "   SELECT employee_id FROM hr_employment WHERE org_id = 1 LIMIT 1)"
+        )
+    after = cache.version(1)
+    assert after.versions > first.versions and after.lsn > first.lsn
+    assert after.epoch != first.epoch
+
+
+def test_read_after_a_newer_write_skips_the_stale_entry(cache):
+    def search(headers=None):
+        return TestClient(app).get(
+            f"{BASE}/orgs/1/employees/search",
+            headers={**HEADERS, **(headers or {})},
+            params={"q": "ENGINEER", "limit": 5},
+        )
+
+    before = search()
+    assert search().headers["etag"] == before.headers["etag"] and cache.hits == 1
+
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        conn.execute(
+            "UPDATE hr_employment SET empl_status = empl_status"
+            " WHERE org_id = 1 AND employee_id = ("
+            "   SELECT employee_id FROM hr_employment WHERE org_id = 1 LIMIT 1)"
+        )
+        (lsn,) = conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()
+    # Nothing told this process about the write; the client's position does
+    after = search({"X-Read-After": lsn, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200 and cache.hits == 1
+    assert after.headers["etag"] != before.headers["etag"]
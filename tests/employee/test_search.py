@@ -7,19 +7,6 @@ from app.modules.employee.config import ALLOWED_COLUMNS, ORG_COLUMNS
 BASE = "/api/v1"
 
 
-@pytest.fixture
-def client():
-    from app.db.pool import close_pool, init_pool
-
-    # Initialize DB pool (TestClient doesn't trigger startup events)
-    init_pool()
-
-    yield TestClient(app)
-
-    # Cleanup
-    close_pool()
-
-
 def _assert_item_keys_valid(item: dict):
     # always present
     assert "employee_id" in item
@@ -105,17 +92,12 @@ def test_keyset_pagination_no_duplicates(client):
     assert d1["next_cursor"] is not None
 
     ids1 = {it["employee_id"] for it in items1}
-    cursor = d1["next_cursor"]
 
-    # Page 2 using cursor
+    # Page 2 using the opaque cursor
     r2 = client.get(
         f"{BASE}/orgs/1/employees/search",
         headers={"X-API-Key": "dev-key-1"},
-        params={
-            "limit": 2,
-            "cursor_updated_at": cursor["updated_at"],
-            "cursor_employee_id": cursor["employee_id"],
-        },
+        params={"limit": 2, "cursor": d1["next_cursor"]},
     )
     assert r2.status_code == 200
     d2 = r2.json()
@@ -123,3 +105,151 @@ def test_keyset_pagination_no_duplicates(client):
 
     # No duplicates between pages
     assert ids1.isdisjoint(ids2)
+
+
+def test_async_path_matches_sync_path(client, monkeypatch):
+    from app.core.config import settings
+
+    headers = {"X-API-Key": "dev-key-1"}
+    params = {"limit": 5, "include_facets": "true"}
+    sync_data = client.get(
+        f"{BASE}/orgs/1/employees/search", headers=headers, params=params
+    ).json()
+
+    # Lifespan only runs inside the context manager; it opens the async pool
+    monkeypatch.setattr(settings, "db_async", True)
+    with TestClient(app) as async_client:
+        r = async_client.get(
+            f"{BASE}/orgs/1/employees/search", headers=headers, params=params
+        )
+    assert r.status_code == 200
+    assert r.json() == sync_data
+
+
+@pytest.mark.parametrize("mode", ["concurrent", "pipeline"])
+def test_facet_modes_match_sequential(client, monkeypatch, mode):
+    from app.core.config import settings
+
+    headers = {"X-API-Key": "dev-key-1"}
+    params = {"q": "engineer", "limit": 5, "include_facets": "true"}
+
+    monkeypatch.setattr(settings, "search_facets_mode", "sequential")
+    expected = client.get(
+        f"{BASE}/orgs/1/employees/search", headers=headers, params=params
+    ).json()
+
+    monkeypatch.setattr(settings, "search_facets_mode", mode)
+    r = client.get(f"{BASE}/orgs/1/employees/search", headers=headers, params=params)
+    assert r.status_code == 200
+    assert r.json() == expected
+    assert r.json()["facets"]["position"]
+
+
+def test_two_phase_strategy_matches_single(client):
+    headers = {"X-API-Key": "dev-key-1"}
+    for params in ({"limit": 5}, {"q": "engineer", "deptid": "IT", "limit": 5}):
+        single = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=headers,
+            params={**params, "strategy": "single"},
+        )
+        two_phase = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=headers,
+            params={**params, "strategy": "two_phase"},
+        )
+        assert two_phase.status_code == 200
+        assert two_phase.json() == single.json()
+
+
+def test_relevance_pagination_is_stable(client):
+    headers = {"X-API-Key": "dev-key-1"}
+    url = f"{BASE}/orgs/1/employees/search"
+    params = {"q": "engineer", "sort": "relevance"}
+
+    everything = client.get(url, headers=headers, params={**params, "limit": 100})
+    assert everything.status_code == 200
+    expected = [it["employee_id"] for it in everything.json()["items"]]
+    assert expected
+
+    # Walk the same result set two rows at a time
+    seen, cursor = [], None
+    while True:
+        page = client.get(
+            url, headers=headers, params={**params, "limit": 2, "cursor": cursor}
+        ).json()
+        if not page["items"]:
+            break
+        seen += [it["employee_id"] for it in page["items"]]
+        cursor = page["next_cursor"]
+    assert seen == expected
+
+
+def test_relevance_ranks_every_match(client):
+    import psycopg
+
+    from app.core.config import settings
+
+    # The best matches, however old: no recency cut-off before ranking
+    with psycopg.connect(settings.database_url) as conn:
+        best = [
+            str(r[0])
+            for r in conn.execute(
+                "SELECT employee_id FROM hr_employment"
+                " WHERE org_id = 1"
+                "   AND search_tsv @@ websearch_to_tsquery('simple', 'engineer')"
+                " ORDER BY"
+                "   ts_rank(search_tsv, websearch_to_tsquery('simple', 'engineer'))"
+                "   DESC, employee_id DESC"
+                " LIMIT 10"
+            )
+        ]
+    r = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers={"X-API-Key": "dev-key-1"},
+        params={"q": "engineer", "sort": "relevance", "limit": 10},
+    )
+    assert [it["employee_id"] for it in r.json()["items"]] == best
+
+
+def test_statement_timeout_answers_504(client, monkeypatch):
+    from psycopg.errors import QueryCanceled
+
+    from app.modules.employee import repository
+
+    def cancelled(**kwargs):
+        raise QueryCanceled("canceling statement due to statement timeout")
+
+    monkeypatch.setattr(repository, "search_employees", cancelled)
+    r = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers={"X-API-Key": "dev-key-1"},
+        params={"q": "timeout probe", "sort": "relevance"},
+    )
+    assert r.status_code == 504
+
+
+def test_relevance_requires_q(client):
+    r = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers={"X-API-Key": "dev-key-1"},
+        params={"sort": "relevance"},
+    )
+    assert r.status_code == 400
+
+
+def test_cursor_is_tamper_evident(client):
+    headers = {"X-API-Key": "dev-key-1"}
+    url = f"{BASE}/orgs/1/employees/search"
+    params = {"q": "engineer", "sort": "relevance", "limit": 1}
+    cursor = client.get(url, headers=headers, params=params).json()["next_cursor"]
+
+    flipped = cursor[:-2] + ("A" if cursor[-2] != "A" else "B") + cursor[-1]
+    for bad in (flipped, "not-a-cursor", cursor[:10]):
+        r = client.get(url, headers=headers, params={**params, "cursor": bad})
+        assert r.status_code == 400
+
+    # Valid signature, different query/sort: rejected as well
+    for other in ({**params, "q": "manager"}, {"limit": 1}):
+        r = client.get(url, headers=headers, params={**other, "cursor": cursor})
+        assert r.status_code == 400
@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.modules.employee.config import ORG_COLUMNS
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+def _suggest(client, **params):
+    r = client.get(f"{BASE}/orgs/1/employees/suggest", headers=HEADERS, params=params)
+    assert r.status_code == 200
+    return r.json()["items"]
+
+
+def test_prefix_matches_come_first_and_are_case_insensitive(client):
+    items = _suggest(client, q="  ALI ", limit=5)
+    assert items and items[0]["display_name"] == "Alice Nguyen"
+    # Last names and email addresses match too
+    assert "Alice Nguyen" in {i["display_name"] for i in _suggest(client, q="nguy")}
+    assert _suggest(client, q="alice.ng")[0]["display_name"] == "Alice Nguyen"
+    assert len(_suggest(client, q="b", limit=3)) == 3
+
+
+def test_word_prefixes_fall_back_to_search_document(client):
+    # No name starts with it: matched through the department descriptions
+    items = _suggest(client, q="informat")
+    assert items
+    by_search = client.get(
+        f"{BASE}/orgs/1/employees/search",
+        headers=HEADERS,
+        params={"q": "information", "limit": 100},
+    ).json()["items"]
+    assert {i["employee_id"] for i in items} <= {i["employee_id"] for i in by_search}
+
+
+def test_empty_and_unmatched_prefixes(client):
+    assert _suggest(client, q="   ") == []
+    assert _suggest(client, q="zzzq") == []
+    assert _suggest(client, q="\x00") == []
+
+
+def test_hidden_columns_are_not_matched_or_returned(client, monkeypatch):
+    assert _suggest(client, q="al")
+    monkeypatch.setitem(ORG_COLUMNS, 1, ["phone", "dept_descr"])
+    assert _suggest(client, q="al") == []  # no name/email prefix tier left
+    items = _suggest(client, q="nguyen")  # the search document still matches
+    assert items and set(items[0]) == {"employee_id"}
+
+
+def test_other_org_is_forbidden(client):
+    r = client.get(
+        f"{BASE}/orgs/2/employees/suggest", headers=HEADERS, params={"q": "a"}
+    )
+    assert r.status_code == 403
+
+
+def test_async_path_matches_sync_path(client, monkeypatch):
+    from app.core.config import settings
+
+    params = {"q": "tra", "limit": 8}
+    expected = _suggest(client, **params)
+    monkeypatch.setattr(settings, "db_async", True)
+    with TestClient(app) as async_client:
+        assert _suggest(async_client, **params) == expected
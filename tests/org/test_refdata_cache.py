@@ -0,0 +1,85 @@
+from app.modules.org import service
+from app.modules.org.service import RefDataCache
+
+
+def _fake_repository(monkeypatch, versions: dict[int, int], loads: list[int]):
+    def load_refdata(org_id):
+        loads.append(org_id)
+        rows = [{"kind": "deptid", "code": "IT", "descr": f"IT v{versions[org_id]}"}]
+        return versions[org_id], rows
+
+    monkeypatch.setattr(service.repository, "load_refdata", load_refdata)
+    monkeypatch.setattr(
+        service.repository, "get_refdata_version", lambda org_id: versions[org_id]
+    )
+
+
+def test_lazy_load_and_lru_eviction(monkeypatch):
+    loads: list[int] = []
+    _fake_repository(monkeypatch, {1: 1, 2: 1, 3: 1}, loads)
+    cache = RefDataCache(max_orgs=2, revalidate_seconds=60)
+
+    assert cache.get(1).descr("deptid", "IT") == "IT v1"
+    cache.get(2)
+    cache.get(1)  # org 1 is now the most recently used
+    cache.get(3)  # evicts org 2
+    cache.get(1)
+    cache.get(2)  # reloaded
+
+    assert loads == [1, 2, 3, 2]
+
+
+def test_version_bump_reloads_and_notify_invalidates(monkeypatch):
+    loads: list[int] = []
+    versions = {1: 1}
+    _fake_repository(monkeypatch, versions, loads)
+    cache = RefDataCache(max_orgs=10, revalidate_seconds=0)
+
+    cache.get(1)
+    cache.get(1)  # stale -> version check only, unchanged
+    assert loads == [1]
+
+    versions[1] = 2
+    assert cache.get(1).descr("deptid", "IT") == "IT v2"
+    assert loads == [1, 1]
+
+    cache.revalidate_seconds = 60
+    cache.on_notify("1")
+    cache.get(1)
+    assert loads == [1, 1, 1]
+
+
+def test_a_required_version_reloads_an_older_entry(monkeypatch):
+    loads: list[int] = []
+    versions = {1: 1}
+    _fake_repository(monkeypatch, versions, loads)
+    cache = RefDataCache(max_orgs=10, revalidate_seconds=60)
+
+    cache.get(1)
+    versions[1] = 2  # the NOTIFY was lost; the entry is still "fresh"
+    assert cache.get(1).version == 1
+    assert cache.get(1, min_version=2).descr("deptid", "IT") == "IT v2"
+    with cache.reading(2):
+        cache.get(1)
+    assert loads == [1, 1]
+
+
+def test_loads_never_replace_newer_or_invalidated_data(monkeypatch):
+    loads: list[int] = []
+    versions = {1: 2}
+    _fake_repository(monkeypatch, versions, loads)
+    cache = RefDataCache(max_orgs=10, revalidate_seconds=60)
+    cache.get(1)
+
+    # A lagging load (older version) returns what the cache already has
+    versions[1] = 1
+    assert cache.get(1, min_version=3).version == 2
+
+    # A load that raced a NOTIFY is used once, not kept
+    def load_then_notified(org_id):
+        cache.on_notify(str(org_id))
+        return 3, []
+
+    monkeypatch.setattr(service.repository, "load_refdata", load_then_notified)
+    assert cache.get(1, min_version=3).version == 3
+    assert cache._lookup(1) is None
@@ -0,0 +1,88 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.db.deps as db_deps
+from app.core.config import settings
+from app.db.admission import AdmissionController, PoolAdmission
+from app.main import app
+from app.modules.employee.result_cache import result_cache
+
+
+def _controller(**overrides) -> AdmissionController:
+    kwargs = {
+        "initial_limit": 4,
+        "min_limit": 1,
+        "max_limit": 8,
+        "org_share": 0.5,
+        "org_min": 1,
+        "target_wait_seconds": 0.05,
+        "target_query_seconds": 1.0,
+        "cooldown_seconds": 0.0,
+    }
+    return AdmissionController(**{**kwargs, **overrides})
+
+
+def test_per_org_fair_share():
+    ac = _controller()
+    assert ac.try_acquire(1) and ac.try_acquire(1)
+    assert not ac.try_acquire(1)  # org 1 holds half of the limit already
+    assert ac.try_acquire(2) and ac.try_acquire(2)
+    assert not ac.try_acquire(3)  # global limit reached
+    assert ac.shed == 2
+
+    ac.release(1, wait=0.0, query=0.01)
+    assert ac.try_acquire(3)
+
+
+def test_aimd_limit_adapts_to_congestion():
+    ac = _controller()
+    for _ in range(20):
+        assert ac.try_acquire(None)
+        ac.release(None, wait=0.0, query=0.01)
+    assert 6 < ac.limit <= 8  # additive increase, capped
+
+    before = ac.limit
+    ac.try_acquire(None)
+    ac.release(None, wait=0.5, query=0.01)  # waited on the pool
+    assert ac.limit == pytest.approx(before * 0.9)
+
+    ac.try_acquire(None)
+    ac.release(None, wait=0.0, query=30.0, feedback=False)  # export stream
+    assert ac.limit == pytest.approx(before * 0.9)
+    assert ac.in_flight == 0
+
+
+def test_overload_is_shed_with_503(client, monkeypatch):
+    ac = _controller(initial_limit=1, min_limit=1)
+    monkeypatch.setattr(db_deps, "admission", PoolAdmission(lambda: ac))
+    monkeypatch.setattr(result_cache, "max_entries", 0)  # every request queries
+    url = "/api/v1/orgs/1/employees/search"
+    headers = {"X-API-Key": "dev-key-1"}
+    assert client.get(url, headers=headers).status_code == 200
+
+    ac.limit = 1  # a fast request above may have raised it (additive increase)
+    assert ac.try_acquire(1)  # someone else holds the only slot
+    r = client.get(url, headers=headers)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+
+
+@pytest.mark.parametrize("db_async", [False, True])
+def test_a_faceted_search_takes_one_slot(no_rate_limit, db_pool, monkeypatch, db_async):
+    # At the minimum limit one org may hold a single slot: the facet query,
+    # running alongside the page query, must not be shed once that one ran
+    ac = _controller(initial_limit=2, min_limit=2, max_limit=2)
+    assert ac.org_limit() == 1
+    monkeypatch.setattr(db_deps, "admission", PoolAdmission(lambda: ac))
+    monkeypatch.setattr(result_cache, "max_entries", 0)
+    monkeypatch.setattr(settings, "search_facets_mode", "concurrent")
+    monkeypatch.setattr(settings, "db_async", db_async)
+    with TestClient(app) as client:
+        for _ in range(5):
+            r = client.get(
+                "/api/v1/orgs/1/employees/search",
+                headers={"X-API-Key": "dev-key-1"},
+                params={"q": "engineer", "facets": "dept,location"},
+            )
+            assert r.status_code == 200 and r.json()["facets"]
+    assert ac.shed == 0 and ac.in_flight == 0
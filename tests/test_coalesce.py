@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.coalesce import AsyncSingleFlight, SingleFlight, Superseded, Supersession
+
+
+class _NotifyingLock:
+    """Stands in for a lock; every release wakes `joined` waiters."""
+
+    def __init__(self) -> None:
+        self.joined = threading.Condition()
+
+    def __enter__(self) -> None:
+        self.joined.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self.joined.notify_all()
+        self.joined.release()
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    flight._lock = lock = _NotifyingLock()  # callers join under it
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+    leader.start()
+    started.wait(5)
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        for _ in range(3)
+    ]
+    for t in followers:
+        t.start()
+    with lock.joined:
+        assert lock.joined.wait_for(lambda: flight.followers == 3, timeout=5)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert calls == [1] and results == [["row"]] * 4
+    assert (flight.leaders, flight.followers) == (1, 3)
+    assert flight.do("k", lambda: "again") == "again"  # nothing cached
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    with pytest.raises(ZeroDivisionError):
+        flight.do("k", lambda: 1 / 0)
+    assert flight.do("k", lambda: 2) == 2
+
+
+def test_async_single_flight_cancels_when_nobody_waits():
+    async def main():
+        flight = AsyncSingleFlight()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        a = asyncio.ensure_future(flight.do("k", slow))
+        b = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        a.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()  # b still waits for it
+        b.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert (flight.leaders, flight.followers) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_supersession_sync_tokens():
+    latest = Supersession()
+    old = latest.begin("box")
+    new = latest.begin("box")
+    with pytest.raises(Superseded):
+        latest.check("box", old)
+    latest.check("box", new)
+    latest.end("box", old)  # the stale request ending keeps the newer one
+    assert latest.is_current("box", new)
+    latest.end("box", new)
+    assert latest.superseded == 1 and not latest._latest
+
+
+def test_supersession_cancels_previous_async_request():
+    async def main():
+        latest = Supersession()
+
+        async def lookup(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        first = asyncio.ensure_future(latest.run("box", lambda: lookup(1, 5)))
+        await asyncio.sleep(0)
+        assert await latest.run("box", lambda: lookup(2, 0)) == 2
+        with pytest.raises(Superseded):
+            await first
+        assert latest.superseded == 1
+
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(("sql",), v)
+    lines = h.render()
+    assert 't_seconds_bucket{stage="sql",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{stage="sql",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{stage="sql",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="sql"} 4' in lines
+
+
+def test_histogram_caps_its_series():
+    h = Histogram("t_seconds", "test", ("shape",), buckets=(1.0,), max_series=2)
+    for shape in ("a", "b", "c", "d", "a"):
+        h.observe((shape,), 0.5)
+    counts = [line for line in h.render() if "_count" in line]
+    assert counts == [
+        't_seconds_count{shape="a"} 2',
+        't_seconds_count{shape="b"} 1',
+        't_seconds_count{shape="other"} 2',
+    ]
+
+
+def test_metrics_need_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", None)
+    assert client.get("/metrics").status_code == 404
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    r = client.get("/metrics")
+    assert r.status_code == 401 and r.headers["WWW-Authenticate"] == "Bearer"
+    r = client.get("/metrics", headers={"Authorization": "Bearer nope"})
+    assert r.status_code == 401
+    r = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert r.status_code == 200
+
+
+def test_server_timing_and_prometheus_endpoint(client, monkeypatch):
+    r = client.get(
+        "/api/v1/orgs/1/employees/search",
+        headers={"X-API-Key": "dev-key-1"},
+        params={"q": "engineer", "limit": 5},
+    )
+    assert r.status_code == 200
+    stages = {p.split(";")[0] for p in r.headers["Server-Timing"].split(", ")}
+    assert {"auth", "rate_limit", "pool_wait", "sql", "decode", "total"} <= stages
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    text = client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).text
+    endpoint = 'endpoint="/api/v1/orgs/{org_id}/employees/search"'
+    assert f'hrms_request_duration_seconds_count{{method="GET",{endpoint},' in text
+    assert f'hrms_request_stage_seconds_count{{{endpoint},stage="sql"}}' in text
+    assert 'hrms_db_statement_seconds_count{shape="search-' in text
+    assert 'hrms_db_pool_size{pool="sync"}' in text
+    assert "hrms_admission_limit" in text
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from benchmarks import plan_check
+from benchmarks.plan_check import shapes, violations
+
+# Plan checks need the generated dataset the baseline was recorded on:
+#   python -m benchmarks.datagen --employees 200000 --orgs 50 --reset
+#   PLAN_CHECK_ORG_ID=1001 python -m pytest tests/test_query_plans.py
+PLAN_CHECK_ORG_ID = os.environ.get("PLAN_CHECK_ORG_ID")
+SHAPES = shapes()
+
+
+def test_shapes_cover_every_filter_and_fts_combination():
+    ids = [s.id for s in SHAPES]
+    assert len(ids) == len(set(ids))
+    searches = [s for s in SHAPES if s.kind == "search"]
+    # 64 filter sets x fts x keyset x (single, two_phase) + relevance (fts only)
+    assert len(searches) == 64 * 2 * 2 * 2 + 64 * 2
+    assert len([s for s in SHAPES if s.kind == "facets"]) == 64 * 2 * 2
+    assert [s.id for s in SHAPES if s.kind == "suggest"] == [
+        "suggest:-",
+        "suggest:fts",
+    ]
+
+
+def test_violations_flags_seq_scans_and_spills():
+    plan = {
+        "Node Type": "Limit",
+        "Plans": [
+            {
+                "Node Type": "Sort",
+                "Sort Method": "external merge",
+                "Sort Space Type": "Disk",
+                "Plans": [
+                    {"Node Type": "Seq Scan", "Relation Name": "hr_employment"},
+                    {"Node Type": "Seq Scan", "Relation Name": "hr_company"},
+                    {"Node Type": "Aggregate", "HashAgg Batches": 4},
+                ],
+            }
+        ],
+    }
+    assert violations(plan) == [
+        "sort spilled to disk (external merge)",
+        "seq scan on hr_employment",
+        "Aggregate spilled to disk",
+    ]
+
+
+def test_generic_plan_placeholders_are_numbered_once_per_name():
+    sql = "e.org_id = %(org_id)s AND e.deptid = %(deptid)s LIMIT %(limit)s"
+    assert plan_check._numbered(sql + " -- %(org_id)s") == (
+        "e.org_id = $1 AND e.deptid = $2 LIMIT $3 -- $1"
+    )
+
+
+@pytest.fixture(scope="module")
+def plan_env():
+    import psycopg
+
+    from app.core.config import settings
+
+    with psycopg.connect(settings.database_url, autocommit=True) as conn:
+        data = plan_check.load_dataset(conn, int(PLAN_CHECK_ORG_ID))
+        baseline = plan_check.load_baseline(plan_check.BASELINE_PATH, data)
+        yield conn, data, baseline
+
+
+# Without PLAN_CHECK_ORG_ID this collects as a single skipped test
+@pytest.mark.parametrize(
+    "shape", SHAPES if PLAN_CHECK_ORG_ID else [], ids=lambda s: s.id
+)
+def test_plan_has_not_regressed(plan_env, shape):
+    conn, data, baseline = plan_env
+    result = plan_check.check(conn, shape, data, baseline)
+    assert not result.problems, result.problems
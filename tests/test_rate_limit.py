@@ -1,22 +1,9 @@
 import pytest
-from fastapi.testclient import TestClient
 
 import app.api.rate_limit_deps as rld
-from app.core.rate_limit import TokenBucketLimiter
-from app.main import app
-
-
-@pytest.fixture
-def client():
-    from app.db.pool import close_pool, init_pool
-
-    # Initialize DB pool (TestClient doesn't trigger startup events)
-    init_pool()
-
-    yield TestClient(app)
-
-    # Cleanup
-    close_pool()
+from app.core.rate_limit import SharedMemoryLimiter, TokenBucketLimiter
+from app.modules.employee import service
+from app.modules.employee.result_cache import SearchResultCache, result_cache
 
 
 def test_search_rate_limited(client, monkeypatch):
@@ -37,3 +24,209 @@ def test_search_rate_limited(client, monkeypatch):
     assert r3.status_code == 429
     assert "Retry-After" in r3.headers
     assert int(r3.headers["Retry-After"]) >= 1
+
+
+def _drain(path: str, attempts: int, queue) -> None:
+    limiter = SharedMemoryLimiter(rate_per_sec=0.0, capacity=10, path=path)
+    queue.put(sum(limiter.allow("org:1:key:k")[0] for _ in range(attempts)))
+
+
+def test_shared_memory_limiter_is_shared_across_processes(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "rl")
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_drain, args=(path, 8, queue)) for _ in range(3)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    # 3 "workers" x 8 attempts against one bucket of 10: exactly 10 pass
+    assert sum(queue.get() for _ in workers) == 10
+
+    allowed, retry_after, remaining = SharedMemoryLimiter(
+        rate_per_sec=0.0, capacity=10, path=path
+    ).allow("org:1:key:k")
+    assert not allowed
+    assert retry_after == 60
+    assert remaining < 1
+
+
+def test_shared_memory_limiter_retry_after_and_eviction(tmp_path, monkeypatch):
+    import app.core.rate_limit as rl
+
+    clock = [1000.0]
+    monkeypatch.setattr(rl.time, "monotonic", lambda: clock[0])
+    # One set of two slots
+    limiter = SharedMemoryLimiter(
+        rate_per_sec=2.0, capacity=2, path=str(tmp_path / "rl"), slots=2, ways=2
+    )
+    assert limiter.allow("a", cost=2)[0]
+    allowed, retry_after, _ = limiter.allow("a", cost=3)
+    assert not allowed
+    assert retry_after == 2  # ceil(3 missing tokens / 2 per second)
+    assert limiter.allow("b")[0]
+
+    # Both buckets are draining: a new key is turned away, not given one
+    assert limiter.allow("c") == (False, 1, 0.0)  # "b" is 1 token short
+    assert limiter.charge("c", 1) == 0.0
+    clock[0] += 0.5
+    assert limiter.allow("b", cost=2)[0]  # untouched by "c"
+
+    # Once refilled, the least recently seen bucket makes room
+    clock[0] += 1
+    assert limiter.allow("c")[0]  # evicts "a", seen before "b"
+    assert limiter.allow("a", cost=2)[0]  # starts over full, evicting "b"
+    assert not limiter.allow("b")[0]  # "a" and "c" are draining
+
+
+def _hold_set_lock(path: str, locked, release) -> None:
+    import fcntl
+
+    limiter = SharedMemoryLimiter(rate_per_sec=1.0, capacity=1, path=path)
+    fcntl.lockf(limiter._fd, fcntl.LOCK_EX)
+    locked.set()
+    release.wait(10)
+
+
+def test_shared_memory_limiter_gives_up_on_a_held_lock(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "rl")
+    ctx = multiprocessing.get_context("fork")
+    locked, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold_set_lock, args=(path, locked, release))
+    holder.start()
+    try:
+        assert locked.wait(10)
+        limiter = SharedMemoryLimiter(rate_per_sec=1.0, capacity=1, path=path)
+        with pytest.raises(TimeoutError):
+            limiter.allow("k")
+    finally:
+        release.set()
+        holder.join()
+    assert limiter.allow("k")[0]
+
+
+def test_token_bucket_evicts_expired_keys_incrementally(monkeypatch):
+    import app.core.rate_limit as rl
+
+    clock = [1000.0]
+    monkeypatch.setattr(rl.time, "monotonic", lambda: clock[0])
+    limiter = TokenBucketLimiter(
+        rate_per_sec=1.0, capacity=2, ttl_seconds=10, stripes=1, evict_batch=2
+    )
+    for i in range(6):
+        assert limiter.allow(f"k{i}")[0]
+    assert limiter.allow("k0", cost=2) == (False, 1, 1.0)
+
+    # After the TTL each call drops at most `evict_batch` of the oldest keys
+    clock[0] += 11
+    limiter.allow("fresh")
+    assert len(limiter) == 5  # 6 + fresh - 2 evicted
+    limiter.allow("fresh")
+    limiter.allow("fresh")
+    assert len(limiter) == 1
+
+    # Evicted keys come back with a full bucket, reusing freed slots
+    assert limiter.allow("k0", cost=2)[0]
+
+
+def test_request_cost_follows_query_shape(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "rate_limit_cost_mode", "shape")
+    monkeypatch.setattr(result_cache, "max_entries", 0)  # every request queries
+    headers = {"X-API-Key": "dev-key-1"}
+    url = "/api/v1/orgs/1/employees/search"
+
+    def cost(**params):
+        monkeypatch.setattr(
+            rld, "limiter", TokenBucketLimiter(rate_per_sec=0.0, capacity=100)
+        )
+        r = client.get(url, headers=headers, params=params)
+        assert r.status_code == 200
+        assert 100 - float(r.headers["X-RateLimit-Cost"]) == pytest.approx(
+            float(r.headers["X-RateLimit-Remaining"]), abs=1
+        )
+        return float(r.headers["X-RateLimit-Cost"])
+
+    page = cost()
+    assert page == 1.0
+    fts = cost(q="engineer")
+    faceted = cost(q="engineer", include_facets="true")
+    narrowed = cost(q="engineer", include_facets="true", deptid="IT")
+    assert page < fts < faceted
+    assert narrowed < faceted
+    assert cost(limit=100) == 3.0
+
+
+def test_searches_that_run_no_query_cost_one_token(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "rate_limit_cost_mode", "shape")
+    cache = SearchResultCache(max_entries=10, ttl_seconds=60, revalidate_seconds=60)
+    monkeypatch.setattr(service, "result_cache", cache)
+    limiter = TokenBucketLimiter(rate_per_sec=0.0, capacity=100)
+    monkeypatch.setattr(rld, "limiter", limiter)
+    headers = {"X-API-Key": "dev-key-1"}
+    url = "/api/v1/orgs/1/employees/search"
+    params = {"q": "engineer", "facets": "dept,location", "limit": 7}
+
+    cold = client.get(url, headers=headers, params=params)
+    assert cold.status_code == 200 and float(cold.headers["X-RateLimit-Cost"]) > 2
+    spent = 100 - limiter.allow("org:1:key:dev-key-1", 0)[2]
+    assert spent == pytest.approx(float(cold.headers["X-RateLimit-Cost"]), abs=0.01)
+
+    hit = client.get(url, headers=headers, params=params)
+    assert hit.status_code == 200 and hit.headers["X-RateLimit-Cost"] == "1.00"
+    etag = {"If-None-Match": cold.headers["ETag"]}
+    not_modified = client.get(url, headers={**headers, **etag}, params=params)
+    assert not_modified.status_code == 304
+    left = limiter.allow("org:1:key:dev-key-1", 0)[2]
+    assert left == pytest.approx(100 - spent - 2, abs=0.01)
+
+
+def test_db_time_mode_charges_after_the_query(client, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "rate_limit_cost_mode", "db_time")
+    monkeypatch.setattr(result_cache, "max_entries", 0)  # every request queries
+    monkeypatch.setattr(settings, "rate_limit_tokens_per_db_second", 1e6)
+    monkeypatch.setattr(
+        rld, "limiter", TokenBucketLimiter(rate_per_sec=0.0, capacity=10)
+    )
+    headers = {"X-API-Key": "dev-key-1"}
+
+    # 1 token gets the request in; its DB time (x1e6) then drains the bucket
+    r1 = client.get("/api/v1/orgs/1/employees/search", headers=headers)
+    assert r1.status_code == 200
+    assert float(r1.headers["X-RateLimit-Cost"]) > 10
+    assert r1.headers["X-RateLimit-Remaining"] == "0"
+
+    r2 = client.get("/api/v1/orgs/1/employees/search", headers=headers)
+    assert r2.status_code == 429
+
+
+@pytest.mark.parametrize(
+    "method, path, body",
+    [
+        ("GET", "search", None),
+        ("GET", "suggest", None),
+        ("GET", "export", None),
+        ("POST", "search/batch", {"searches": [{"q": "engineer"}]}),
+    ],
+)
+def test_forbidden_requests_are_not_charged(client, monkeypatch, method, path, body):
+    limiter = TokenBucketLimiter(rate_per_sec=0.0, capacity=1)
+    monkeypatch.setattr(rld, "limiter", limiter)
+    headers = {"X-API-Key": "dev-key-1"}
+
+    r = client.request(
+        method, f"/api/v1/orgs/2/employees/{path}", headers=headers, json=body
+    )
+    assert r.status_code == 403
+    assert "X-RateLimit-Remaining" not in r.headers
+    assert limiter.allow("org:1:key:dev-key-1") == (True, 0, 0.0)  # still full
@@ -0,0 +1,189 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.db.deps as db_deps
+from app.core.config import settings
+from app.db.admission import AdmissionController, PoolAdmission
+from app.db.pool import PRIMARY
+from app.db.replicas import ReplicaRouter, parse_lsn
+from app.main import app
+from app.modules.employee import service
+from app.modules.employee.result_cache import SearchResultCache
+
+BASE = "/api/v1"
+HEADERS = {"X-API-Key": "dev-key-1"}
+
+
+def _router(*names: str, max_in_flight: int = 2) -> ReplicaRouter:
+    return ReplicaRouter(
+        list(names), max_lag_seconds=5, check_seconds=1, max_in_flight=max_in_flight
+    )
+
+
+def _probed(router: ReplicaRouter, name: str, *, replayed: int, lag: float = 0.0):
+    replica = router._replicas[name]
+    replica.healthy, replica.replayed, replica.lag = True, replayed, lag
+    replica.checked_at = time.monotonic()
+
+
+def test_parse_lsn():
+    assert parse_lsn("0/0") == 0
+    assert parse_lsn("16/B374D848") == (0x16 << 32) | 0xB374D848
+    assert parse_lsn("1/0") > parse_lsn("0/FFFFFFFF")
+    for bad in ("", "16", "x/1"):
+        with pytest.raises(ValueError):
+            parse_lsn(bad)
+
+
+def test_choice_follows_health_lag_watermark_and_load():
+    router = _router("r1", "r2")
+    assert router.choose() == PRIMARY  # not probed yet
+
+    _probed(router, "r1", replayed=100)
+    _probed(router, "r2", replayed=200)
+    assert router.choose(150) == "r2"
+    assert router.choose(300) == PRIMARY  # nobody has the client's write yet
+
+    # Least loaded wins; a full replica would only queue
+    with router.reading(), router.route() as first, router.route() as second:
+        assert {first, second} == {"r1", "r2"}
+        with router.route() as third, router.route() as fourth:
+            assert {third, fourth} == {"r1", "r2"}
+            with router.route() as fifth:
+                assert fifth == PRIMARY
+    assert router.reads == {"r1": 2, "r2": 2, PRIMARY: 1}
+
+    _probed(router, "r2", replayed=200, lag=60)
+    assert router.choose(150) == PRIMARY  # lagging
+    router._replicas["r1"].checked_at -= 10
+    assert router.choose() == PRIMARY  # the probe stalled
+    _probed(router, "r1", replayed=100)
+    router.failed("r1")
+    assert router.choose() == PRIMARY
+
+    # Outside reading(): always the primary, nothing counted
+    _probed(router, "r1", replayed=100)
+    with router.route() as name:
+        assert name == PRIMARY
+    assert router.reads[PRIMARY] == 1
+
+
+@pytest.fixture
+def replica(monkeypatch, no_rate_limit):
+    """The test database again, as replica `r1`."""
+    from app.db.pool import close_pool, init_pool
+
+    monkeypatch.setattr(
+        service,
+        "result_cache",
+        SearchResultCache(max_entries=0, ttl_seconds=0, revalidate_seconds=0),
+    )
+    monkeypatch.setattr(settings, "db_replicas", {"r1": settings.database_url})
+    router = _router("r1", max_in_flight=settings.db_pool_max_size)
+    monkeypatch.setattr(db_deps, "replicas", router)
+    monkeypatch.setattr(service, "replicas", router)
+    close_pool()
+    init_pool()
+    yield router
+    close_pool()
+
+
+def _search(headers=None, **params):
+    return TestClient(app).get(
+        f"{BASE}/orgs/1/employees/search",
+        headers={**HEADERS, **(headers or {})},
+        params=params,
+    )
+
+
+def test_searches_read_from_a_caught_up_replica(replica):
+    _probed(replica, "r1", replayed=parse_lsn("FFFF/0"))
+    r = _search(q="engineer", facets="dept")
+    assert r.status_code == 200
+    assert replica.reads["r1"] >= 2 and not replica.reads[PRIMARY]
+
+    # Read-your-writes: a watermark it has not replayed goes to the primary
+    r = _search({"X-Read-After": "FFFF/1"}, q="engineer", facets="dept")
+    assert r.status_code == 200 and replica.reads[PRIMARY] >= 2
+    assert _search({"X-Read-After": "latest"}).status_code == 400
+
+    r = TestClient(app).post(
+        f"{BASE}/orgs/1/employees/search/batch",
+        headers=HEADERS,
+        json={"searches": [{"q": "engineer"}, {"deptid": "IT"}]},
+    )
+    assert r.status_code == 200 and replica.reads["r1"] >= 3
+
+
+def test_a_server_that_is_not_a_standby_gets_no_reads(replica):
+    replica.probe()  # r1 is the primary itself: not in recovery
+    assert not replica._replicas["r1"].healthy
+    assert _search(q="engineer").status_code == 200
+    assert not replica.reads["r1"] and replica.reads[PRIMARY]
+
+
+def test_async_path_reads_from_the_replica(replica, monkeypatch):
+    _probed(replica, "r1", replayed=parse_lsn("FFFF/0"))
+    monkeypatch.setattr(settings, "db_async", True)
+    with TestClient(app) as client:
+        r = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=HEADERS,
+            params={"q": "engineer", "facets": "dept"},
+        )
+    assert r.status_code == 200
+    assert replica.reads["r1"] >= 2 and not replica.reads[PRIMARY]
+
+
+@pytest.mark.parametrize("db_async", [False, True])
+def test_a_dead_replica_falls_back_to_the_primary(replica, monkeypatch, db_async):
+    # Nothing listens on port 1: every checkout from r1 times out
+    monkeypatch.setattr(settings, "db_pool_timeout", 0.2)
+    monkeypatch.setattr(settings, "db_replicas", {"r1": "postgresql://127.0.0.1:1/x"})
+    monkeypatch.setattr(settings, "db_async", db_async)
+    from app.db.pool import close_pool, init_pool
+
+    close_pool()
+    init_pool()
+    _probed(replica, "r1", replayed=parse_lsn("FFFF/0"))
+    with TestClient(app) as client:
+        r = client.get(
+            f"{BASE}/orgs/1/employees/search",
+            headers=HEADERS,
+            params={"q": "engineer", "facets": "dept"},
+        )
+    assert r.status_code == 200 and r.json()["items"]
+    assert replica.reads["r1"] >= 1 and replica.reads[PRIMARY] >= 1
+    assert not replica._replicas["r1"].healthy
+
+
+def test_replicas_are_admitted_on_their_own_limit(replica, monkeypatch):
+    def controller():
+        return AdmissionController(
+            initial_limit=1,
+            min_limit=1,
+            max_limit=1,
+            org_share=1.0,
+            org_min=1,
+            target_wait_seconds=1.0,
+            target_query_seconds=1.0,
+        )
+
+    admission = PoolAdmission(controller)
+    monkeypatch.setattr(db_deps, "admission", admission)
+    # Versions and descriptors are read on the primary: cache them first
+    monkeypatch.setattr(
+        service,
+        "result_cache",
+        SearchResultCache(max_entries=0, ttl_seconds=0, revalidate_seconds=1e9),
+    )
+    assert _search(q="engineer").status_code == 200
+
+    _probed(replica, "r1", replayed=parse_lsn("FFFF/0"))
+    assert admission.get(PRIMARY).try_acquire(None)  # the primary is full
+    r = _search(q="engineer")
+    assert r.status_code == 200 and replica.reads["r1"]
+    assert admission.get(PRIMARY).in_flight == 1
+    assert admission.get("r1").in_flight == 0
@@ -0,0 +1,62 @@
+from datetime import UTC, datetime
+from uuid import uuid4
+
+from app.db.statements import WARM_ORG_ID, StatementRegistry
+
+
+def test_registry_builds_each_shape_once_and_counts():
+    registry = StatementRegistry(max_statements=10)
+    builds: list[str] = []
+
+    def build():
+        builds.append("x")
+        return "SELECT 1"
+
+    params = {"org_id": 42, "q": "alice"}
+    for _ in range(3):
+        assert registry.get(("search", "a"), build, params) == "SELECT 1"
+
+    assert builds == ["x"]
+    assert registry.stats() == {"statements": 1, "hits": 2, "misses": 1}
+    # warm-up never runs against a real tenant, nor with a request's values
+    assert registry._hottest()[0].warm_params == {"org_id": WARM_ORG_ID, "q": ""}
+
+
+def test_warm_params_are_typed_placeholders():
+    registry = StatementRegistry()
+    params = {
+        "org_id": 1001,
+        "q": "alice smith",
+        "limit": 20,
+        "wide": 70_000,
+        "rank": 0.75,
+        "after_ts": datetime(2024, 5, 1, 12, 30, tzinfo=UTC),
+        "after_id": uuid4(),
+        "deptids": ["IT", "HR"],
+        "flag": True,
+        "none": None,
+    }
+    registry.get("k", lambda: "SELECT 1", params)
+    warm = registry._hottest()[0].warm_params
+    assert warm["org_id"] == WARM_ORG_ID and warm["q"] == ""
+    assert (warm["limit"], warm["wide"], warm["rank"]) == (0, 2**15, 0.0)
+    assert warm["after_ts"].tzinfo is not None
+    assert warm["after_ts"] != params["after_ts"]
+    assert warm["after_id"].int == 0
+    assert (warm["deptids"], warm["flag"], warm["none"]) == ([""], True, None)
+
+    # A type without a placeholder: that shape is simply not warmed
+    registry.get("odd", lambda: "SELECT 2", {"x": object()})
+    assert [s.sql for s in registry._hottest()] == ["SELECT 1"]
+
+
+def test_registry_is_bounded_lru():
+    registry = StatementRegistry(max_statements=2)
+    registry.get("a", lambda: "A", {})
+    registry.get("b", lambda: "B", {})
+    registry.get("a", lambda: "A", {})
+    registry.get("c", lambda: "C", {})  # evicts "b"
+
+    assert registry.stats()["statements"] == 2
+    registry.get("b", lambda: "B", {})
+    assert registry.stats()["misses"] == 4